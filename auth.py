@@ -86,6 +86,9 @@ def init_db():
             FOREIGN KEY (username) REFERENCES users(username)
         )
     ''')
+    # Индексы для фильтров и постраничного просмотра логов
+    from logger import ensure_log_schema
+    ensure_log_schema(cursor)
     
     # Таблица прав доступа к проектам
     cursor.execute('''
@@ -528,7 +531,8 @@ def render_sidebar_menu(current_page: str = "reports"):
                 # Группируем отчеты по категориям
                 reason_reports = ["Динамика отклонений по месяцам", "Динамика отклонений", "Динамика причин отклонений"]
                 budget_reports = ["БДДС по месяцам", "БДДС по лотам", "Бюджет план/факт", "Утвержденный бюджет", "Прогнозный бюджет"]
-                plan_fact_reports = ["Отклонение текущего срока от базового плана", "Значения отклонений от базового плана"]
+                plan_fact_reports = ["Отклонение текущего срока от базового плана", "Значения отклонений от базового плана",
+                                     "Изменения между версиями"]
                 other_reports = ["Выдача рабочей/проектной документации", "Аналитика по технике", "График движения рабочей силы", "СКУД стройка"]
                 
                 st.markdown("---")
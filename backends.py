@@ -0,0 +1,218 @@
+"""
+Движки расчетов панелей
+
+Фильтрация и группировка панелей бюджета, отклонений и ресурсов по
+умолчанию выполняются на pandas. Движок (backend) - модуль, который
+выполняет те же операции над колоночным снимком данных:
+- sql_engine - DuckDB (SQL-запросы к таблице в памяти процесса);
+- polars_engine - Polars (ленивые планы запросов, многопоточные группировки).
+
+Каждый движок реализует одинаковый набор функций (budget_summary,
+deviation_totals, deviation_dynamics, group_sums). Функция возвращает
+результат в том же виде, что и расчет на pandas (колонки, типы, порядок
+строк), или None - тогда панель считает на pandas.
+
+Движок выбирается для развертывания на странице администратора и
+хранится в системных настройках (ключ aggregation_backend).
+"""
+import importlib
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_dtype, is_integer_dtype, is_numeric_dtype, is_string_dtype
+
+from schema import ensure_numeric
+from settings import get_setting, set_setting
+
+PANDAS = 'pandas'
+
+# Имя движка -> модуль
+BACKEND_MODULES = {
+    'duckdb': 'sql_engine',
+    'polars': 'polars_engine',
+}
+
+BACKEND_LABELS = {
+    PANDAS: 'pandas',
+    'duckdb': 'DuckDB',
+    'polars': 'Polars',
+}
+
+# Движок по умолчанию, если в настройках ничего не выбрано: первый установленный
+DEFAULT_ORDER = ('duckdb', 'polars')
+
+BACKEND_SETTING = 'aggregation_backend'
+BACKEND_SETTING_DESCRIPTION = 'Движок расчетов панелей'
+
+# Сколько снимков наборов данных хранить в памяти (на каждый движок)
+SNAPSHOT_CACHE_SIZE = 4
+
+# Колонки снимка данных проектов
+KEY_COLUMNS = ('project name', 'task name', 'section', 'block', 'reason of deviation')
+NUMBER_COLUMNS = ('budget plan', 'budget fact', 'budget adjusted', 'adjusted budget', 'deviation in days')
+DATE_COLUMNS = ('plan start', 'plan end', 'base start', 'base end')
+
+_lock = threading.Lock()
+_selected = None  # имя движка из настроек (загружается при первом обращении)
+
+
+def _module(name):
+    return importlib.import_module(BACKEND_MODULES[name])
+
+
+def available_backends():
+    """Имена движков, которые можно выбрать (pandas и установленные)"""
+    return [PANDAS] + [name for name in BACKEND_MODULES if _module(name).is_available()]
+
+
+def _default_backend():
+    return next((name for name in DEFAULT_ORDER if _module(name).is_available()), PANDAS)
+
+
+def get_backend_name():
+    """Выбранный движок; недоступный (пакет не установлен) заменяется на pandas"""
+    global _selected
+    with _lock:
+        if _selected is None:
+            try:
+                _selected = get_setting(BACKEND_SETTING) or _default_backend()
+            except sqlite3.Error:
+                # База настроек еще не создана (скрипты, тесты)
+                _selected = _default_backend()
+        name = _selected
+    if name != PANDAS and (name not in BACKEND_MODULES or not _module(name).is_available()):
+        return PANDAS
+    return name
+
+
+def select_backend(name, updated_by=None, persist=True):
+    """
+    Выбирает движок расчетов
+
+    Args:
+        name: 'pandas', 'duckdb' или 'polars'
+        updated_by: Пользователь (для системных настроек)
+        persist: Сохранить выбор в системных настройках
+    """
+    global _selected
+    if name != PANDAS and name not in BACKEND_MODULES:
+        raise ValueError(f"Неизвестный движок расчетов: {name}")
+    if persist:
+        set_setting(BACKEND_SETTING, name, BACKEND_SETTING_DESCRIPTION, updated_by)
+    with _lock:
+        _selected = name
+
+
+def current():
+    """Модуль выбранного движка или None (расчет на pandas)"""
+    name = get_backend_name()
+    return None if name == PANDAS else _module(name)
+
+
+def run(operation, *args):
+    """
+    Выполняет операцию выбранным движком
+
+    Returns:
+        Результат функции движка или None, если выбран pandas или движок
+        не может выполнить операцию с этими данными
+    """
+    backend = current()
+    return getattr(backend, operation)(*args) if backend is not None else None
+
+
+# ==================== Снимки данных ====================
+class SnapshotCache:
+    """Снимки наборов данных одного движка, по объекту DataFrame (weakref, LRU)"""
+
+    def __init__(self, build, size=SNAPSHOT_CACHE_SIZE):
+        self.build = build
+        self.size = size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # id набора данных -> (weakref на набор данных, снимок)
+
+    def get(self, df):
+        key = id(df)
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None and cached[0]() is df:
+                self._items.move_to_end(key)
+                return cached[1]
+
+        snapshot = self.build(df)
+
+        with self._lock:
+            self._items[key] = (weakref.ref(df), snapshot)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return snapshot
+
+
+def snapshot_frame(df):
+    """
+    Колонки набора данных проектов, которые нужны движкам
+
+    Returns:
+        (frame, filter_kinds): frame - DataFrame с RangeIndex (ключи, числа,
+        даты, признак отклонения); filter_kinds - {ключ: способ сравнения
+        со значением фильтра}: 'plain' (значения уже без пробелов по краям),
+        'strip' или 'cast' (числовой ключ сравнивается как строка)
+    """
+    frame = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    filter_kinds = {}
+    for col in KEY_COLUMNS:
+        if col not in df.columns or is_bool_dtype(df[col]):
+            continue
+        if is_string_dtype(df[col]):
+            frame[col] = df[col].array
+            values = df[col].dropna()
+            # Ключи проектов очищены при загрузке (schema.apply_schema): strip на каждом запросе не нужен
+            filter_kinds[col] = 'plain' if (values.str.strip() == values).all() else 'strip'
+        elif is_numeric_dtype(df[col]):
+            frame[col] = df[col].to_numpy()
+            filter_kinds[col] = 'cast'
+    for col in NUMBER_COLUMNS:
+        if col in df.columns:
+            frame[col] = ensure_numeric(df[col]).to_numpy()
+    for col in DATE_COLUMNS:
+        if col in df.columns and is_datetime64_dtype(df[col]):
+            frame[col] = df[col].to_numpy()
+    # Признак отклонения берется только уже типизированный (schema.apply_schema)
+    if 'deviation' in df.columns and df['deviation'].dtype == bool:
+        frame['deviation'] = df['deviation'].to_numpy()
+    return frame, filter_kinds
+
+
+# ==================== Приведение результатов ====================
+def sum_dtype(*dtypes):
+    """Тип суммы, как у pandas: целые колонки сохраняют свой тип, остальные - float64"""
+    if all(is_integer_dtype(dtype) for dtype in dtypes):
+        return np.result_type(*dtypes)
+    return np.dtype('float64')
+
+
+def restore_keys(result, df, columns):
+    """Возвращает ключам группировки типы исходных колонок"""
+    for col in columns:
+        result[col] = result[col].astype(df[col].dtype)
+    return result
+
+
+def restore_periods(values, freq_code, dtype=None):
+    """
+    Начала периодов (datetime) -> значения, как в колонках периодов pandas
+
+    Args:
+        values: Series с датами начала периодов
+        freq_code: 'D' (дата - datetime.date), 'M', 'Q' или 'Y' (pd.Period)
+        dtype: Тип исходной колонки периода (если она есть в данных)
+    """
+    if freq_code == 'D':
+        return values.dt.date.astype(object)
+    periods = values.dt.to_period(freq_code)
+    return periods.astype(dtype) if dtype is not None else periods
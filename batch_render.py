@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Headless batch renderer for dashboard reports.
+
+Loads every CSV/Excel file from a data directory (the same way the app does
+on upload), computes the selected dashboards without Streamlit and writes
+their figures and tables to HTML/PNG/XLSX. Reports are rendered in parallel
+worker processes; each worker loads the data directory once.
+
+Usage:
+    python batch_render.py DATA_DIR [--reports "БДДС по месяцам" ...]
+                           [--output OUTPUT_DIR] [--formats html xlsx png]
+                           [--workers N]
+"""
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_loader import load_directory
+from dashboard_data import (
+    SKUD_GROUPINGS,
+    compute_reasons_of_deviation,
+    compute_dynamics_of_deviations,
+    compute_plan_fact_dates,
+    compute_deviation_by_tasks,
+    compute_deviation_detail,
+    compute_dynamics_of_reasons,
+    find_documentation_columns,
+    compute_rd_execution,
+    compute_rd_issue_dynamics,
+    find_rd_delay_columns,
+    compute_rd_delay,
+    combine_workforce_data,
+    prepare_contractor_data,
+    compute_contractor_analytics,
+    prepare_skud_data,
+    compute_skud,
+    skud_summary_table,
+    compute_budget_by_period,
+    compute_budget_by_section,
+    compute_budget_by_type,
+    compute_approved_budget,
+    compute_forecast_budget
+)
+from dashboard_figures import (
+    build_reason_bar_figure,
+    build_reason_pie_figure,
+    build_deviation_count_figure,
+    build_deviation_days_line_figure,
+    build_deviation_days_by_project_figure,
+    build_deviation_days_by_reason_figure,
+    build_plan_fact_gantt_figure,
+    build_deviation_by_tasks_figure,
+    build_deviation_detail_figure,
+    build_reason_totals_figure,
+    build_reason_dynamics_by_period_figure,
+    build_rd_execution_figure,
+    build_rd_issue_dynamics_figure,
+    build_rd_delay_figure,
+    build_contractor_delta_pie_figure,
+    build_contractor_bar_figure,
+    build_contractor_plan_avg_pie_figure,
+    build_skud_figure,
+    build_budget_by_period_figure,
+    build_budget_by_section_figure,
+    build_budget_by_type_figure,
+    build_approved_budget_figure,
+    build_forecast_budget_figure
+)
+
+SUPPORTED_FORMATS = ('html', 'png', 'xlsx')
+DEFAULT_FORMATS = ('html', 'xlsx')
+
+# Datasets loaded once per worker process (see _init_worker)
+_DATASETS = None
+
+
+class ReportOutput:
+    """Figures and tables produced by one report"""
+
+    def __init__(self):
+        self.figures = []  # list of (title, go.Figure)
+        self.tables = []   # list of (sheet name, DataFrame)
+        self.messages = []
+
+    def add_figure(self, title, fig):
+        self.figures.append((title, fig))
+
+    def add_table(self, name, df):
+        if df is not None and not df.empty:
+            self.tables.append((name, df))
+
+    def add_message(self, message):
+        self.messages.append(message)
+
+
+# ==================== Reports ====================
+def _report_reasons_of_deviation(datasets, output):
+    result, message = compute_reasons_of_deviation(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    if result['reason_counts'] is not None:
+        output.add_figure('Количество задач по причинам', build_reason_bar_figure(result['reason_chart']))
+        output.add_figure('Причины отклонений', build_reason_pie_figure(result['reason_chart']))
+        output.add_table('Причины', result['reason_counts'])
+    output.add_table('Задачи с отклонениями', result['filtered'])
+
+
+def _report_dynamics_of_deviations(datasets, output):
+    result, message = compute_dynamics_of_deviations(datasets['project'], period_type='Месяц')
+    if message:
+        output.add_message(message)
+        return
+    grouped_data = result['grouped']
+    output.add_figure('Количество отклонений', build_deviation_count_figure(grouped_data, result['period_label']))
+    if grouped_data['Всего дней отклонений'].sum() > 0:
+        output.add_figure('Дни отклонений', build_deviation_days_line_figure(grouped_data, result['period_label']))
+    output.add_table('По месяцам', grouped_data)
+
+
+def _report_plan_fact_dates(datasets, output):
+    result, message = compute_plan_fact_dates(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    if not result['bars'].empty:
+        output.add_figure('Отклонение текущего срока от базового плана',
+                          build_plan_fact_gantt_figure(result['bars']))
+    output.add_table('Задачи', result['bars'])
+
+
+def _report_deviation_by_tasks(datasets, output):
+    result, message = compute_deviation_by_tasks(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    output.add_figure('Значения отклонений от базового плана',
+                      build_deviation_by_tasks_figure(result['deviations'], result['y_label']))
+    output.add_table('Отклонения', result['deviations'])
+    detail, message = compute_deviation_detail(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    output.add_figure('Детализация отклонений по разделам и задачам', build_deviation_detail_figure(detail))
+    output.add_table('Детализация', detail)
+
+
+def _report_dynamics_of_reasons(datasets, output):
+    result, message = compute_dynamics_of_reasons(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    output.add_figure('Причины отклонений', build_reason_totals_figure(result['by_reason']))
+    output.add_figure('Причины отклонений по месяцам', build_reason_dynamics_by_period_figure(
+        result['dynamics'], result['period_col'], result['period_label'], by_reason=False))
+    output.add_table('По причинам', result['by_reason'])
+    output.add_table('Динамика', result['dynamics'])
+
+
+def _report_documentation(datasets, output):
+    df = datasets['project']
+    columns, message = find_documentation_columns(df)
+    if message:
+        output.add_message(message)
+    else:
+        pie_data = compute_rd_execution(df, columns)
+        if pie_data is not None:
+            output.add_figure('Выполнение РД', build_rd_execution_figure(pie_data))
+        dynamics, message = compute_rd_issue_dynamics(df, columns)
+        if message:
+            output.add_message(message)
+        elif not dynamics.empty:
+            output.add_figure('Динамика выдачи РД', build_rd_issue_dynamics_figure(dynamics))
+            output.add_table('Динамика выдачи РД', dynamics)
+
+    delay_columns, message = find_rd_delay_columns(df)
+    if message:
+        output.add_message(message)
+        return
+    result, message = compute_rd_delay(df, delay_columns)
+    if message:
+        output.add_message(message)
+        return
+    output.add_figure('Просрочка выдачи РД', build_rd_delay_figure(result))
+    output.add_table('Просрочка выдачи РД', result['summary'])
+
+
+def _add_contractor_analytics(source_df, output, average_columns=('Среднее за неделю', 'Среднее за месяц')):
+    prepared, message = prepare_contractor_data(source_df, average_columns)
+    if message:
+        output.add_message(message)
+        return
+    results, message = compute_contractor_analytics(prepared['data'], prepared['project_col'])
+    if message:
+        output.add_message(message)
+        return
+    for project_name, result in results:
+        charts = result['charts']
+        if not result['delta_pct'].empty and result['delta_pct_total'] != 0:
+            output.add_figure(f'Дельта (%) ({project_name})', build_contractor_delta_pie_figure(charts['delta_pct'][0]))
+        output.add_figure(f'План/среднее/дельта ({project_name})', build_contractor_bar_figure(charts['contractor_data'][0]))
+        if not result['plan_avg'].empty:
+            output.add_figure(f'План и среднее ({project_name})',
+                              build_contractor_plan_avg_pie_figure(charts['plan_avg'][0]))
+        output.add_table(str(project_name), result['contractor_data'])
+
+
+def _report_technique(datasets, output):
+    _add_contractor_analytics(datasets['technique'], output, average_columns=('Среднее за месяц',))
+
+
+def _report_workforce_movement(datasets, output):
+    _add_contractor_analytics(combine_workforce_data(datasets['resources'], datasets['technique']), output)
+
+
+def _report_skud(datasets, output):
+    prepared, message = prepare_skud_data(datasets['resources'])
+    if message:
+        output.add_message(message)
+        return
+    for grouping in SKUD_GROUPINGS:
+        result, message = compute_skud(prepared['data'], prepared, grouping)
+        if message:
+            output.add_message(f"{grouping}: {message}")
+            continue
+        fig = build_skud_figure(result, grouping)
+        if fig is not None:
+            output.add_figure(f'СКУД ({grouping})', fig)
+        output.add_table(grouping, skud_summary_table(result, grouping))
+
+
+def _report_budget_by_period(datasets, output):
+    for view_type in ('Накопительно', 'За месяц'):
+        result, message = compute_budget_by_period(datasets['project'], view_type=view_type)
+        if message:
+            output.add_message(message)
+            return
+        output.add_figure(f"БДДС{result['title_suffix']}", build_budget_by_period_figure(result))
+        output.add_table(f'График {view_type}', result['chart_data'])
+    output.add_table('Сводка', result['summary'])
+
+
+def _report_budget_by_section(datasets, output):
+    for view_type in ('За месяц', 'Накопительно'):
+        result, message = compute_budget_by_section(datasets['project'], view_type=view_type)
+        if message:
+            output.add_message(message)
+            return
+        output.add_figure(f"План/факт/резерв по лотам{result['title_suffix']}",
+                          build_budget_by_section_figure(result))
+        output.add_table(f'График {view_type}', result['chart_data'])
+    output.add_table('Сводка', result['summary'])
+
+
+def _report_budget_by_type(datasets, output):
+    result, message = compute_budget_by_type(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    if result['by_type'] is None or result['by_type'].empty:
+        output.add_message("Нет данных для отображения гистограммы.")
+        return
+    output.add_figure('Бюджет план/факт/корректировка/резерв по проектам',
+                      build_budget_by_type_figure(result['by_type']))
+    output.add_table('По проектам', result['by_project'])
+
+
+def _report_approved_budget(datasets, output):
+    result, message = compute_approved_budget(datasets['project'])
+    if message:
+        output.add_message(message)
+        return
+    output.add_figure('Утвержденный бюджет по месяцам', build_approved_budget_figure(result['monthly']))
+    output.add_table('По месяцам', result['monthly'])
+    output.add_table('Распределение', result['approved'])
+
+
+def _report_forecast_budget(datasets, output):
+    df = datasets['project']
+    if 'project name' not in df.columns:
+        output.add_message("Колонка 'project name' не найдена.")
+        return
+    for project in sorted(df['project name'].dropna().unique().tolist()):
+        result, message = compute_forecast_budget(df, project)
+        if message:
+            output.add_message(f"{project}: {message}")
+            continue
+        output.add_figure(f'Прогнозный бюджет ({project})',
+                          build_forecast_budget_figure(result['monthly'], project))
+        output.add_table(str(project), result['monthly'])
+
+
+# Report name (as in main() routing) -> (required dataset, builder)
+REPORTS = {
+    "Динамика отклонений по месяцам": ('project', _report_reasons_of_deviation),
+    "Динамика отклонений": ('project', _report_dynamics_of_deviations),
+    "Динамика причин отклонений": ('project', _report_dynamics_of_reasons),
+    "Отклонение текущего срока от базового плана": ('project', _report_plan_fact_dates),
+    "Значения отклонений от базового плана": ('project', _report_deviation_by_tasks),
+    "БДДС по месяцам": ('project', _report_budget_by_period),
+    "БДДС по лотам": ('project', _report_budget_by_section),
+    "Бюджет план/факт": ('project', _report_budget_by_type),
+    "Утвержденный бюджет": ('project', _report_approved_budget),
+    "Прогнозный бюджет": ('project', _report_forecast_budget),
+    "Выдача рабочей/проектной документации": ('project', _report_documentation),
+    "Аналитика по технике": ('technique', _report_technique),
+    "График движения рабочей силы": ('resources', _report_workforce_movement),
+    "СКУД стройка": ('resources', _report_skud),
+}
+
+
+# ==================== Writers ====================
+def _slugify(name):
+    return re.sub(r'[^\w]+', '_', name).strip('_')
+
+
+def _excel_safe(df):
+    """Convert Period objects (unsupported by openpyxl) to strings"""
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.PeriodDtype):
+            df[col] = df[col].astype(str)
+        elif df[col].dtype == 'object':
+            df[col] = df[col].apply(lambda v: str(v) if isinstance(v, pd.Period) else v)
+    return df
+
+
+def _write_html(path, report_name, output):
+    parts = [f'<h1>{report_name}</h1>']
+    for message in output.messages:
+        parts.append(f'<p>{message}</p>')
+    for i, (title, fig) in enumerate(output.figures):
+        # Include plotly.js only once per file
+        parts.append(fig.to_html(full_html=False, include_plotlyjs=(i == 0)))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><head><meta charset="utf-8"><title>{}</title></head><body>{}</body></html>'.format(
+            report_name, '\n'.join(parts)))
+    return [path]
+
+
+def _write_png(base_path, output):
+    paths = []
+    for i, (title, fig) in enumerate(output.figures, start=1):
+        path = f'{base_path}_{i}.png'
+        fig.write_image(path, width=1600, height=900)
+        paths.append(path)
+    return paths
+
+
+def _write_xlsx(path, output):
+    used_names = set()
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for name, df in output.tables:
+            # Excel limits sheet names to 31 characters
+            sheet_name = re.sub(r'[\[\]:*?/\\]', '_', name)[:31]
+            suffix = 1
+            while sheet_name in used_names:
+                suffix += 1
+                sheet_name = f'{sheet_name[:28]}_{suffix}'
+            used_names.add(sheet_name)
+            _excel_safe(df).to_excel(writer, sheet_name=sheet_name, index=False)
+    return [path]
+
+
+def _kaleido_available():
+    try:
+        import kaleido  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ==================== Workers ====================
+def _init_worker(data_dir):
+    global _DATASETS
+    _DATASETS = load_directory(data_dir)
+
+
+def render_report(report_name, output_dir, formats):
+    """
+    Render one report using the datasets loaded in this worker.
+
+    Returns:
+        (report name, list of written files, list of messages)
+    """
+    data_type, builder = REPORTS[report_name]
+    df = _DATASETS.get(data_type)
+    if df is None:
+        return report_name, [], [f"Нет данных типа '{data_type}'"]
+
+    output = ReportOutput()
+    builder(_DATASETS, output)
+
+    base_path = os.path.join(output_dir, _slugify(report_name))
+    written = []
+    if 'html' in formats:
+        written += _write_html(base_path + '.html', report_name, output)
+    if 'png' in formats and output.figures:
+        written += _write_png(base_path, output)
+    if 'xlsx' in formats and output.tables:
+        written += _write_xlsx(base_path + '.xlsx', output)
+    return report_name, written, output.messages
+
+
+def render_reports(data_dir, report_names, output_dir, formats=DEFAULT_FORMATS, workers=None):
+    """
+    Render reports in parallel worker processes.
+
+    Returns:
+        List of (report name, written files, messages) in report order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir,)) as executor:
+        futures = [executor.submit(render_report, name, output_dir, tuple(formats)) for name in report_names]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render dashboard reports without Streamlit')
+    parser.add_argument('data_dir', help='Directory with CSV/Excel data files')
+    parser.add_argument('--reports', nargs='+', default=list(REPORTS),
+                        help='Report names as shown in the app menu (default: all supported)')
+    parser.add_argument('--output', default='reports_output', help='Output directory')
+    parser.add_argument('--formats', nargs='+', default=list(DEFAULT_FORMATS), choices=SUPPORTED_FORMATS,
+                        help='Output formats')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.reports if name not in REPORTS]
+    if unknown:
+        print(f"Unknown reports: {', '.join(unknown)}")
+        print(f"Supported reports: {', '.join(REPORTS)}")
+        sys.exit(1)
+
+    formats = list(args.formats)
+    if 'png' in formats and not _kaleido_available():
+        print("Warning: kaleido is not installed, PNG export skipped")
+        formats.remove('png')
+
+    results = render_reports(args.data_dir, args.reports, args.output, formats, args.workers)
+    for report_name, written, messages in results:
+        print(f"\n{report_name}")
+        for message in messages:
+            print(f"  ! {message}")
+        for path in written:
+            print(f"  -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for data loading and dashboard computations.
+
+Generates deterministic synthetic data (generate_synthetic_data.py) at the
+requested sizes and times, without Streamlit:
+- load_data (data_loader.read_data_file, which the app's load_data wraps)
+  and detect_data_type for project, resources and technique files;
+- calculate_approved_budget, filtering and fill_project_gaps;
+- the aggregation step (compute_* from dashboard_data) of every dashboard.
+
+Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python benchmark.py [--sizes 1000 10000 100000 1000000] [--repeat 3]
+                        [--cases load_data ...] [--data-dir DIR] [--output FILE]
+    python benchmark.py --compare BASELINE.json CURRENT.json [--threshold 1.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from data_loader import detect_data_type, read_data_file
+from fill_gaps import fill_project_gaps
+from dashboard_data import (
+    apply_filters,
+    compute_reasons_of_deviation,
+    compute_dynamics_of_deviations,
+    compute_plan_fact_dates,
+    compute_deviation_by_tasks,
+    compute_deviation_detail,
+    compute_dynamics_of_reasons,
+    find_rd_delay_columns,
+    compute_rd_delay,
+    find_documentation_columns,
+    filter_documentation,
+    compute_rd_execution,
+    compute_rd_issue_dynamics,
+    combine_workforce_data,
+    prepare_contractor_data,
+    compute_contractor_analytics,
+    prepare_skud_data,
+    compute_skud,
+    compute_budget_by_period,
+    compute_budget_cumulative,
+    compute_budget_by_section,
+    compute_budget_by_type,
+    calculate_approved_budget,
+    compute_approved_budget,
+    compute_forecast_budget
+)
+from generate_synthetic_data import write_dataset
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_DATA_DIR = 'benchmark_data'
+DATA_KINDS = ('project', 'resources', 'technique')
+
+
+def _first_project(df):
+    return df['project name'].dropna().iloc[0]
+
+
+def _documentation(df):
+    columns, message = find_documentation_columns(df)
+    if message:
+        return message
+    filtered = filter_documentation(df, columns)
+    compute_rd_execution(filtered, columns)
+    return compute_rd_issue_dynamics(filtered, columns)
+
+
+def _rd_delay(df):
+    columns, message = find_rd_delay_columns(df)
+    if message:
+        return message
+    return compute_rd_delay(df, columns)
+
+
+def _contractor_analytics(df, average_columns=('Среднее за неделю', 'Среднее за месяц')):
+    prepared, message = prepare_contractor_data(df, average_columns)
+    if message:
+        return message
+    return compute_contractor_analytics(prepared['data'], prepared['project_col'])
+
+
+def _skud(df):
+    prepared, message = prepare_skud_data(df)
+    if message:
+        return message
+    return compute_skud(prepared['data'], prepared)
+
+
+# Case name -> (data kind, function of the loaded datasets)
+CASES = {
+    'detect_data_type[project]': ('project', lambda d: detect_data_type(d['project'], 'project.csv')),
+    'detect_data_type[resources]': ('resources', lambda d: detect_data_type(d['resources'], 'resources.csv')),
+    'detect_data_type[technique]': ('technique', lambda d: detect_data_type(d['technique'], 'technique.csv')),
+    'calculate_approved_budget': ('project', lambda d: calculate_approved_budget(d['project'])),
+    'fill_project_gaps': ('project', lambda d: fill_project_gaps(d['project'], only_missing=True)),
+    'filter[project]': ('project', lambda d: apply_filters(d['project'], {'project name': _first_project(d['project'])})),
+    'filter[project+section+reason]': ('project', lambda d: apply_filters(d['project'], {
+        'project name': _first_project(d['project']),
+        'section': d['project']['section'].iloc[0],
+        'reason of deviation': d['project']['reason of deviation'].iloc[0],
+    })),
+    'Динамика отклонений по месяцам': ('project', lambda d: compute_reasons_of_deviation(d['project'])),
+    'Динамика отклонений': ('project', lambda d: compute_dynamics_of_deviations(d['project'])),
+    'Динамика причин отклонений': ('project', lambda d: compute_dynamics_of_reasons(d['project'])),
+    'Отклонение текущего срока от базового плана': ('project', lambda d: compute_plan_fact_dates(d['project'])),
+    'Значения отклонений от базового плана': ('project', lambda d: (compute_deviation_by_tasks(d['project']),
+                                                                    compute_deviation_detail(d['project']))),
+    'БДДС по месяцам': ('project', lambda d: compute_budget_by_period(d['project'])),
+    'БДДС накопительно': ('project', lambda d: compute_budget_cumulative(d['project'])),
+    'БДДС по лотам': ('project', lambda d: compute_budget_by_section(d['project'])),
+    'Бюджет план/факт': ('project', lambda d: compute_budget_by_type(d['project'])),
+    'Утвержденный бюджет': ('project', lambda d: compute_approved_budget(d['project'])),
+    'Прогнозный бюджет': ('project', lambda d: compute_forecast_budget(d['project'], _first_project(d['project']))),
+    'Выдача рабочей/проектной документации': ('project', lambda d: (_documentation(d['project']),
+                                                                    _rd_delay(d['project']))),
+    'Аналитика по технике': ('technique', lambda d: _contractor_analytics(d['technique'], ('Среднее за месяц',))),
+    'График движения рабочей силы': ('resources', lambda d: _contractor_analytics(
+        combine_workforce_data(d['resources'], d['technique']))),
+    'СКУД стройка': ('resources', lambda d: _skud(d['resources'])),
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _record(results, case, size, timings):
+    results.append({
+        'case': case,
+        'size': size,
+        'min_s': round(min(timings), 6),
+        'median_s': round(statistics.median(timings), 6),
+        'runs': len(timings),
+    })
+    print(f"  {case:<50} {min(timings):10.4f}s (median {statistics.median(timings):.4f}s)")
+
+
+def run_benchmarks(sizes, cases, data_dir, repeat=3, seed=42, max_seconds=60.0):
+    """
+    Time the selected cases at every size.
+
+    A case whose best time exceeds max_seconds is skipped at larger sizes.
+
+    Returns:
+        (results, skipped): results is a list of dicts with case, size,
+        min_s, median_s and runs; skipped lists (case, size) pairs
+    """
+    results = []
+    skipped = []
+    too_slow = set()
+    needed_kinds = {CASES[case][0] for case in cases if case in CASES}
+    if any(case == 'График движения рабочей силы' for case in cases):
+        needed_kinds.add('technique')
+
+    for size in sizes:
+        print(f"\n{size} rows")
+        datasets = {}
+        for kind in DATA_KINDS:
+            if kind not in needed_kinds and 'load_data' not in cases:
+                continue
+            path = write_dataset(kind, size, data_dir, seed)
+            if 'load_data' in cases:
+                _record(results, f'load_data[{kind}]', size, _time_call(lambda: read_data_file(path), repeat))
+            datasets[kind] = read_data_file(path)
+
+        for case in cases:
+            if case == 'load_data':
+                continue
+            if case in too_slow:
+                skipped.append((case, size))
+                continue
+            timings = _time_call(lambda: CASES[case][1](datasets), repeat)
+            _record(results, case, size, timings)
+            if min(timings) > max_seconds:
+                too_slow.add(case)
+    return results, skipped
+
+
+def compare_results(baseline_path, current_path, threshold=1.2):
+    """
+    Print per-case ratios between two result files.
+
+    Returns:
+        Number of cases slower than threshold × baseline
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)
+
+    baseline_times = {(r['case'], r['size']): r['min_s'] for r in baseline['results']}
+    print(f"{baseline.get('commit')} -> {current.get('commit')}")
+    regressions = 0
+    for r in current['results']:
+        key = (r['case'], r['size'])
+        if key not in baseline_times or baseline_times[key] == 0:
+            continue
+        ratio = r['min_s'] / baseline_times[key]
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  {r['case']:<50} {r['size']:>8} {baseline_times[key]:10.4f}s -> {r['min_s']:10.4f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark data loading and dashboard computations')
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES), help='Row counts')
+    parser.add_argument('--cases', nargs='+', default=['load_data'] + list(CASES),
+                        help='Cases to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case (best and median are recorded)')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+    parser.add_argument('--max-seconds', type=float, default=60.0,
+                        help='Skip a case at larger sizes once a run takes longer than this')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Directory for generated data files')
+    parser.add_argument('--output', default=None, help='Result JSON file (default: benchmark_<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two result files instead of running benchmarks')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio reported as regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare_results(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    unknown = [case for case in args.cases if case != 'load_data' and case not in CASES]
+    if unknown:
+        print(f"Unknown cases: {', '.join(unknown)}")
+        print(f"Supported cases: load_data, {', '.join(CASES)}")
+        sys.exit(1)
+
+    commit = _git_commit()
+    results, skipped = run_benchmarks(args.sizes, args.cases, args.data_dir, args.repeat,
+                                      args.seed, args.max_seconds)
+    report = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+        'skipped': [{'case': case, 'size': size} for case, size in skipped],
+    }
+    output = args.output or f"benchmark_{commit or 'local'}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Префиксные суммы бюджета по месяцам
+
+Панели БДДС суммируют бюджет (план, факт, резерв, скорректированный) по
+периодам плана - месяцу, кварталу или году окончания задачи (plan end) -
+и строят накопительные итоги. Вместо группировки отфильтрованных строк
+на каждый запрос бюджет один раз на версию данных раскладывается по
+ячейкам (уникальным сочетаниям значений колонок группировки и фильтров)
+и месяцам, и для каждой ячейки хранятся префиксные суммы по месяцам
+(interval_index.IntervalIndex с интервалом в один месяц). Тогда
+
+- сумма за диапазон месяцев [с, по] - разность двух префиксных сумм;
+- сумма за квартал или год - диапазон его месяцев;
+- накопительный итог на конец периода - диапазон от первого месяца данных,
+
+и каждый ответ на ячейку не зависит от числа задач в ней.
+
+Ячейки строятся при первом запросе для набора колонок (колонка
+группировки и колонки активных фильтров) и хранятся вместе с индексом.
+Функции принимают те же аргументы и возвращают то же, что budget_summary
+движков расчетов (backends), или None - тогда панель считает как раньше.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype
+
+import backends
+from interval_index import IntervalIndex
+
+# Колонка периода плана -> код частоты; все периоды плана считаются по месяцу plan end
+PERIOD_FREQS = {'plan_month': 'M', 'plan_quarter': 'Q', 'plan_year': 'Y'}
+
+RESERVE_COLUMN = 'reserve budget'
+
+
+class BudgetIndex:
+    """Бюджеты по месяцам plan end с префиксными суммами по ячейкам"""
+
+    def __init__(self, df):
+        frame, _ = backends.snapshot_frame(df)
+        self.months = None
+        if 'plan end' in frame.columns:
+            self.months = frame.pop('plan end').to_numpy().astype('datetime64[M]')
+
+        values = {col: frame.pop(col) for col in backends.NUMBER_COLUMNS if col in frame.columns}
+        if 'budget plan' in values and 'budget fact' in values:
+            values[RESERVE_COLUMN] = values['budget plan'] - values['budget fact']
+        # Префиксные суммы считаются только для обычных числовых колонок
+        self.values = {col: series for col, series in values.items()
+                       if is_integer_dtype(series.dtype) or is_float_dtype(series.dtype)}
+        self.dtypes = {col: series.dtype for col, series in self.values.items()}
+        self.keys = frame
+
+        self.first_month = self.last_month = None
+        if self.months is not None and not np.isnat(self.months).all():
+            self.first_month, self.last_month = np.nanmin(self.months), np.nanmax(self.months)
+
+        self._lock = threading.Lock()
+        self._cells = {}  # колонки ячеек -> (ключи ячеек, IntervalIndex по всем колонкам бюджета)
+
+    def can_answer(self, filters, group_col, value_cols):
+        return (self.first_month is not None and group_col in self.keys.columns
+                and all(column in self.keys.columns for column, _ in filters)
+                and all(col in self.values for col in value_cols))
+
+    def _cell_index(self, columns):
+        with self._lock:
+            cached = self._cells.get(columns)
+        if cached is not None:
+            return cached
+
+        grouped = self.keys.groupby(list(columns), dropna=False, sort=True)
+        codes = grouped.ngroup().to_numpy()
+        cell_keys = grouped.size().index.to_frame(index=False)
+        weights = np.column_stack([series.to_numpy() for series in self.values.values()])
+        index = IntervalIndex(self.months, groups=codes, weights=weights)
+
+        with self._lock:
+            return self._cells.setdefault(columns, (cell_keys, index))
+
+    def _select(self, filters, group_col):
+        """Ячейки, подходящие под фильтры: (номера ячеек, номера групп, значения групп, индекс)"""
+        columns = (group_col,) + tuple(sorted({col for col, _ in filters} - {group_col}))
+        cell_keys, index = self._cell_index(columns)
+        mask = np.ones(len(cell_keys), dtype=bool)
+        for column, value in filters:
+            # Как dashboard_data.build_filter_mask, но по ячейкам, а не по строкам
+            mask &= (cell_keys[column].astype(str).str.strip() == str(value).strip()).to_numpy()
+        # Строки без значения группировки в суммы не входят (как в groupby)
+        mask &= cell_keys[group_col].notna().to_numpy()
+        cells = np.flatnonzero(mask)
+        group_codes, group_values = pd.factorize(cell_keys[group_col].iloc[cells], sort=True)
+        return cells, group_codes, group_values, index
+
+    def _periods(self, freq_code):
+        """Периоды от первого до последнего месяца данных и их первые и последние дни"""
+        periods = pd.period_range(pd.Period(self.first_month, 'M'), pd.Period(self.last_month, 'M'), freq=freq_code)
+        first_days = periods.start_time.to_numpy().astype('datetime64[D]')
+        last_days = periods.end_time.to_numpy().astype('datetime64[D]')
+        return periods, first_days, last_days
+
+    def _by_group(self, sums, group_codes, size):
+        """Суммирует строки sums (по ячейкам) в строки групп"""
+        result = np.zeros((size,) + sums.shape[1:], dtype=sums.dtype)
+        np.add.at(result, group_codes, sums)
+        return result
+
+    def restore_dtypes(self, result, value_cols):
+        """Типы сумм, как у pandas (см. backends.sum_dtype)"""
+        dtypes = {}
+        for col in value_cols:
+            sources = ('budget plan', 'budget fact') if col == RESERVE_COLUMN else (col,)
+            dtypes[col] = backends.sum_dtype(*(self.dtypes[source] for source in sources))
+        return result.astype(dtypes)
+
+    def period_sums(self, filters, group_col, value_cols, freq_code, cumulative=False):
+        """
+        Суммы (или накопительные итоги) бюджета по периодам и значениям group_col
+
+        Returns:
+            (periods, group_values, counts, sums): periods - PeriodIndex,
+            group_values - значения group_col, counts - число строк периода
+            (группы x периоды), sums - массив группы x периоды x value_cols
+        """
+        cells, group_codes, group_values, index = self._select(filters, group_col)
+        periods, first_days, last_days = self._periods(freq_code)
+        cell_count, period_count = len(cells), len(periods)
+
+        groups = np.repeat(cells, period_count)
+        starts = np.tile(first_days, cell_count)
+        ends = np.tile(last_days, cell_count)
+        counts = index.count(starts, ends, groups).reshape(cell_count, period_count)
+        if cumulative:
+            starts = np.full(len(ends), first_days[0])
+        positions = [list(self.values).index(col) for col in value_cols]
+        sums = index.sum(starts, ends, groups)[:, positions].reshape(cell_count, period_count, len(value_cols))
+
+        counts = self._by_group(counts, group_codes, len(group_values))
+        sums = self._by_group(sums, group_codes, len(group_values))
+        return periods, group_values, counts, sums
+
+
+_index = backends.SnapshotCache(BudgetIndex)
+
+
+def _index_for(df, filters, period_col, freq_code, group_col, value_cols):
+    if PERIOD_FREQS.get(period_col) != freq_code or period_col not in df.columns \
+            or not isinstance(df[period_col].dtype, pd.PeriodDtype):
+        return None
+    index = _index.get(df)
+    return index if index.can_answer(filters, group_col, value_cols) else None
+
+
+def budget_summary(df, filters, period_col, freq_code, group_col, value_cols):
+    """
+    Суммы бюджета по периоду плана и ключу группировки (см. sql_engine.budget_summary)
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить без индекса
+        (или под фильтры не подходит ни одна строка)
+    """
+    index = _index_for(df, filters, period_col, freq_code, group_col, value_cols)
+    if index is None:
+        return None
+
+    periods, group_values, counts, sums = index.period_sums(filters, group_col, value_cols, freq_code)
+    # Строки в порядке groupby: период, затем значение группировки
+    period_numbers, group_numbers = np.nonzero(counts.T)
+    if not len(period_numbers):
+        return None
+
+    result = pd.DataFrame(sums[group_numbers, period_numbers], columns=list(value_cols))
+    result.insert(0, group_col, group_values[group_numbers])
+    result.insert(0, period_col, periods[period_numbers].astype(df[period_col].dtype))
+    backends.restore_keys(result, df, [group_col])
+    return index.restore_dtypes(result, value_cols)
+
+
+def cumulative_totals(df, filters, period_col, freq_code, group_col, value_cols):
+    """
+    Накопительные итоги бюджета на конец каждого периода плана
+
+    Суммируются строки с заполненным group_col, подходящие под фильтры,
+    с первого месяца данных до конца периода.
+
+    Returns:
+        DataFrame с индексом по периодам, в которых есть строки, и колонками
+        value_cols, или None, если расчет нужно выполнить без индекса
+        (или под фильтры не подходит ни одна строка)
+    """
+    index = _index_for(df, filters, period_col, freq_code, group_col, value_cols)
+    if index is None:
+        return None
+
+    periods, _, counts, sums = index.period_sums(filters, group_col, value_cols, freq_code, cumulative=True)
+    present = counts.sum(axis=0) > 0
+    if not present.any():
+        return None
+    result = pd.DataFrame(sums.sum(axis=0)[present], columns=list(value_cols),
+                          index=periods[present].astype(df[period_col].dtype))
+    return index.restore_dtypes(result, value_cols)
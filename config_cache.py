@@ -0,0 +1,110 @@
+"""
+Кэш конфигурации отчетов в памяти
+
+Фильтры по умолчанию (default_filters) и параметры отчетов
+(report_parameters) загружаются из SQLite одним запросом на таблицу и
+хранятся в словарях по ключам (роль, отчет) и (отчет, параметр). Чтение -
+поиск в словаре без обращения к базе.
+
+Функции записи модулей filters и report_params вызывают bump_version, и
+следующее чтение перезагружает кэш.
+"""
+import sqlite3
+import threading
+
+from auth import DB_PATH
+
+_lock = threading.Lock()
+_version = 0
+_loaded_version = None
+_filters = {}     # (role, report_name) -> {filter_key: {'value', 'type', 'updated_at', 'updated_by'}}
+_parameters = {}  # (report_name, parameter_key) -> словарь параметра
+
+
+def bump_version():
+    """Помечает кэш устаревшим (вызывается после каждой записи конфигурации)"""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def get_version():
+    """Текущая версия конфигурации"""
+    return _version
+
+
+def _load():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    filters = {}
+    parameters = {}
+    try:
+        cursor.execute('''
+            SELECT role, report_name, filter_key, filter_value, filter_type, updated_at, updated_by
+            FROM default_filters
+        ''')
+        for role, report_name, filter_key, filter_value, filter_type, updated_at, updated_by in cursor.fetchall():
+            filters.setdefault((role, report_name), {})[filter_key] = {
+                'value': filter_value,
+                'type': filter_type,
+                'updated_at': updated_at,
+                'updated_by': updated_by
+            }
+
+        cursor.execute('''
+            SELECT report_name, parameter_key, parameter_value, parameter_type, description,
+                   is_editable_by_analyst, updated_at, updated_by
+            FROM report_parameters
+        ''')
+        for (report_name, parameter_key, value, parameter_type, description,
+             editable, updated_at, updated_by) in cursor.fetchall():
+            parameters[(report_name, parameter_key)] = {
+                'value': value,
+                'type': parameter_type,
+                'description': description,
+                'is_editable_by_analyst': bool(editable),
+                'updated_at': updated_at,
+                'updated_by': updated_by
+            }
+    except sqlite3.OperationalError:
+        # Таблицы еще не созданы (init_db не вызывался)
+        pass
+    finally:
+        conn.close()
+    return filters, parameters
+
+
+def _ensure_loaded():
+    global _filters, _parameters, _loaded_version
+    if _loaded_version == _version:
+        return
+    with _lock:
+        version = _version
+        if _loaded_version == version:
+            return
+        _filters, _parameters = _load()
+        _loaded_version = version
+
+
+def get_filters(role, report_name):
+    """Фильтры по умолчанию роли для отчета: {ключ: словарь фильтра}"""
+    _ensure_loaded()
+    return _filters.get((role, report_name), {})
+
+
+def get_report_filters(report_name):
+    """Фильтры по умолчанию всех ролей для отчета: {роль: {ключ: словарь фильтра}}"""
+    _ensure_loaded()
+    return {role: filters for (role, report), filters in _filters.items() if report == report_name}
+
+
+def get_parameter(report_name, parameter_key):
+    """Параметр отчета (словарь) или None"""
+    _ensure_loaded()
+    return _parameters.get((report_name, parameter_key))
+
+
+def get_parameters(report_name):
+    """Все параметры отчета: {ключ: словарь параметра}"""
+    _ensure_loaded()
+    return {key: parameter for (report, key), parameter in _parameters.items() if report == report_name}
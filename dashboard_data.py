@@ -0,0 +1,2571 @@
+"""
+Расчетный слой панелей аналитики.
+
+Функции модуля не обращаются к Streamlit: принимают DataFrame и словарь
+фильтров, возвращают подготовленные для графиков и таблиц данные.
+Каждая функция compute_* возвращает кортеж (result, error), где result -
+словарь с результирующими DataFrame, а error - текст сообщения для
+пользователя (или None).
+"""
+from datetime import date, datetime
+
+import pandas as pd
+import numpy as np
+
+import backends
+import budget_index
+from schedule_hierarchy import ScheduleHierarchy
+from date_parser import ensure_datetime
+from interval_index import IntervalIndex, month_windows, task_intervals
+from jobs import checkpoint
+from schema import ensure_numeric
+from perf import timed
+
+
+# Значение фильтра "без ограничения"
+ALL_VALUES = 'Все'
+
+# Russian month names mapping
+RUSSIAN_MONTHS = {
+    1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
+    5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
+    9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
+}
+
+# Колонки периодов плана для группировки по месяцам/кварталам/годам
+PLAN_PERIOD_COLUMNS = {
+    'Месяц': ('plan_month', 'Месяц', 'M'),
+    'Квартал': ('plan_quarter', 'Квартал', 'Q'),
+    'Год': ('plan_year', 'Год', 'Y'),
+}
+
+VIEW_CUMULATIVE = 'Накопительно'
+VIEW_MONTHLY = 'За месяц'
+
+# Сколько категорий (контрагентов, причин) графики показывают по отдельности; остальные - в 'Прочие'
+TOP_CATEGORIES = 15
+OTHER_CATEGORY = 'Прочие'
+
+
+class InfoMessage(str):
+    """
+    Сообщение об отсутствии данных (показывается как st.info).
+
+    Остальные строки ошибок, возвращаемые функциями compute_*, показываются
+    как предупреждения.
+    """
+
+
+def get_russian_month_name(period_val):
+    """Get Russian month name from Period object"""
+    if isinstance(period_val, pd.Period):
+        # For monthly periods, get month number
+        if period_val.freqstr == 'M' or period_val.freqstr.startswith('M'):
+            month_num = period_val.month
+            return RUSSIAN_MONTHS.get(month_num, period_val.strftime('%B'))
+        # For other periods, try to extract month if possible
+        try:
+            month_num = period_val.month
+            return RUSSIAN_MONTHS.get(month_num, '')
+        except:
+            return ''
+    elif isinstance(period_val, (int, pd.Timestamp)):
+        month_num = period_val.month if hasattr(period_val, 'month') else period_val
+        return RUSSIAN_MONTHS.get(month_num, '')
+    elif isinstance(period_val, str):
+        # Try to parse string like "2025-01" or "2025-01-01"
+        try:
+            if '-' in period_val:
+                parts = period_val.split('-')
+                if len(parts) >= 2:
+                    month_num = int(parts[1])
+                    return RUSSIAN_MONTHS.get(month_num, '')
+        except:
+            pass
+    return ''
+
+
+def _format_year_month_string(period_str):
+    """Форматирует строку вида '2025-01' как 'Январь 2025' (или None)"""
+    try:
+        if '-' in period_str:
+            parts = period_str.split('-')
+            if len(parts) >= 2:
+                month_num = int(parts[1])
+                month_name = RUSSIAN_MONTHS.get(month_num, '')
+                if month_name:
+                    return f"{month_name} {parts[0]}"
+    except:
+        pass
+    return None
+
+
+def format_period_display(period_val):
+    """
+    Форматирует период для отображения на графиках
+
+    Args:
+        period_val: pd.Period (месяц, квартал, год) или строка вида '2025-01'
+
+    Returns:
+        Строка 'Январь 2025', 'Q1 2025' или '2025'
+    """
+    if pd.isna(period_val):
+        return 'Н/Д'
+    if isinstance(period_val, pd.Period):
+        try:
+            if period_val.freqstr == 'M' or period_val.freqstr.startswith('M'):  # Month
+                return f"{get_russian_month_name(period_val)} {period_val.year}"
+            elif period_val.freqstr == 'Q' or period_val.freqstr.startswith('Q'):  # Quarter
+                return f"Q{period_val.quarter} {period_val.year}"
+            elif period_val.freqstr == 'Y' or period_val.freqstr == 'A-DEC' or period_val.freqstr.startswith('Y'):  # Year
+                return str(period_val.year)
+            else:
+                return f"{get_russian_month_name(period_val)} {period_val.year}"
+        except:
+            return _format_year_month_string(str(period_val)) or str(period_val)
+    elif isinstance(period_val, str):
+        formatted = _format_year_month_string(period_val)
+        if formatted:
+            return formatted
+    elif isinstance(period_val, (date, datetime)):
+        return period_val.strftime('%d.%m.%Y')
+    return str(period_val)
+
+
+def format_periods(values):
+    """format_period_display для колонки: каждое уникальное значение форматируется один раз"""
+    labels = {value: format_period_display(value) for value in values.dropna().unique()}
+    return values.map(labels).fillna(format_period_display(None))
+
+
+def format_month_label(period_val):
+    """Форматирует месячный период как 'Январь 2025'"""
+    if pd.isna(period_val):
+        return 'Н/Д'
+    if isinstance(period_val, pd.Period):
+        try:
+            return f"{get_russian_month_name(period_val)} {period_val.year}"
+        except:
+            return str(period_val)
+    return str(period_val)
+
+
+def month_label_to_period(month_label):
+    """
+    Преобразует подпись месяца 'Январь 2025' обратно в pd.Period
+
+    Returns:
+        pd.Period с частотой 'M' или None, если подпись не распознана
+    """
+    try:
+        parts = str(month_label).split()
+        if len(parts) == 2:
+            month_name, year = parts
+            for num, russian_name in RUSSIAN_MONTHS.items():
+                if russian_name == month_name:
+                    return pd.Period(f'{year}-{num:02d}', freq='M')
+    except:
+        pass
+    return None
+
+
+def get_filter_options(df, column, all_label=ALL_VALUES):
+    """
+    Список значений для выпадающего фильтра: ['Все'] + уникальные значения колонки
+
+    Returns:
+        Список значений или None, если колонки нет в данных
+    """
+    if column not in df.columns:
+        return None
+    return [all_label] + sorted(df[column].dropna().unique().tolist())
+
+
+def active_filters(df, filters):
+    """
+    Фильтры, которые ограничивают строки
+
+    Args:
+        df: DataFrame
+        filters: Словарь {колонка: выбранное значение}. Значения 'Все' и None,
+            а также отсутствующие в данных колонки пропускаются.
+
+    Returns:
+        Список пар (колонка, значение)
+    """
+    return [
+        (column, value) for column, value in (filters or {}).items()
+        if value is not None and value != ALL_VALUES and column in df.columns
+    ]
+
+
+def build_filter_mask(df, filters):
+    """
+    Строит булеву маску строк по словарю фильтров (см. active_filters)
+
+    Returns:
+        pd.Series с булевыми значениями или None, если фильтры не заданы
+    """
+    mask = None
+    for column, value in active_filters(df, filters):
+        column_mask = df[column].astype(str).str.strip() == str(value).strip()
+        mask = column_mask if mask is None else (mask & column_mask)
+    return mask
+
+
+@timed('filtering')
+def apply_filters(df, filters):
+    """
+    Применяет фильтры к данным
+
+    Returns:
+        Отфильтрованная копия DataFrame
+    """
+    mask = build_filter_mask(df, filters)
+    if mask is None:
+        return df.copy()
+    return df[mask].copy()
+
+
+def deviation_mask(df):
+    """Маска задач с отклонением (deviation = True / 1 / 'true' / '1')"""
+    deviation = df['deviation']
+    if deviation.dtype == bool:
+        # Typed at load time (schema.apply_schema)
+        return deviation
+    return (
+        (deviation == True) |
+        (deviation == 1) |
+        (deviation.astype(str).str.lower() == 'true') |
+        (deviation.astype(str).str.strip() == '1')
+    )
+
+
+def limit_categories(data, label_col, rank_by, sum_cols, limit=TOP_CATEGORIES):
+    """
+    Top-N категорий для графика и строка 'Прочие' с суммами остальных
+
+    Args:
+        data: Агрегаты по категориям (одна строка на категорию)
+        label_col: Колонка категории
+        rank_by: Колонка или массив значений для выбора top-N (пустые - в конце)
+        sum_cols: Колонки, которые суммируются в строку 'Прочие' (остальные пустые)
+        limit: Число категорий, показываемых по отдельности
+
+    Returns:
+        (chart_data, others): chart_data - top-N строк в исходном порядке и
+        строка 'Прочие' в конце, others - свернутые строки; если категорий
+        не больше limit, (data, None)
+    """
+    if len(data) <= limit:
+        return data, None
+    rank = np.asarray(data[rank_by] if isinstance(rank_by, str) else rank_by, dtype='float64')
+    rank = np.where(np.isnan(rank), -np.inf, rank)
+    # argpartition выбирает top-N без полной сортировки
+    top = np.zeros(len(data), dtype=bool)
+    top[np.argpartition(-rank, limit - 1)[:limit]] = True
+
+    others = data[~top]
+    other_row = pd.DataFrame({label_col: [OTHER_CATEGORY], **{col: [others[col].sum()] for col in sum_cols}})
+    return pd.concat([data[top], other_row], ignore_index=True), others.reset_index(drop=True)
+
+
+def get_plan_period_column(period_type):
+    """
+    Колонка периода плана по типу группировки
+
+    Args:
+        period_type: 'Месяц', 'Квартал' или 'Год'
+
+    Returns:
+        Кортеж (колонка, подпись, код частоты)
+    """
+    return PLAN_PERIOD_COLUMNS.get(period_type, PLAN_PERIOD_COLUMNS['Месяц'])
+
+
+def find_adjusted_budget_column(df):
+    """Имя колонки скорректированного бюджета или None"""
+    if 'budget adjusted' in df.columns:
+        return 'budget adjusted'
+    if 'adjusted budget' in df.columns:
+        return 'adjusted budget'
+    return None
+
+
+def _sort_by_original_period(data, freq_code):
+    """Сортирует агрегат по исходному (неформатированному) периоду"""
+    if data['period_original'].dtype == 'object':
+        # Try to convert to sortable format
+        try:
+            data['period_sort'] = data['period_original'].apply(
+                lambda x: x if isinstance(x, pd.Period) else pd.Period(str(x), freq=freq_code) if pd.notna(x) else None
+            )
+            data = data.sort_values('period_sort').copy()
+            return data.drop('period_sort', axis=1)
+        except:
+            # If conversion fails, try to sort by string representation
+            return data.sort_values('period_original').copy()
+    return data.sort_values('period_original').copy()
+
+
+# ==================== Динамика отклонений по месяцам ====================
+def compute_reasons_of_deviation(df, filters=None, month=ALL_VALUES):
+    """
+    Расчет для панели "Динамика отклонений по месяцам"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, task name, section, block, reason of deviation)
+        month: Подпись месяца ('Январь 2025'), pd.Period или 'Все'
+
+    Returns:
+        (result, error): result содержит 'filtered', 'reason_counts',
+        'reason_chart' и 'reason_others' (top-N причин и 'Прочие', см.
+        limit_categories) и метрики
+    """
+    filtered_df = apply_filters(df, filters)
+
+    if month is not None and month != ALL_VALUES and 'plan_month' in filtered_df.columns:
+        selected_period = month if isinstance(month, pd.Period) else month_label_to_period(month)
+        if selected_period is not None:
+            filtered_df = filtered_df[filtered_df['plan_month'] == selected_period]
+        else:
+            # Fallback: try to match formatted string
+            filtered_df = filtered_df[filtered_df['plan_month'].apply(format_month_label) == month]
+
+    # Filter only tasks with deviations
+    if 'deviation' in filtered_df.columns:
+        filtered_df = filtered_df[deviation_mask(filtered_df)]
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных для выбранных фильтров.")
+
+    result = {
+        'filtered': filtered_df,
+        'total_tasks': len(filtered_df),
+        'avg_deviation_days': None,
+        'unique_reasons': None,
+        'reason_counts': None,
+    }
+    if 'deviation in days' in filtered_df.columns:
+        result['avg_deviation_days'] = ensure_numeric(filtered_df['deviation in days']).mean()
+    if 'reason of deviation' in filtered_df.columns:
+        result['unique_reasons'] = filtered_df['reason of deviation'].nunique()
+        reason_counts = filtered_df['reason of deviation'].value_counts().reset_index()
+        reason_counts.columns = ['Причина', 'Количество']
+        result['reason_counts'] = reason_counts
+        result['reason_chart'], result['reason_others'] = limit_categories(
+            reason_counts, 'Причина', 'Количество', ['Количество'])
+    return result, None
+
+
+def get_available_months(df):
+    """Отсортированные подписи месяцев плана для фильтра 'Месяц'"""
+    unique_months = []
+    if 'plan_month' in df.columns:
+        unique_months = df['plan_month'].dropna().unique()
+    elif 'plan end' in df.columns:
+        mask = df['plan end'].notna()
+        if mask.any():
+            unique_months = df.loc[mask, 'plan end'].dt.to_period('M').unique()
+    if len(unique_months) == 0:
+        return []
+    month_dict = {format_month_label(m): m for m in unique_months}
+    return sorted(month_dict.keys(), key=lambda x: month_dict[x])
+
+
+# ==================== Динамика отклонений ====================
+# Тип группировки -> (код частоты, подпись, окончание сообщения об ошибке)
+DEVIATION_PERIODS = {
+    'День': ('D', 'День', 'дням'),
+    'Месяц': ('M', 'Месяц', 'месяцам'),
+    'Квартал': ('Q', 'Квартал', 'кварталам'),
+    'Год': ('Y', 'Год', 'годам'),
+}
+
+ALL_PERIODS = 'Весь период'
+
+
+def add_plan_end_period(df, freq_code, column='period'):
+    """
+    Добавляет колонку периода по дате окончания плана
+
+    Args:
+        df: DataFrame (изменяется на месте)
+        freq_code: 'D' (дата), 'M', 'Q' или 'Y'
+        column: Имя добавляемой колонки
+    """
+    mask = df['plan end'].notna()
+    if freq_code == 'D':
+        df.loc[mask, column] = df.loc[mask, 'plan end'].dt.date
+    else:
+        df.loc[mask, column] = df.loc[mask, 'plan end'].dt.to_period(freq_code)
+    return df
+
+
+def compute_dynamics_of_deviations(df, filters=None, period_type='Месяц'):
+    """
+    Расчет для панели "Динамика отклонений"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, reason of deviation)
+        period_type: 'День', 'Месяц', 'Квартал' или 'Год'
+
+    Returns:
+        (result, error): result содержит 'filtered' (задачи с отклонениями и
+        колонкой period), 'grouped' (агрегат по периоду/проекту/причине),
+        'by_project', 'by_reason', 'period_totals', 'group_cols',
+        'period_label' и 'freq_code'
+    """
+    filtered_df = apply_filters(df, filters)
+
+    # Filter only tasks with deviations - check for deviation = 1 or True
+    if 'deviation' in filtered_df.columns:
+        filtered_df = filtered_df[deviation_mask(filtered_df)]
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных для выбранных фильтров.")
+
+    freq_code, period_label, period_text = DEVIATION_PERIODS.get(period_type, DEVIATION_PERIODS['Месяц'])
+
+    # Extract period from plan end dates
+    if 'plan end' not in filtered_df.columns:
+        return None, f"Поле 'plan end' не найдено для группировки по {period_text}."
+    add_plan_end_period(filtered_df, freq_code)
+
+    # Filter out rows without period data
+    filtered_df = filtered_df[filtered_df['period'].notna()]
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных с указанными периодами.")
+
+    # Convert deviation in days to numeric
+    if 'deviation in days' in filtered_df.columns:
+        filtered_df['deviation in days'] = ensure_numeric(filtered_df['deviation in days'])
+
+    # Group by project, period, and reason - count deviation days
+    group_cols = ['period']
+    if 'project name' in filtered_df.columns:
+        group_cols.append('project name')
+    if 'reason of deviation' in filtered_df.columns:
+        group_cols.append('reason of deviation')
+
+    # Aggregate: count tasks and sum deviation days
+    agg_dict = {'deviation': 'count'}  # Count tasks
+    if 'deviation in days' in filtered_df.columns:
+        agg_dict['deviation in days'] = 'sum'  # Sum deviation days
+
+    checkpoint("Группировка по периодам")
+    grouped_data = backends.run('deviation_dynamics', df, active_filters(df, filters), freq_code, group_cols)
+    if grouped_data is None:
+        grouped_data = filtered_df.groupby(group_cols).agg(agg_dict).reset_index()
+    checkpoint("Итоги по проектам и причинам")
+    grouped_data = grouped_data.rename(columns={
+        'deviation': 'Количество задач',
+        'deviation in days': 'Всего дней отклонений'
+    })
+    if 'Всего дней отклонений' in grouped_data.columns:
+        # Calculate average: sum / count of tasks
+        grouped_data['Среднее дней отклонений'] = (
+            grouped_data['Всего дней отклонений'] / grouped_data['Количество задач']
+        ).round(2)
+    else:
+        grouped_data['Всего дней отклонений'] = 0
+        grouped_data['Среднее дней отклонений'] = 0
+
+    grouped_data['period'] = format_periods(grouped_data['period'])
+
+    by_project = None
+    if 'project name' in group_cols:
+        # If reason is also in group_cols, aggregate by period and project only (sum across reasons)
+        if 'reason of deviation' in group_cols:
+            by_project = grouped_data.groupby(['period', 'project name']).agg({
+                'Всего дней отклонений': 'sum',
+                'Количество задач': 'sum'
+            }).reset_index()
+        else:
+            by_project = grouped_data
+
+    by_reason = None
+    period_totals = None
+    if 'reason of deviation' in group_cols:
+        # Агрегируем данные по периоду и причинам (один столбец за месяц с секторами по причинам)
+        if 'project name' in group_cols:
+            by_reason = grouped_data.groupby(['period', 'reason of deviation']).agg({
+                'Всего дней отклонений': 'sum',
+                'Количество задач': 'sum'
+            }).reset_index()
+        else:
+            by_reason = grouped_data
+        # Суммарные значения по каждому периоду для отображения над столбцами
+        period_totals = by_reason.groupby('period')['Всего дней отклонений'].sum().reset_index()
+
+    return {
+        'filtered': filtered_df,
+        'grouped': grouped_data,
+        'by_project': by_project,
+        'by_reason': by_reason,
+        'period_totals': period_totals,
+        'group_cols': group_cols,
+        'period_label': period_label,
+        'freq_code': freq_code,
+    }, None
+
+
+def compute_deviation_summary(filtered_df, group_cols, freq_code, project=ALL_VALUES,
+                              reason=ALL_VALUES, period=ALL_PERIODS):
+    """
+    Сводная таблица отклонений по проектам (и причинам) за выбранный период
+
+    Args:
+        filtered_df: 'filtered' из compute_dynamics_of_deviations
+        group_cols: 'group_cols' из compute_dynamics_of_deviations
+        freq_code: Код частоты группировки
+        project, reason: Фильтры таблицы ('Все' - без фильтра)
+        period: Отформатированный период или 'Весь период'
+
+    Returns:
+        DataFrame со строкой "Итого"
+    """
+    project_summary_cols = ['project name']
+    if 'reason of deviation' in group_cols:
+        project_summary_cols.append('reason of deviation')
+
+    summary_df = filtered_df
+    if project != ALL_VALUES and 'project name' in summary_df.columns:
+        summary_df = summary_df[summary_df['project name'] == project]
+    if reason != ALL_VALUES and 'reason of deviation' in summary_df.columns:
+        summary_df = summary_df[summary_df['reason of deviation'] == reason]
+    if period != ALL_PERIODS and 'plan end' in summary_df.columns:
+        # Фильтруем по отформатированному периоду
+        summary_periods = add_plan_end_period(summary_df[['plan end']].copy(), freq_code, 'temp_period')
+        period_mask = summary_periods['temp_period'].apply(format_period_display) == period
+        summary_df = summary_df[period_mask & summary_periods['plan end'].notna()]
+
+    # Aggregate by project (and reason if present) - sum across selected periods
+    project_summary = summary_df.groupby(project_summary_cols).agg({
+        'deviation': 'count',  # Count tasks
+        'deviation in days': 'sum' if 'deviation in days' in summary_df.columns else 'count'
+    }).reset_index()
+
+    period_col_name = f'Дни отклонений ({period})' if period != ALL_PERIODS else 'Всего дней отклонений'
+    project_summary = project_summary.rename(columns={
+        'deviation': 'Количество отклонений',
+        'deviation in days': period_col_name
+    })
+    if period_col_name not in project_summary.columns:
+        project_summary[period_col_name] = 0
+
+    # Sort by total deviation days (descending)
+    project_summary = project_summary.sort_values(period_col_name, ascending=False)
+
+    # Добавляем строку "Итого"
+    total_row = {}
+    for col in project_summary.columns:
+        if col in project_summary_cols:
+            total_row[col] = 'Итого'
+        elif col in ('Количество отклонений', period_col_name):
+            total_row[col] = int(project_summary[col].sum())
+        else:
+            total_row[col] = ''
+    return pd.concat([project_summary, pd.DataFrame([total_row])], ignore_index=True)
+
+
+# ==================== Отклонение текущего срока от базового плана ====================
+PROJECT_END_TASK = "Разрешение на ввод в эксплуатацию"
+CONSTRUCTION_PERMIT_TASK = "Разрешение на строительство"
+
+
+def format_date_display(date_val):
+    """Форматирует дату как 'ДД.ММ.ГГГГ' ('Н/Д' для пустых значений)"""
+    if pd.isna(date_val):
+        return 'Н/Д'
+    if isinstance(date_val, pd.Timestamp):
+        return date_val.strftime('%d.%m.%Y')
+    try:
+        dt = pd.to_datetime(date_val, errors='coerce', dayfirst=True)
+        if pd.notna(dt):
+            return dt.strftime('%d.%m.%Y')
+    except:
+        pass
+    return str(date_val) if date_val else 'Н/Д'
+
+
+def _gantt_entries(row, display_name):
+    """Записи План/Факт для диаграммы Ганта по строке задачи"""
+    entries = []
+    diff_days = row.get('total_diff_days', 0)
+    for type_name, start_col, end_col in (('План', 'plan start', 'plan end'), ('Факт', 'base start', 'base end')):
+        start = row.get(start_col)
+        end = row.get(end_col)
+        if pd.notna(start) and pd.notna(end):
+            entries.append({
+                'Задача': display_name,
+                'Тип': type_name,
+                'Дата начала': start,
+                'Дата окончания': end,
+                'Длительность': (end - start).days,
+                'Отклонение': diff_days
+            })
+    return entries
+
+
+def compute_plan_fact_dates(df, filters=None):
+    """
+    Расчет для панели "Отклонение текущего срока от базового плана"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, task name, section, block)
+
+    Returns:
+        (result, error): result содержит 'filtered' (задачи с рассчитанными
+        отклонениями), 'bars' (записи План/Факт для диаграммы Ганта,
+        отсортированные по дате начала) и 'summary' (таблица дат задач)
+    """
+    filtered_df = apply_filters(df, filters)
+    all_projects = (filters or {}).get('project name', ALL_VALUES) in (None, ALL_VALUES)
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных для выбранных фильтров.")
+
+    # First, ensure all dates are datetime objects
+    for col in ['plan start', 'plan end', 'base start', 'base end']:
+        if col in filtered_df.columns:
+            filtered_df[col] = ensure_datetime(filtered_df[col])
+
+    # Filter to rows that have at least plan OR fact dates (not necessarily both)
+    has_plan_dates = (filtered_df['plan start'].notna() & filtered_df['plan end'].notna())
+    has_fact_dates = (filtered_df['base start'].notna() & filtered_df['base end'].notna())
+    filtered_df = filtered_df[has_plan_dates | has_fact_dates]
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет задач с плановыми или фактическими датами для выбранных фильтров.")
+
+    # Calculate date differences for tasks that have both plan and fact
+    filtered_df['plan_start_diff'] = None
+    filtered_df['plan_end_diff'] = None
+    filtered_df['total_diff_days'] = 0
+
+    both_dates_mask = has_plan_dates & has_fact_dates
+    if both_dates_mask.any():
+        filtered_df.loc[both_dates_mask, 'plan_start_diff'] = (
+            filtered_df.loc[both_dates_mask, 'base start'] -
+            filtered_df.loc[both_dates_mask, 'plan start']
+        ).dt.days
+        filtered_df.loc[both_dates_mask, 'plan_end_diff'] = (
+            filtered_df.loc[both_dates_mask, 'base end'] -
+            filtered_df.loc[both_dates_mask, 'plan end']
+        ).dt.days
+        filtered_df.loc[both_dates_mask, 'total_diff_days'] = (
+            pd.to_numeric(filtered_df.loc[both_dates_mask, 'plan_end_diff']).abs()
+        )
+
+    # Sort by task name (alphabetically) for consistent display
+    filtered_df = filtered_df.sort_values('task name', ascending=True)
+
+    # Plan and fact side by side for each task. If "Все" projects selected,
+    # each task is shown for each project separately
+    checkpoint("Подготовка диаграммы Ганта")
+    bar_data = []
+    for task_name in filtered_df['task name'].unique().tolist():
+        checkpoint()
+        task_rows = filtered_df[filtered_df['task name'] == task_name]
+        if not all_projects:
+            task_rows = task_rows.iloc[:1]
+        for _, row in task_rows.iterrows():
+            display_name = f"{task_name} ({row.get('project name', 'Неизвестно')})"
+            bar_data.extend(_gantt_entries(row, display_name))
+
+    bar_df = pd.DataFrame(bar_data)
+    if not bar_df.empty:
+        # Sort tasks by start date (earliest first)
+        task_start_dates = bar_df.groupby('Задача')['Дата начала'].min().sort_values()
+        task_order = {task: idx for idx, task in enumerate(task_start_dates.index)}
+        bar_df['sort_order'] = bar_df['Задача'].map(task_order)
+        bar_df = bar_df.sort_values(['sort_order', 'Тип'], ascending=[True, True])
+        bar_df = bar_df.drop('sort_order', axis=1).reset_index(drop=True)
+
+    return {
+        'filtered': filtered_df,
+        'bars': bar_df,
+        'summary': _plan_fact_summary(filtered_df, all_projects),
+    }, None
+
+
+# ==================== Обзор графика работ (уровни детализации) ====================
+# Сколько задач (полос) диаграмма показывает по отдельности; больше - агрегаты по проектам или разделам
+DETAIL_BARS_LIMIT = 50
+
+# Уровни обзора: колонка -> (подпись оси, "по ..." для заголовков)
+OVERVIEW_LEVELS = {
+    'project name': ('Проект', 'проектам'),
+    'section': ('Раздел', 'разделам'),
+}
+
+
+def _schedule_frame(df):
+    """Строки задач для иерархии графика: колонки иерархии, даты и признаки отклонения"""
+    frame = pd.DataFrame({col: df[col] for col in ScheduleHierarchy.columns_in(df)})
+    dates = {col: ensure_datetime(df[col]) if col in df.columns else pd.Series(pd.NaT, index=df.index)
+             for col in ('plan start', 'plan end', 'base start', 'base end')}
+    # Даты берутся только парами, как на диаграмме Ганта
+    has_plan = dates['plan start'].notna() & dates['plan end'].notna()
+    has_fact = dates['base start'].notna() & dates['base end'].notna()
+    for col in ('plan start', 'plan end'):
+        frame[col] = dates[col].where(has_plan)
+    for col in ('base start', 'base end'):
+        frame[col] = dates[col].where(has_fact)
+    frame['tasks'] = (has_plan | has_fact).astype('int64')
+
+    deviation = deviation_mask(df) if 'deviation' in df.columns else pd.Series(False, index=df.index)
+    frame['deviation tasks'] = deviation.astype('int64')
+    if 'deviation in days' in df.columns:
+        frame['deviation days'] = ensure_numeric(df['deviation in days']).where(deviation)
+    else:
+        frame['deviation days'] = frame['deviation tasks']
+    return frame
+
+
+_schedule_hierarchies = backends.SnapshotCache(lambda data: ScheduleHierarchy(_schedule_frame(data)))
+
+
+def plan_fact_overview(df, filters=None, limit=DETAIL_BARS_LIMIT):
+    """
+    Обзор для панели "Отклонение текущего срока от базового плана"
+
+    Если под фильтры попадает больше limit задач с датами, вместо задач
+    показываются сроки проектов (проект не выбран) или разделов проекта
+    (раздел не выбран): минимум начала и максимум окончания плана и факта.
+
+    Returns:
+        Словарь с 'level' (колонка уровня), 'level_label', 'level_title',
+        'tasks' (число задач), 'bars' (записи План/Факт в формате
+        compute_plan_fact_dates с колонкой 'Задач') и 'summary' (таблица
+        сроков уровня), или None - показывать задачи
+    """
+    filters = filters or {}
+    if filters.get('project name', ALL_VALUES) in (None, ALL_VALUES):
+        level = 'project name'
+    elif filters.get('section', ALL_VALUES) in (None, ALL_VALUES):
+        level = 'section'
+    else:
+        return None
+
+    active = active_filters(df, filters)
+    hierarchy = _schedule_hierarchies.get(df)
+    if not hierarchy.has(level, *(column for column, _ in active)):
+        return None
+
+    groups = hierarchy.level([level], active)
+    groups = groups[groups['tasks'] > 0]
+    tasks = int(groups['tasks'].sum())
+    if tasks <= limit:
+        return None
+
+    bar_data = []
+    for row in groups.to_dict('records'):
+        if pd.notna(row['plan end']) and pd.notna(row['base end']):
+            # Отклонение окончания уровня: последний факт против последнего плана
+            row['total_diff_days'] = abs((row['base end'] - row['plan end']).days)
+        entries = _gantt_entries(row, row[level])
+        for entry in entries:
+            entry['Задач'] = row['tasks']
+        bar_data.extend(entries)
+
+    bar_df = pd.DataFrame(bar_data)
+    start_order = bar_df.groupby('Задача')['Дата начала'].min().sort_values()
+    bar_df['sort_order'] = bar_df['Задача'].map({name: idx for idx, name in enumerate(start_order.index)})
+    bar_df = bar_df.sort_values(['sort_order', 'Тип']).drop('sort_order', axis=1).reset_index(drop=True)
+
+    level_label, level_title = OVERVIEW_LEVELS[level]
+    summary = pd.DataFrame({
+        level_label: groups[level],
+        'Задач': groups['tasks'],
+        'План Начало': groups['plan start'].map(format_date_display),
+        'План Конец': groups['plan end'].map(format_date_display),
+        'Факт Начало': groups['base start'].map(format_date_display),
+        'Факт Конец': groups['base end'].map(format_date_display),
+        'Отклонение конца (дней)': (groups['base end'] - groups['plan end']).dt.days,
+    })
+
+    return {
+        'level': level,
+        'level_label': level_label,
+        'level_title': level_title,
+        'tasks': tasks,
+        'bars': bar_df,
+        'summary': summary.sort_values('Отклонение конца (дней)', ascending=False, na_position='last'),
+    }
+
+
+def add_completion_percent(bar_df):
+    """
+    Добавляет колонку 'Процент выполнения' (факт / план по длительности) к записям Ганта
+
+    Returns:
+        Копия bar_df с колонкой 'Процент выполнения'
+    """
+    bar_df = bar_df.copy()
+    for idx, row in bar_df.iterrows():
+        if row['Тип'] == 'План' and row['Длительность'] > 0:
+            # Find corresponding fact entry
+            fact_row = bar_df[(bar_df['Задача'] == row['Задача']) & (bar_df['Тип'] == 'Факт')]
+            if not fact_row.empty:
+                # Percentage = (fact / plan) * 100
+                completion_pct = (fact_row.iloc[0]['Длительность'] / row['Длительность']) * 100
+                completion_pct_str = f"{completion_pct:.1f}%"
+                bar_df.loc[idx, 'Процент выполнения'] = completion_pct_str
+                # Также сохраняем процент для соответствующей фактической записи
+                bar_df.loc[fact_row.index[0], 'Процент выполнения'] = completion_pct_str
+            else:
+                bar_df.loc[idx, 'Процент выполнения'] = "Н/Д"
+        elif row['Тип'] == 'Факт' and 'Процент выполнения' not in bar_df.columns:
+            bar_df.loc[idx, 'Процент выполнения'] = ""
+    return bar_df
+
+
+def _plan_fact_summary(filtered_df, all_projects):
+    """Таблица дат задач, отсортированная по отклонению окончания"""
+    summary_data = []
+    for _, row in filtered_df.iterrows():
+        summary_data.append({
+            'Проект': row.get('project name', 'Н/Д'),
+            'Задача': row.get('task name', 'Н/Д'),
+            'Раздел': row.get('section', 'Н/Д'),
+            'План Начало': format_date_display(row.get('plan start', pd.NaT)),
+            'План Конец': format_date_display(row.get('plan end', pd.NaT)),
+            'Факт Начало': format_date_display(row.get('base start', pd.NaT)),
+            'Факт Конец': format_date_display(row.get('base end', pd.NaT)),
+            'Отклонение начала (дней)': row.get('plan_start_diff', 0),
+            'Отклонение конца (дней)': row.get('plan_end_diff', 0)
+        })
+
+    summary_df = pd.DataFrame(summary_data)
+    # Convert deviations to numeric for proper sorting
+    summary_df['Отклонение конца (дней)'] = pd.to_numeric(summary_df['Отклонение конца (дней)'], errors='coerce')
+    summary_df['Отклонение начала (дней)'] = pd.to_numeric(summary_df['Отклонение начала (дней)'], errors='coerce')
+
+    # If "Все" projects selected, add summary column with totals per task
+    if all_projects and 'Задача' in summary_df.columns:
+        task_totals = summary_df.groupby('Задача').agg({
+            'Отклонение начала (дней)': 'sum',
+            'Отклонение конца (дней)': 'sum'
+        }).reset_index()
+        task_totals.columns = ['Задача', 'Сумма отклонения начала (дней)', 'Сумма отклонения конца (дней)']
+        task_totals['Суммарное отклонение (дней)'] = (
+            task_totals['Сумма отклонения начала (дней)'].fillna(0) +
+            task_totals['Сумма отклонения конца (дней)'].fillna(0)
+        )
+        # Merge totals back; merge appends them right after the deviation columns
+        summary_df = summary_df.merge(task_totals, on='Задача', how='left')
+
+    # Sort by end date difference (largest first), NaN values at the end
+    return summary_df.sort_values(
+        'Отклонение конца (дней)',
+        ascending=False,
+        na_position='last'
+    )
+
+
+def find_task_end_metrics(df, task_name, project=ALL_VALUES):
+    """
+    Метрики окончания по задаче (в исходных, не отфильтрованных данных)
+
+    Args:
+        df: DataFrame с данными проектов
+        task_name: Название задачи (например, "Разрешение на ввод в эксплуатацию")
+        project: Проект для поиска задачи ('Все' - первая найденная задача)
+
+    Returns:
+        Словарь {'plan_end', 'base_end', 'deviation_days'} или None, если задача не найдена
+    """
+    if 'task name' not in df.columns:
+        return None
+    task_mask = df['task name'].astype(str).str.strip() == task_name.strip()
+    if not task_mask.any():
+        return None
+    if project != ALL_VALUES and 'project name' in df.columns:
+        project_mask = df['project name'].astype(str).str.strip() == str(project).strip()
+        task_rows = df[task_mask & project_mask]
+        if task_rows.empty:
+            return None
+    else:
+        task_rows = df[task_mask]
+    task_row = task_rows.iloc[0]
+
+    plan_end = task_row.get('plan end')
+    base_end = task_row.get('base end')
+    if pd.notna(plan_end):
+        plan_end = pd.to_datetime(plan_end, errors='coerce', dayfirst=True)
+    if pd.notna(base_end):
+        base_end = pd.to_datetime(base_end, errors='coerce', dayfirst=True)
+
+    deviation_days = None
+    if pd.notna(plan_end) and pd.notna(base_end):
+        deviation_days = (base_end - plan_end).days
+    return {'plan_end': plan_end, 'base_end': base_end, 'deviation_days': deviation_days}
+
+
+# ==================== Значения отклонений от базового плана ====================
+def add_duration_completion_percent(df):
+    """
+    Добавляет колонку completion_percent: отношение плановой длительности
+    к фактической (в процентах, ограничено диапазоном 0-200)
+
+    Args:
+        df: DataFrame (изменяется на месте)
+    """
+    date_cols = ['plan start', 'plan end', 'base start', 'base end']
+    if not all(col in df.columns for col in date_cols):
+        df['completion_percent'] = None
+        return df
+
+    # Convert dates to datetime
+    for col in date_cols:
+        df[col] = ensure_datetime(df[col])
+
+    # Calculate completion percentage:
+    # (Планируемая дата окончания - планируемая дата начала) / (Фактическая дата окончания - фактическая дата начала) * 100
+    df['plan_duration'] = (df['plan end'] - df['plan start']).dt.days
+    df['fact_duration'] = (df['base end'] - df['base start']).dt.days
+
+    # Avoid division by zero
+    df['completion_percent'] = (
+        df['plan_duration'] / df['fact_duration'].replace(0, np.nan) * 100
+    ).fillna(0)
+    # Cap at reasonable values (0-200%)
+    df['completion_percent'] = df['completion_percent'].clip(0, 200)
+    return df
+
+
+def compute_deviation_by_tasks(df, filters=None):
+    """
+    Расчет для панели "Значения отклонений от базового плана"
+
+    Уровень группировки зависит от фильтров: задача > раздел > проект.
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, task name, section, block)
+
+    Returns:
+        (result, error): result содержит 'deviations' (суммарные дни отклонений
+        и процент выполнения, отсортированные по убыванию) и 'y_label'
+        (подпись оси группировки)
+    """
+    filters = filters or {}
+
+    # Filter only tasks with deviations - check for deviation = 1 or True
+    if 'deviation' not in df.columns:
+        return None, "Поле 'deviation' не найдено в данных."
+
+    # Determine grouping level based on applied filters
+    # Priority: task > section > project
+    if filters.get('task name', ALL_VALUES) != ALL_VALUES:
+        group_by_cols = ['project name', 'task name']
+        y_label = 'Задача'
+    elif filters.get('section', ALL_VALUES) != ALL_VALUES:
+        group_by_cols = ['section']
+        y_label = 'Раздел'
+    else:
+        group_by_cols = ['project name']
+        y_label = 'Проект'
+
+    deviations = None
+    totals = backends.run('deviation_totals', df, active_filters(df, filters), group_by_cols)
+    if totals is not None:
+        matched, deviations = totals
+    else:
+        filtered_df = apply_filters(df, filters)
+        filtered_df = filtered_df[deviation_mask(filtered_df)]
+        matched = len(filtered_df)
+
+    if not matched:
+        return None, InfoMessage("Отклонения не найдены для выбранных фильтров.")
+
+    if 'project name' not in df.columns or 'task name' not in df.columns:
+        return None, "Необходимые поля 'project name' или 'task name' не найдены в данных."
+
+    if deviations is None:
+        # Convert deviation in days to numeric
+        if 'deviation in days' in filtered_df.columns:
+            filtered_df['deviation in days'] = ensure_numeric(filtered_df['deviation in days'])
+
+        # Calculate completion percentage if dates are available
+        add_duration_completion_percent(filtered_df)
+
+        deviations = filtered_df.groupby(group_by_cols).agg({
+            'deviation in days': 'sum' if 'deviation in days' in filtered_df.columns else 'count',
+            'completion_percent': 'mean' if filtered_df['completion_percent'].notna().any() else lambda x: None
+        }).reset_index()
+
+    # Set column names based on grouping level
+    if len(group_by_cols) == 2:  # project + task
+        deviations.columns = ['Проект', 'Задача', 'Суммарно дней отклонений', 'Процент выполнения']
+        deviations['Отображение'] = deviations['Задача'] + ' (' + deviations['Проект'] + ')'
+    elif 'section' in group_by_cols:
+        deviations.columns = ['Раздел', 'Суммарно дней отклонений', 'Процент выполнения']
+        deviations['Отображение'] = deviations['Раздел']
+    else:  # project only
+        deviations.columns = ['Проект', 'Суммарно дней отклонений', 'Процент выполнения']
+        deviations['Отображение'] = deviations['Проект']
+
+    # If completion percent calculation failed, set to None
+    deviations['Процент выполнения'] = pd.to_numeric(deviations['Процент выполнения'], errors='coerce')
+
+    # Sort by deviation amount (descending - largest first)
+    deviations = deviations.sort_values('Суммарно дней отклонений', ascending=False)
+
+    if deviations.empty:
+        return None, InfoMessage("Нет данных для отображения.")
+
+    return {'deviations': deviations, 'y_label': y_label}, None
+
+
+def compute_deviation_detail(df, project=ALL_VALUES):
+    """
+    Детализация отклонений по разделам и задачам (фильтр только по проекту)
+
+    Returns:
+        (result, error): result - DataFrame с колонками 'Раздел', 'Задача',
+        'Суммарно дней отклонений' и 'Отображение'
+    """
+    detail_df = apply_filters(df, {'project name': project})
+
+    # Filter only tasks with deviations
+    if 'deviation' in detail_df.columns:
+        detail_df = detail_df[deviation_mask(detail_df)]
+
+    if detail_df.empty:
+        return None, InfoMessage("Нет данных для отображения детализации.")
+
+    if 'section' not in detail_df.columns or 'task name' not in detail_df.columns:
+        return None, "Поля 'section' или 'task name' не найдены для детализации."
+
+    # Convert deviation in days to numeric
+    if 'deviation in days' in detail_df.columns:
+        detail_df['deviation in days'] = ensure_numeric(detail_df['deviation in days'])
+
+    detail_deviations = detail_df.groupby(['section', 'task name']).agg({
+        'deviation in days': 'sum' if 'deviation in days' in detail_df.columns else 'count'
+    }).reset_index()
+
+    detail_deviations.columns = ['Раздел', 'Задача', 'Суммарно дней отклонений']
+    detail_deviations['Отображение'] = detail_deviations['Задача'] + ' (' + detail_deviations['Раздел'] + ')'
+
+    # Sort by deviation amount (descending)
+    detail_deviations = detail_deviations.sort_values('Суммарно дней отклонений', ascending=False)
+    return detail_deviations, None
+
+
+def deviation_detail_overview(df, project=ALL_VALUES, limit=DETAIL_BARS_LIMIT):
+    """
+    Обзор детализации отклонений: суммы по разделам, если пар (раздел, задача)
+    с отклонениями больше limit
+
+    Returns:
+        DataFrame с колонками 'Раздел', 'Суммарно дней отклонений', 'Задач'
+        и 'Отображение' (по убыванию отклонений) или None - показывать задачи
+    """
+    active = active_filters(df, {'project name': project})
+    hierarchy = _schedule_hierarchies.get(df)
+    if not hierarchy.has('section', 'task name', *(column for column, _ in active)):
+        return None
+
+    pairs = hierarchy.level(['section', 'task name'], active)
+    pairs = pairs[pairs['deviation tasks'] > 0]
+    if len(pairs) <= limit:
+        return None
+
+    sections = pairs.groupby('section').agg({'deviation days': 'sum', 'task name': 'size'}).reset_index()
+    sections.columns = ['Раздел', 'Суммарно дней отклонений', 'Задач']
+    sections['Отображение'] = sections['Раздел']
+    return sections.sort_values('Суммарно дней отклонений', ascending=False)
+
+
+# ==================== Изменения между версиями ====================
+VERSION_DIFF_KINDS = {
+    'added': 'Добавлено',
+    'removed': 'Удалено',
+    'changed': 'Изменено',
+}
+
+# Поля сравнения версий -> подписи колонок таблиц
+VERSION_DIFF_COLUMNS = {
+    'project name': 'Проект',
+    'block': 'Блок',
+    'section': 'Раздел',
+    'task name': 'Задача',
+    'plan start': 'Старт План',
+    'plan end': 'Конец План',
+    'base start': 'Старт Факт',
+    'base end': 'Конец Факт',
+    'budget plan': 'Бюджет План',
+    'budget fact': 'Бюджет Факт',
+    'deviation in days': 'Отклонений в днях',
+    'reason of deviation': 'Причина отклонений',
+}
+
+
+def _version_diff_changes_table(changed):
+    """Таблица измененных задач: ключи, список измененных полей и изменения значений"""
+    key_cols = [col for col in ('project name', 'block', 'section', 'task name') if col in changed.columns]
+    table = changed[key_cols].rename(columns=VERSION_DIFF_COLUMNS)
+    table['Изменения'] = changed['changed_fields'].map(
+        lambda fields: ', '.join(VERSION_DIFF_COLUMNS.get(field, field) for field in fields) or 'прочие поля'
+    )
+    for field, label in VERSION_DIFF_COLUMNS.items():
+        if f'{field}_delta' not in changed.columns:
+            continue
+        suffix = ', дн.' if field in ('plan start', 'plan end', 'base start', 'base end') else ', изм.'
+        table[label + suffix] = changed[f'{field}_delta']
+    if 'plan end_new' in changed.columns:
+        table['Конец План (новый)'] = changed['plan end_new']
+        # Самые большие сдвиги сроков - первыми
+        order = changed['plan end_delta'].abs().sort_values(ascending=False, kind='stable').index
+        table = table.loc[order]
+    return table.reset_index(drop=True)
+
+
+def compute_version_diff(diff, filters=None, projects=None):
+    """
+    Расчет для панели "Изменения между версиями"
+
+    Args:
+        diff: Результат version_diff.diff_versions
+        filters: Фильтры по ключам задачи ({'project name': ..., 'section': ...})
+        projects: Проекты, доступные пользователю (None - без ограничений)
+
+    Returns:
+        (result, error): result содержит 'counts' ({вид изменения: число задач}),
+        'summary' (число задач по проектам и видам изменений), 'changed',
+        'added' и 'removed' (таблицы с подписями колонок)
+    """
+    frames = {}
+    for kind in VERSION_DIFF_KINDS:
+        frame = diff[kind]
+        if projects is not None and 'project name' in frame.columns:
+            frame = frame[frame['project name'].astype(str).str.strip().isin(projects)]
+        mask = build_filter_mask(frame, filters)
+        frames[kind] = frame[mask] if mask is not None else frame
+
+    counts = {kind: len(frame) for kind, frame in frames.items()}
+    if not any(counts.values()):
+        return None, InfoMessage("Между выбранными версиями задачи не менялись.")
+
+    summary = None
+    if all('project name' in frame.columns for frame in frames.values()):
+        summary = pd.DataFrame({
+            label: frames[kind]['project name'].value_counts() for kind, label in VERSION_DIFF_KINDS.items()
+        }).fillna(0).astype('int64')
+        summary = summary.loc[summary.sum(axis=1).sort_values(ascending=False, kind='stable').index]
+        summary = summary.rename_axis('Проект').reset_index()
+
+    return {
+        'counts': counts,
+        'summary': summary,
+        'changed': _version_diff_changes_table(frames['changed']),
+        'added': frames['added'].rename(columns=VERSION_DIFF_COLUMNS).reset_index(drop=True),
+        'removed': frames['removed'].rename(columns=VERSION_DIFF_COLUMNS).reset_index(drop=True),
+    }, None
+
+
+# ==================== Динамика причин отклонений ====================
+def compute_dynamics_of_reasons(df, filters=None, period_type='Месяц'):
+    """
+    Расчет для панели "Динамика причин отклонений"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (reason of deviation, project name, section, block)
+        period_type: 'Месяц', 'Квартал' или 'Год'
+
+    Returns:
+        (result, error): result содержит 'dynamics' (количество отклонений по
+        периоду и причине, период отформатирован для отображения), 'by_reason'
+        (количество по причинам за все периоды, по убыванию), 'period_col'
+        и 'period_label'
+    """
+    filtered_df = apply_filters(df, filters)
+
+    # Filter only tasks with deviations - check for deviation = 1 or True
+    if 'deviation' in filtered_df.columns:
+        filtered_df = filtered_df[deviation_mask(filtered_df)]
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных для выбранных фильтров.")
+
+    period_col, period_label, freq_code = get_plan_period_column(period_type)
+    # If period column doesn't exist, try to create it from plan end
+    if period_col not in filtered_df.columns and 'plan end' in filtered_df.columns:
+        mask = filtered_df['plan end'].notna()
+        filtered_df.loc[mask, period_col] = filtered_df.loc[mask, 'plan end'].dt.to_period(freq_code)
+
+    if period_col not in filtered_df.columns:
+        return None, f"Столбец периода '{period_col}' не найден."
+
+    if 'reason of deviation' not in filtered_df.columns:
+        return None, "Столбец 'reason of deviation' не найден в данных."
+
+    # Filter out rows without period data
+    reason_dynamics = (
+        filtered_df[filtered_df[period_col].notna()]
+        .groupby([period_col, 'reason of deviation']).size()
+        .reset_index(name='Количество')
+    )
+    reason_dynamics[period_col] = reason_dynamics[period_col].apply(format_period_display)
+
+    # Aggregate again after formatting to handle potential duplicates from formatting
+    reason_dynamics = reason_dynamics.groupby([period_col, 'reason of deviation'])['Количество'].sum().reset_index()
+
+    # Group by reason and sum across all periods
+    by_reason = reason_dynamics.groupby('reason of deviation')['Количество'].sum().reset_index()
+    by_reason = by_reason.sort_values('Количество', ascending=False)
+
+    return {
+        'dynamics': reason_dynamics,
+        'by_reason': by_reason,
+        'period_col': period_col,
+        'period_label': period_label,
+    }, None
+
+
+# ==================== Выдача рабочей/проектной документации ====================
+RD_STATUS_ON_APPROVAL = 'На согласовании'
+RD_STATUS_IN_PRODUCTION = 'Выдано в производство работ'
+RD_STATUS_CONTRACTOR = 'Выдана подрядчику'
+RD_STATUS_REWORK = 'На доработке'
+
+
+def find_column(df, possible_names):
+    """
+    Находит колонку по возможным названиям (без учета регистра, переносов
+    строк, по вхождению подстроки или всех ключевых слов)
+
+    Returns:
+        Имя колонки или None
+    """
+    for col in df.columns:
+        # Normalize column name: remove newlines, extra spaces, normalize case
+        col_lower = str(col).replace('\n', ' ').replace('\r', ' ').strip().lower()
+
+        for name in possible_names:
+            name_lower = name.lower().strip()
+            # Exact match (case insensitive)
+            if name_lower == col_lower:
+                return col
+            # Substring match
+            if name_lower in col_lower or col_lower in name_lower:
+                return col
+            # Check if all key words from name are in column
+            name_words = [w for w in name_lower.split() if len(w) > 2]
+            if name_words and all(word in col_lower for word in name_words):
+                return col
+
+    # Special handling for RD count column with key words
+    if any('разделов' in n.lower() and 'рд' in n.lower() and 'договор' in n.lower() for n in possible_names):
+        for col in df.columns:
+            col_lower = str(col).lower().replace('\n', ' ').replace('\r', ' ')
+            key_words = ['разделов', 'рд', 'договор', 'количество']
+            if all(word in col_lower for word in key_words if len(word) > 3):
+                return col
+
+    return None
+
+
+def parse_decimal_column(series):
+    """Числа с запятой в качестве десятичного разделителя (пустые и ошибочные значения - 0)"""
+    values = series.astype(str).str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(values, errors='coerce').fillna(0)
+
+
+def find_rd_delay_columns(df):
+    """
+    Колонки для графика "Просрочка выдачи РД"
+
+    Returns:
+        (columns, error): columns - словарь {'rd_deviation', 'project',
+        'section', 'task'} с именами найденных колонок
+    """
+    # Column for Y-axis: "Отклонение разделов РД" (exact match from CSV file)
+    if 'Отклонение разделов РД' in df.columns:
+        rd_deviation_col = 'Отклонение разделов РД'
+    else:
+        rd_deviation_col = find_column(df, [
+            'Отклонение разделов РД',
+            'Отклонение разделов рд',
+            'отклонение разделов рд',
+            'Отклон. Количества разделов РД',
+            'Отклонение количества разделов РД',
+            'Отклон. разделов РД',
+            'Отклонение разделов РД по Договору'
+        ])
+
+        # Special handling: if not found, try to find by key words
+        if not rd_deviation_col:
+            for col in df.columns:
+                col_lower = str(col).lower().replace('\n', ' ').replace('\r', ' ')
+                key_words = ['отклон', 'раздел', 'рд']
+                if all(word in col_lower for word in key_words if len(word) > 3):
+                    rd_deviation_col = col
+                    break
+
+    if not rd_deviation_col:
+        return None, "⚠️ Колонка 'Отклонение разделов РД' не найдена."
+
+    columns = {
+        'rd_deviation': rd_deviation_col,
+        'project': 'project name' if 'project name' in df.columns else find_column(df, ['Проект', 'project']),
+        'section': 'section' if 'section' in df.columns else find_column(df, ['Раздел', 'section']),
+        'task': 'task name' if 'task name' in df.columns else find_column(df, ['Задача', 'task']),
+    }
+
+    missing_cols = []
+    if not columns['project']:
+        missing_cols.append('Проект (project name)')
+    if not columns['section']:
+        missing_cols.append('Раздел (section)')
+    if not columns['task']:
+        missing_cols.append('Задача (task name)')
+    if missing_cols:
+        return None, f"⚠️ Отсутствуют необходимые колонки: {', '.join(missing_cols)}"
+
+    return columns, None
+
+
+def compute_rd_delay(df, columns, project=ALL_VALUES, section=ALL_VALUES):
+    """
+    Расчет для графика "Просрочка выдачи РД"
+
+    При выбранном разделе каждая задача - отдельный столбец, иначе
+    отклонения суммируются по проектам.
+
+    Args:
+        df: DataFrame с данными проектов
+        columns: Колонки из find_rd_delay_columns
+        project: Выбранный проект
+        section: Выбранный раздел
+
+    Returns:
+        (result, error): result содержит 'chart_data' (по убыванию отклонения),
+        'summary', 'y_column', 'y_title' и 'totals' (сумма, положительные
+        и отрицательные отклонения)
+    """
+    filtered_df = apply_filters(df, {columns['project']: project, columns['section']: section})
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных для выбранных фильтров.")
+
+    filtered_df['rd_deviation_numeric'] = parse_decimal_column(filtered_df[columns['rd_deviation']])
+
+    # Determine grouping mode: if section is selected, show tasks; otherwise group by project
+    show_by_tasks = section != ALL_VALUES
+
+    if show_by_tasks:
+        # Label combining section and task for better readability
+        filtered_df['Задача_полная'] = (filtered_df[columns['section']].astype(str) + ' | ' +
+                                        filtered_df[columns['task']].astype(str))
+        chart_data = filtered_df[[columns['task'], 'Задача_полная', 'rd_deviation_numeric']].copy()
+        chart_data.columns = ['Задача', 'Задача_полная', 'Отклонение разделов РД']
+        y_column = 'Задача_полная'
+        y_title = 'Задача'
+    else:
+        chart_data = filtered_df.groupby(columns['project']).agg({
+            'rd_deviation_numeric': 'sum'
+        }).reset_index()
+        chart_data.columns = ['Проект', 'Отклонение разделов РД']
+        y_column = 'Проект'
+        y_title = 'Проект'
+
+    # Sort by deviation value (descending) to show largest deviations first
+    chart_data = chart_data.sort_values('Отклонение разделов РД', ascending=False)
+
+    if chart_data.empty:
+        return None, InfoMessage("Нет данных для построения графика.")
+
+    summary = chart_data[[y_column, 'Отклонение разделов РД']].copy()
+    summary.columns = [y_title, 'Отклонение разделов РД']
+
+    values = chart_data['Отклонение разделов РД']
+    totals = {
+        'total': values.sum(),
+        'positive': values[values > 0].sum(),
+        'negative': values[values < 0].sum(),
+    }
+    return {
+        'chart_data': chart_data,
+        'summary': summary,
+        'y_column': y_column,
+        'y_title': y_title,
+        'totals': totals,
+    }, None
+
+
+def find_documentation_columns(df):
+    """
+    Колонки для панели "Выдача рабочей/проектной документации"
+
+    Returns:
+        (columns, error): columns - словарь с именами найденных колонок
+        ('rd_count', 'on_approval', 'in_production', 'contractor', 'rework',
+        'rd_plan', 'plan_start', 'project'); отсутствующие колонки - None
+    """
+    columns = {
+        'rd_count': find_column(df, [
+            'Количество разделов РД по Договору',
+            'Количество разделов РД',
+            'разделов РД',
+            'Количетсов разделов РД по Договору',  # Handle typo
+            'Количество разделов РД по договору'
+        ]),
+        'on_approval': find_column(df, ['На согласовании', 'согласовании']),
+        'in_production': find_column(df, ['Выдано в производство работ', 'производство работ', 'в производство']),
+        'contractor': find_column(df, ['Выдана подрядчику', 'подрядчику']),
+        'rework': find_column(df, ['На доработке', 'доработке']),
+        'rd_plan': find_column(df, ['РД по Договору', 'рд по договору']),
+        'plan_start': 'plan start' if 'plan start' in df.columns else find_column(df, ['Старт План', 'План Старт']),
+        'project': 'project name' if 'project name' in df.columns else find_column(df, ['Проект', 'project']),
+    }
+
+    missing_cols = []
+    if not columns['rd_count']:
+        missing_cols.append('Количество разделов РД по Договору')
+    if not columns['on_approval']:
+        missing_cols.append(RD_STATUS_ON_APPROVAL)
+    if not columns['in_production']:
+        missing_cols.append(RD_STATUS_IN_PRODUCTION)
+    if missing_cols:
+        return None, f"⚠️ Отсутствуют необходимые колонки: {', '.join(missing_cols)}"
+
+    return columns, None
+
+
+def get_rd_status_options(columns):
+    """Варианты фильтра по статусу РД (только статусы с найденными колонками)"""
+    options = [ALL_VALUES, RD_STATUS_ON_APPROVAL, RD_STATUS_IN_PRODUCTION]
+    if columns['contractor']:
+        options.append(RD_STATUS_CONTRACTOR)
+    if columns['rework']:
+        options.append(RD_STATUS_REWORK)
+    return options
+
+
+def parse_plan_start_dates(df, plan_start_col):
+    """Даты старта плана (формат ДД.ММ.ГГГГ или смешанный)"""
+    return ensure_datetime(df[plan_start_col])
+
+
+@timed('filtering')
+def filter_documentation(df, columns, project=ALL_VALUES, date_range=None, statuses=None):
+    """
+    Применяет фильтры панели документации
+
+    Args:
+        df: DataFrame с данными проектов
+        columns: Колонки из find_documentation_columns
+        project: Выбранный проект
+        date_range: Кортеж (начало, конец) по дате старта плана или None
+        statuses: Выбранные статусы РД (строка остается, если значение
+            хотя бы одного из статусов больше нуля)
+
+    Returns:
+        Отфильтрованная копия DataFrame
+    """
+    plan_start_col = columns['plan_start']
+    if date_range and all(date_range) and plan_start_col:
+        # Даты старта разбираются один раз на набор данных; задачи периода - бинарным поиском по индексу
+        index = task_intervals(df, plan_start_col, None)
+        mask = np.zeros(len(df), dtype=bool)
+        mask[index.starting(date_range[0], date_range[1])] = True
+        project_mask = build_filter_mask(df, {columns['project']: project}) if columns['project'] else None
+        if project_mask is not None:
+            mask &= project_mask.to_numpy()
+        filtered_df = df[mask].copy()
+        filtered_df[plan_start_col + '_parsed'] = index.start_dates[mask]
+    else:
+        filtered_df = apply_filters(df, {columns['project']: project}) if columns['project'] else df.copy()
+
+    if statuses and ALL_VALUES not in statuses:
+        status_columns = {
+            RD_STATUS_ON_APPROVAL: columns['on_approval'],
+            RD_STATUS_IN_PRODUCTION: columns['in_production'],
+            RD_STATUS_CONTRACTOR: columns['contractor'],
+            RD_STATUS_REWORK: columns['rework'],
+        }
+        status_mask = pd.Series(False, index=filtered_df.index)
+        for status in statuses:
+            status_col = status_columns.get(status)
+            if status_col:
+                status_mask = status_mask | (parse_decimal_column(filtered_df[status_col]) > 0)
+        filtered_df = filtered_df[status_mask].copy()
+
+    return filtered_df
+
+
+def compute_rd_execution(df, columns):
+    """
+    Данные круговой диаграммы "Исполнение РД"
+
+    Returns:
+        Словарь {статус: сумма} (округлено до целых) или None, если обе суммы нулевые
+    """
+    on_approval_sum = parse_decimal_column(df[columns['on_approval']]).sum()
+    in_production_sum = parse_decimal_column(df[columns['in_production']]).sum()
+    if on_approval_sum <= 0 and in_production_sum <= 0:
+        return None
+    return {
+        RD_STATUS_ON_APPROVAL: int(round(on_approval_sum)),
+        RD_STATUS_IN_PRODUCTION: int(round(in_production_sum))
+    }
+
+
+def compute_rd_issue_dynamics(df, columns):
+    """
+    Накопительная динамика выдачи РД по дате старта плана
+
+    План - сумма "РД по Договору", факт - сумма "Выдано в производство работ"
+    (даты без выдачи в производство не показываются).
+
+    Returns:
+        (result, error): result - DataFrame с колонками 'Дата', 'Количество'
+        (накопительно по типу), 'Тип' и 'Текст' (пустой, если нет дат)
+    """
+    plan_start_col = columns['plan_start']
+    if not plan_start_col:
+        return None, "⚠️ Для построения графика 'Динамика выдачи РД' необходима колонка 'Старт План' (plan start)."
+    if not columns['rd_plan']:
+        return None, "⚠️ Для построения графика 'Динамика выдачи РД' необходима колонка 'РД по Договору'."
+
+    dates = parse_plan_start_dates(df, plan_start_col)
+    valid = dates.notna()
+    if not valid.any():
+        return pd.DataFrame(columns=['Дата', 'Количество', 'Тип', 'Текст']), None
+    day = dates[valid].dt.date
+
+    plan_grouped = parse_decimal_column(df.loc[valid, columns['rd_plan']]).groupby(day).sum().reset_index()
+    plan_grouped.columns = ['Дата', 'Количество']
+    plan_grouped['Тип'] = 'План'
+
+    fact_grouped = parse_decimal_column(df.loc[valid, columns['in_production']]).groupby(day).sum().reset_index()
+    fact_grouped.columns = ['Дата', 'Количество']
+    fact_grouped['Тип'] = 'Факт'
+    # Only show actual production
+    fact_grouped = fact_grouped[fact_grouped['Количество'] > 0]
+
+    dynamics_df = pd.concat([plan_grouped, fact_grouped], ignore_index=True).sort_values('Дата')
+
+    # Cumulative values for each type separately
+    dynamics_df['Количество'] = dynamics_df.groupby('Тип')['Количество'].cumsum()
+    dynamics_df['Текст'] = dynamics_df['Количество'].apply(lambda x: f'{x:.0f}' if pd.notna(x) else '')
+    return dynamics_df, None
+
+
+# ==================== Ресурсы и техника ====================
+CONTRACTOR_COLUMN_NAMES = ['Контрагент', 'контрагент', 'Подразделение', 'подразделение', 'contractor']
+PROJECT_COLUMN_NAMES = ['Проект', 'проект', 'project', 'Project']
+DELTA_PERCENT_COLUMN_NAMES = ['Дельта (%)', 'Дельта %', 'дельта (%)', 'дельта %', 'Delta %', 'delta %', 'Дельта(%)', 'Дельта%']
+ALL_MONTHS = 'Все месяцы'
+SKUD_GROUPINGS = ['По проектам', 'По контрагентам', 'По проектам и контрагентам', 'Без группировки']
+SKUD_NO_GROUPING = 'Без группировки'
+
+
+def find_column_by_partial(df, possible_names):
+    """Находит колонку по возможным названиям (точное совпадение или вхождение подстроки)"""
+    for col in df.columns:
+        col_lower = str(col).lower().strip()
+        for name in possible_names:
+            name_lower = str(name).lower().strip()
+            if name_lower == col_lower or name_lower in col_lower or col_lower in name_lower:
+                return col
+    return None
+
+
+def _parse_number_series(series):
+    """Числа вида '1 234,5' (ошибочные значения - NaN)"""
+    return pd.to_numeric(
+        series.astype(str).str.replace(',', '.').str.replace(' ', ''),
+        errors='coerce'
+    )
+
+
+def _extract_percentage(value):
+    """Extract numeric value from percentage string like '-90%' or '90%', or numeric value"""
+    if pd.isna(value):
+        return 0
+    if isinstance(value, (int, float)):
+        return float(value)
+    value_str = str(value).strip().replace('%', '').replace(',', '.').replace(' ', '')
+    try:
+        return float(value_str)
+    except:
+        return 0
+
+
+def combine_workforce_data(resources_df, technique_df):
+    """
+    Объединяет данные о ресурсах и технике (колонка data_source - источник)
+
+    Returns:
+        DataFrame или None, если оба источника пусты
+    """
+    parts = []
+    for source_df, source_name in [(resources_df, 'Ресурсы'), (technique_df, 'Техника')]:
+        if source_df is not None and not source_df.empty:
+            part = source_df.copy()
+            part['data_source'] = source_name
+            parts.append(part)
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    # If technique has "Среднее за месяц" but resources has "Среднее за неделю", keep both
+    return pd.concat(parts, ignore_index=True, sort=False)
+
+
+def prepare_contractor_data(df, average_columns=('Среднее за неделю', 'Среднее за месяц')):
+    """
+    Приводит данные ресурсов/техники к числовым колонкам для аналитики по контрагентам
+
+    Добавляет колонки 'Контрагент', 'План_numeric', 'week_sum' (факт за месяц),
+    'Дельта_numeric' и 'Дельта_процент_numeric'.
+
+    Args:
+        df: Данные о ресурсах и/или технике
+        average_columns: Колонки среднего в порядке приоритета ('Среднее за неделю'
+            умножается на число недель, 'Среднее за месяц' берется как есть)
+
+    Returns:
+        (result, error): result содержит 'data' (подготовленная копия) и
+        'project_col' (колонка проекта или None)
+    """
+    work_df = df.copy()
+
+    # Check required columns - Контрагент is essential
+    if 'Контрагент' not in work_df.columns:
+        contractor_col = find_column_by_partial(work_df, CONTRACTOR_COLUMN_NAMES)
+        if not contractor_col:
+            return None, "❌ Отсутствует необходимая колонка 'Контрагент'"
+        work_df['Контрагент'] = work_df[contractor_col]
+
+    # Find week columns dynamically - also try partial match
+    week_columns = []
+    for week_num in range(1, 6):
+        week_col = f'{week_num} неделя'
+        if week_col in work_df.columns:
+            week_columns.append(week_col)
+        else:
+            found_col = find_column_by_partial(work_df, [week_col, f'{week_num} недел', f'недел {week_num}', f'week {week_num}'])
+            if found_col:
+                week_columns.append(found_col)
+
+    if work_df.empty:
+        return None, "⚠️ Данные пусты после обработки."
+
+    if 'План' in work_df.columns:
+        work_df['План_numeric'] = _parse_number_series(work_df['План']).fillna(0)
+    else:
+        work_df['План_numeric'] = 0
+
+    for week_col in week_columns:
+        work_df[f'{week_col}_numeric'] = _parse_number_series(work_df[week_col]).fillna(0)
+
+    # Fact for the month: "Среднее за неделю" (resources) times number of weeks,
+    # "Среднее за месяц" (technique) as is, otherwise sum of weeks
+    average_col = next((col for col in average_columns if col in work_df.columns), None)
+    if average_col == 'Среднее за неделю':
+        num_weeks = len(week_columns) if week_columns else 4
+        work_df['week_sum'] = _parse_number_series(work_df[average_col]).fillna(0) * num_weeks
+    elif average_col:
+        work_df['week_sum'] = _parse_number_series(work_df[average_col]).fillna(0)
+    elif week_columns:
+        work_df['week_sum'] = work_df[[f'{col}_numeric' for col in week_columns]].sum(axis=1)
+    else:
+        work_df['week_sum'] = 0
+
+    # Delta: from the file if available, otherwise plan - fact
+    delta_col = 'Дельта' if 'Дельта' in work_df.columns else \
+        find_column_by_partial(work_df, ['Дельта', 'дельта', 'delta', 'Delta', 'Дельта (без %)'])
+    if delta_col:
+        work_df['Дельта_numeric'] = _parse_number_series(work_df[delta_col]).fillna(0)
+    else:
+        work_df['Дельта_numeric'] = work_df['План_numeric'] - work_df['week_sum']
+
+    # Delta (%): from the file if available, otherwise delta / plan
+    delta_pct_col = 'Дельта (%)' if 'Дельта (%)' in work_df.columns else \
+        find_column_by_partial(work_df, DELTA_PERCENT_COLUMN_NAMES)
+    if delta_pct_col:
+        work_df['Дельта_процент_numeric'] = work_df[delta_pct_col].apply(_extract_percentage)
+    else:
+        work_df['Дельта_процент_numeric'] = 0.0
+        mask = work_df['План_numeric'] != 0
+        work_df.loc[mask, 'Дельта_процент_numeric'] = (work_df.loc[mask, 'Дельта_numeric'] / work_df.loc[mask, 'План_numeric']) * 100
+        work_df['Дельта_процент_numeric'] = work_df['Дельта_процент_numeric'].fillna(0)
+
+    project_col = 'Проект' if 'Проект' in work_df.columns else find_column_by_partial(work_df, PROJECT_COLUMN_NAMES)
+    return {'data': work_df, 'project_col': project_col}, None
+
+
+# Суммируемые по контрагентам колонки prepare_contractor_data
+CONTRACTOR_VALUE_COLUMNS = ['Дельта_процент_numeric', 'План_numeric', 'week_sum', 'Дельта_numeric']
+
+
+def _plan_avg_shares(plan_avg):
+    """Доля факта (Среднее / Сумма) и доля отклонения (Дельта / План), %; при нулевом знаменателе - 0"""
+    plan_avg = plan_avg.copy()
+    plan_avg['Доля факта (%)'] = 0.0
+    plan_avg['Доля отклонения (%)'] = 0.0
+    mask_sum = plan_avg['Сумма'] != 0
+    plan_avg.loc[mask_sum, 'Доля факта (%)'] = (plan_avg.loc[mask_sum, 'Среднее за месяц'] / plan_avg.loc[mask_sum, 'Сумма']) * 100
+    mask_plan = plan_avg['План'] != 0
+    plan_avg.loc[mask_plan, 'Доля отклонения (%)'] = (plan_avg.loc[mask_plan, 'Дельта'] / plan_avg.loc[mask_plan, 'План']) * 100
+    return plan_avg
+
+
+def _contractor_project_result(sums):
+    """
+    Агрегаты по контрагентам для одного проекта
+
+    Args:
+        sums: Суммы CONTRACTOR_VALUE_COLUMNS по контрагентам (колонка 'Контрагент',
+            строки отсортированы по контрагенту)
+    """
+    # Delta (%) by contractor, zero values removed, sorted by absolute value
+    delta_pct = sums[['Контрагент', 'Дельта_процент_numeric']].copy()
+    delta_pct.columns = ['Контрагент', 'Дельта (%)']
+    delta_pct['Дельта (%)'] = pd.to_numeric(delta_pct['Дельта (%)'], errors='coerce').fillna(0)
+    delta_pct_total = delta_pct['Дельта (%)'].abs().sum()
+    non_zero = delta_pct[delta_pct['Дельта (%)'] != 0]
+    if not non_zero.empty:
+        delta_pct = non_zero.copy()
+    delta_pct = delta_pct.sort_values('Дельта (%)', key=abs, ascending=False)
+
+    # Sum of weeks = среднее за месяц
+    contractor_data = sums[['Контрагент', 'План_numeric', 'week_sum', 'Дельта_numeric']].copy()
+    contractor_data.columns = ['Контрагент', 'План', 'Среднее за месяц', 'Дельта']
+    contractor_data['Дельта'] = pd.to_numeric(contractor_data['Дельта'], errors='coerce').fillna(0)
+
+    # Plan + Average with доля факта (Среднее / Сумма) and доля отклонения (Дельта / План)
+    plan_avg = contractor_data.copy()
+    plan_avg['Сумма'] = plan_avg['План'] + plan_avg['Среднее за месяц']
+    plan_avg = _plan_avg_shares(plan_avg[plan_avg['Сумма'] != 0].sort_values('Сумма', ascending=False))
+
+    contractor_data = contractor_data.sort_values('Контрагент')
+
+    # Графики: top-N контрагентов и 'Прочие' (секторы круговой дельты - по модулю)
+    delta_pct_chart, delta_pct_others = limit_categories(
+        delta_pct.assign(**{'Дельта (%)_abs': delta_pct['Дельта (%)'].abs()}), 'Контрагент', 'Дельта (%)_abs',
+        ['Дельта (%)', 'Дельта (%)_abs'])
+    plan_avg_chart, plan_avg_others = limit_categories(
+        plan_avg, 'Контрагент', 'Сумма', ['План', 'Среднее за месяц', 'Дельта', 'Сумма'])
+    contractor_chart, contractor_others = limit_categories(
+        contractor_data, 'Контрагент', contractor_data['План'] + contractor_data['Среднее за месяц'],
+        ['План', 'Среднее за месяц', 'Дельта'])
+
+    return {
+        'delta_pct': delta_pct,
+        'delta_pct_total': delta_pct_total,
+        'contractor_data': contractor_data,
+        'plan_avg': plan_avg,
+        'charts': {
+            'delta_pct': (delta_pct_chart, delta_pct_others),
+            'contractor_data': (contractor_chart, contractor_others),
+            'plan_avg': (_plan_avg_shares(plan_avg_chart), plan_avg_others),
+        },
+        'totals': {
+            'plan': contractor_data['План'].sum(),
+            'average': contractor_data['Среднее за месяц'].sum(),
+            'delta': contractor_data['Дельта'].sum(),
+        },
+    }
+
+
+def compute_contractor_analytics(work_df, project_col=None, projects=None, contractor=ALL_VALUES):
+    """
+    Расчет для панелей "Аналитика по технике" и "График движения рабочей силы"
+
+    Args:
+        work_df: 'data' из prepare_contractor_data
+        project_col: Колонка проекта или None
+        projects: Выбранные проекты (пустой список - все проекты)
+        contractor: Выбранный контрагент
+
+    Returns:
+        (result, error): result - список кортежей (проект, агрегаты) с ключами
+        'delta_pct', 'delta_pct_total', 'contractor_data', 'plan_avg', 'totals'
+        и 'charts' ({'delta_pct' | 'contractor_data' | 'plan_avg': (данные
+        графика, свернутые в 'Прочие' строки)}, см. limit_categories)
+    """
+    filtered_df = work_df
+    if projects and project_col:
+        selected = [str(p).strip() for p in projects]
+        filtered_df = filtered_df[filtered_df[project_col].astype(str).str.strip().isin(selected)]
+    filtered_df = apply_filters(filtered_df, {'Контрагент': contractor})
+
+    if filtered_df.empty:
+        return None, InfoMessage("Нет данных для отображения с выбранными фильтрами.")
+
+    if filtered_df['Контрагент'].isna().all():
+        return None, "❌ Колонка 'Контрагент' отсутствует или пуста после фильтрации."
+
+    # Remove rows where Контрагент is NaN before grouping
+    filtered_df = filtered_df[filtered_df['Контрагент'].notna()]
+
+    if projects and project_col:
+        projects_to_process = projects
+    elif project_col:
+        projects_to_process = sorted(filtered_df[project_col].dropna().unique().tolist())
+    else:
+        projects_to_process = ['Все проекты']
+
+    # One grouping by (project, contractor) for all projects instead of a groupby per project
+    grouped = filtered_df[['Контрагент'] + CONTRACTOR_VALUE_COLUMNS]
+    keys = ['Контрагент']
+    if project_col:
+        grouped = grouped.assign(project_key=filtered_df[project_col].astype(str).str.strip())
+        keys = ['project_key', 'Контрагент']
+    sums = backends.run('group_sums', grouped, keys, CONTRACTOR_VALUE_COLUMNS)
+    if sums is None:
+        sums = grouped.groupby(keys)[CONTRACTOR_VALUE_COLUMNS].sum().reset_index()
+
+    by_project = {}
+    if project_col:
+        by_project = {key: part for key, part in sums.groupby('project_key', sort=False)}
+
+    results = []
+    for project_name in projects_to_process:
+        project_sums = sums
+        if project_col and project_name != 'Все проекты':
+            project_sums = by_project.get(str(project_name).strip())
+        elif project_col:
+            project_sums = sums.groupby('Контрагент')[CONTRACTOR_VALUE_COLUMNS].sum().reset_index()
+        if project_sums is not None and not project_sums.empty:
+            project_sums = project_sums.drop(columns='project_key', errors='ignore').reset_index(drop=True)
+            results.append((project_name, _contractor_project_result(project_sums)))
+    return results, None
+
+
+def _parse_skud_period(val):
+    """Месяц из строки вида '2025-01', 'ДД.ММ.ГГГГ' или 'ММ.ГГГГ' (или None)"""
+    if pd.isna(val):
+        return None
+    val_str = str(val)
+    try:
+        if '-' in val_str:
+            parts = val_str.split('-')
+            if len(parts) >= 2:
+                return pd.Period(f'{int(parts[0])}-{int(parts[1]):02d}', freq='M')
+        if '.' in val_str:
+            parts = val_str.split('.')
+            if len(parts) == 3:  # DD.MM.YYYY
+                return pd.Period(f'{int(parts[2])}-{int(parts[1]):02d}', freq='M')
+            if len(parts) >= 2:  # MM.YYYY
+                return pd.Period(f'{int(parts[1])}-{int(parts[0]):02d}', freq='M')
+    except:
+        pass
+    return None
+
+
+def prepare_skud_data(df):
+    """
+    Подготовка данных о ресурсах для панели "СКУД стройка"
+
+    Добавляет колонки 'Среднее_numeric' и 'period_month' (pd.Period или None).
+
+    Returns:
+        (result, error): result содержит 'data' и найденные колонки
+        'project_col', 'contractor_col', 'period_col' (может быть None) и 'avg_col'
+    """
+    work_df = df.copy()
+
+    avg_col = None
+    if 'Среднее за неделю' in work_df.columns:
+        avg_col = 'Среднее за неделю'
+    elif 'Среднее за месяц' in work_df.columns:
+        avg_col = 'Среднее за месяц'
+    else:
+        avg_col = find_column_by_partial(work_df, ['Среднее за неделю', 'Среднее за месяц', 'среднее', 'average'])
+
+    if not avg_col:
+        return None, "❌ Не найдена колонка со средним значением (Среднее за неделю или Среднее за месяц)"
+
+    work_df['Среднее_numeric'] = _parse_number_series(work_df[avg_col])
+    if work_df['Среднее_numeric'].isna().all():
+        return None, (f"❌ Все значения в колонке со средним значением не являются числами. "
+                      f"Примеры значений из колонки '{avg_col}': {work_df[avg_col].head(10).tolist()}")
+    work_df['Среднее_numeric'] = work_df['Среднее_numeric'].fillna(0)
+
+    period_col = find_column_by_partial(work_df, ['Период', 'период', 'period', 'Period', 'Месяц', 'месяц'])
+    if period_col:
+        # Try to parse period as date, then as month string
+        period_parsed = pd.to_datetime(work_df[period_col], errors='coerce', dayfirst=True).astype(object)
+        mask = period_parsed.isna()
+        if mask.any():
+            period_parsed[mask] = work_df.loc[mask, period_col].apply(_parse_skud_period)
+        work_df['period_month'] = period_parsed.apply(
+            lambda x: x.to_period('M') if isinstance(x, pd.Timestamp) and pd.notna(x) else (x if isinstance(x, pd.Period) else None)
+        )
+    else:
+        work_df['period_month'] = None
+
+    return {
+        'data': work_df,
+        'project_col': find_column_by_partial(work_df, PROJECT_COLUMN_NAMES),
+        'contractor_col': find_column_by_partial(work_df, CONTRACTOR_COLUMN_NAMES),
+        'period_col': period_col,
+        'avg_col': avg_col,
+    }, None
+
+
+def get_skud_month_options(work_df):
+    """Варианты фильтра по месяцу: ['Все месяцы'] + месяцы из данных (или None)"""
+    if not work_df['period_month'].notna().any():
+        return None
+    return [ALL_MONTHS] + [str(m) for m in sorted(work_df['period_month'].dropna().unique())]
+
+
+def compute_skud(work_df, columns, grouping=SKUD_GROUPINGS[0], month=ALL_MONTHS,
+                 project=ALL_VALUES, contractor=ALL_VALUES):
+    """
+    Расчет для панели "СКУД стройка": среднее количество людей за месяц
+
+    Args:
+        work_df: 'data' из prepare_skud_data
+        columns: Результат prepare_skud_data (колонки проекта и контрагента)
+        grouping: Вариант из SKUD_GROUPINGS
+        month: Месяц ('2025-01') или 'Все месяцы'
+        project: Выбранный проект (без учета регистра)
+        contractor: Выбранный контрагент (без учета регистра)
+
+    Returns:
+        (result, error): result содержит 'grouped' (среднее по группам и
+        месяцам, колонка 'period_display' - подпись месяца), 'group_cols',
+        'grouping_cols' (группировка без месяца), 'has_period' и 'filtered'
+    """
+    project_col = columns['project_col']
+    contractor_col = columns['contractor_col']
+    filtered_df = work_df
+
+    for column, value in [(project_col, project), (contractor_col, contractor)]:
+        if value != ALL_VALUES and column:
+            column_mask = filtered_df[column].astype(str).str.strip().str.lower() == str(value).strip().lower()
+            filtered_df = filtered_df[column_mask]
+
+    if month != ALL_MONTHS:
+        filtered_df = filtered_df[filtered_df['period_month'] == pd.Period(month, freq='M')]
+
+    if filtered_df.empty:
+        return None, "⚠️ Нет данных для отображения с выбранными фильтрами."
+
+    group_cols = []
+    if grouping == 'По проектам' and project_col:
+        group_cols.append(project_col)
+    elif grouping == 'По контрагентам' and contractor_col:
+        group_cols.append(contractor_col)
+    elif grouping == 'По проектам и контрагентам':
+        group_cols.extend(col for col in (project_col, contractor_col) if col)
+
+    has_period_values = filtered_df['period_month'].notna().any()
+    # Always group by month for time series (only if not filtering by specific month)
+    if month == ALL_MONTHS and has_period_values:
+        group_cols.append('period_month')
+
+    if group_cols:
+        # Filter out rows where any grouping column is NaN before grouping
+        mask = pd.Series(True, index=filtered_df.index)
+        for col in group_cols:
+            mask = mask & filtered_df[col].notna()
+        if mask.any():
+            grouped_data = filtered_df[mask].groupby(group_cols)['Среднее_numeric'].mean().reset_index()
+            grouped_data.columns = list(group_cols) + ['Среднее за месяц']
+        else:
+            grouped_data = pd.DataFrame({'Среднее за месяц': [filtered_df['Среднее_numeric'].mean()]})
+    elif has_period_values:
+        grouped_data = filtered_df.groupby('period_month')['Среднее_numeric'].mean().reset_index()
+        grouped_data.columns = ['period_month', 'Среднее за месяц']
+    else:
+        mean_value = filtered_df['Среднее_numeric'].mean()
+        grouped_data = pd.DataFrame({'Среднее за месяц': [0 if pd.isna(mean_value) else mean_value]})
+
+    if 'period_month' in grouped_data.columns:
+        grouped_data['period_display'] = grouped_data['period_month'].apply(format_month_label)
+
+    if grouped_data.empty or grouped_data['Среднее за месяц'].isna().all():
+        return None, "⚠️ Нет данных для отображения после применения фильтров."
+
+    return {
+        'grouped': grouped_data,
+        'group_cols': group_cols,
+        'grouping_cols': [col for col in group_cols if col != 'period_month'],
+        'has_period': 'period_month' in grouped_data.columns,
+        'filtered': filtered_df,
+    }, None
+
+
+def skud_summary_table(result, grouping, month=ALL_MONTHS):
+    """Сводная таблица СКУД: месяц (если не выбран конкретный), группы и среднее"""
+    grouped_data = result['grouped']
+    display_cols = []
+    if month == ALL_MONTHS and result['has_period']:
+        display_cols.append('period_display')
+    if grouping != SKUD_NO_GROUPING:
+        display_cols.extend(col for col in result['grouping_cols'] if col in grouped_data.columns)
+    display_cols.append('Среднее за месяц')
+    return grouped_data[display_cols].copy()
+
+
+# ==================== БДДС по месяцам ====================
+def _prepare_budget_frame(filtered_df, adjusted_budget_col=None):
+    """Приводит колонки бюджета к числам и рассчитывает резерв (план - факт)"""
+    filtered_df['budget plan'] = ensure_numeric(filtered_df['budget plan'])
+    filtered_df['budget fact'] = ensure_numeric(filtered_df['budget fact'])
+    filtered_df['reserve budget'] = filtered_df['budget plan'] - filtered_df['budget fact']
+    if adjusted_budget_col:
+        filtered_df[adjusted_budget_col] = pd.to_numeric(filtered_df[adjusted_budget_col], errors='coerce')
+    return filtered_df
+
+
+def _indexed_budget_summary(df, filters, period_col, freq_code, group_col, value_cols):
+    """
+    Суммы бюджета по периоду и group_col из префиксного индекса (budget_index),
+    иначе выбранным движком расчетов; None - считать на pandas
+    """
+    active = active_filters(df, filters)
+    summary = budget_index.budget_summary(df, active, period_col, freq_code, group_col, value_cols)
+    if summary is None:
+        summary = backends.run('budget_summary', df, active, period_col, freq_code, group_col, value_cols)
+    return summary
+
+
+def _cumulative_budget(chart_data, df, filters, period_col, freq_code, group_col, value_cols):
+    """
+    Накопительные итоги для chart_data (отсортированного по 'period_original'):
+    префиксные суммы индекса на конец периодов или cumsum по строкам графика
+    """
+    totals = budget_index.cumulative_totals(
+        df, active_filters(df, filters), period_col, freq_code, group_col, value_cols)
+    if totals is None:
+        return {col: chart_data[col].cumsum() for col in value_cols}
+    return {col: chart_data['period_original'].map(totals[col]) for col in value_cols}
+
+
+def compute_budget_by_period(df, filters=None, period_type='Месяц', view_type=VIEW_CUMULATIVE):
+    """
+    Расчет для панели "БДДС по месяцам"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, task name, section, block)
+        period_type: 'Месяц', 'Квартал' или 'Год'
+        view_type: 'Накопительно' или 'За месяц'
+
+    Returns:
+        (result, error): result содержит 'summary' (по периодам и проектам),
+        'chart_data' (по периодам), 'period_col', 'period_label',
+        'adjusted_col' и 'title_suffix'
+    """
+    if 'budget plan' not in df.columns or 'budget fact' not in df.columns:
+        return None, "Столбцы бюджета (budget plan, budget fact) не найдены в данных."
+
+    adjusted_budget_col = find_adjusted_budget_column(df)
+    period_col, period_label, freq_code = get_plan_period_column(period_type)
+
+    if period_col not in df.columns:
+        return None, f"Столбец периода '{period_col}' не найден."
+
+    agg_dict = {
+        'budget plan': 'sum',
+        'budget fact': 'sum',
+        'reserve budget': 'sum'
+    }
+    if adjusted_budget_col:
+        agg_dict[adjusted_budget_col] = 'sum'
+
+    budget_summary = _indexed_budget_summary(df, filters, period_col, freq_code, 'project name', list(agg_dict))
+    if budget_summary is None:
+        filtered_df = _prepare_budget_frame(apply_filters(df, filters), adjusted_budget_col)
+        budget_summary = filtered_df.groupby([period_col, 'project name']).agg(agg_dict).reset_index()
+
+    # Store original period values for sorting before formatting
+    budget_summary['period_original'] = budget_summary[period_col]
+    budget_summary[period_col] = format_periods(budget_summary[period_col])
+
+    selected_project = (filters or {}).get('project name', ALL_VALUES)
+    if selected_project is not None and selected_project != ALL_VALUES:
+        chart_data = budget_summary[budget_summary['project name'] == selected_project].copy()
+    else:
+        # Aggregate across all projects
+        agg_dict_all = dict(agg_dict)
+        agg_dict_all['period_original'] = 'first'  # Keep first period_original for sorting
+        chart_data = budget_summary.groupby(period_col).agg(agg_dict_all).reset_index()
+
+    # Sort by original period value to ensure correct order for cumulative calculation
+    chart_data = _sort_by_original_period(chart_data, freq_code)
+
+    title_suffix = ''
+    if view_type == VIEW_CUMULATIVE:
+        cumulative = _cumulative_budget(chart_data, df, filters, period_col, freq_code, 'project name', list(agg_dict))
+        for col in agg_dict:
+            chart_data[col] = cumulative[col]
+        title_suffix = ' (накопительно)'
+
+    return {
+        'summary': budget_summary,
+        'chart_data': chart_data,
+        'period_col': period_col,
+        'period_label': period_label,
+        'adjusted_col': adjusted_budget_col,
+        'title_suffix': title_suffix,
+    }, None
+
+
+def compute_budget_cumulative(df, filters=None, period_type='Месяц'):
+    """
+    Расчет для панели "БДДС накопительно"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, task name, section, block)
+        period_type: 'Месяц', 'Квартал' или 'Год'
+
+    Returns:
+        (result, error): result содержит 'chart_data' (накопительные суммы
+        по периодам в колонках '<колонка>_cum'), 'summary' (таблица для
+        отображения), 'period_col', 'period_label' и 'adjusted_col'
+    """
+    if 'budget plan' not in df.columns or 'budget fact' not in df.columns:
+        return None, "Столбцы бюджета (budget plan, budget fact) не найдены в данных."
+
+    adjusted_budget_col = find_adjusted_budget_column(df)
+    period_col, period_label, freq_code = get_plan_period_column(period_type)
+
+    if period_col not in df.columns:
+        return None, f"Столбец периода '{period_col}' не найден."
+
+    agg_dict = {
+        'budget plan': 'sum',
+        'budget fact': 'sum'
+    }
+    if adjusted_budget_col:
+        agg_dict[adjusted_budget_col] = 'sum'
+
+    budget_summary = _indexed_budget_summary(df, filters, period_col, freq_code, 'project name', list(agg_dict))
+    if budget_summary is None:
+        filtered_df = apply_filters(df, filters)
+        for col in agg_dict:
+            filtered_df[col] = pd.to_numeric(filtered_df[col], errors='coerce')
+        budget_summary = filtered_df.groupby([period_col, 'project name']).agg(agg_dict).reset_index()
+    budget_summary['period_original'] = budget_summary[period_col]
+    budget_summary[period_col] = format_periods(budget_summary[period_col])
+
+    selected_project = (filters or {}).get('project name', ALL_VALUES)
+    if selected_project is not None and selected_project != ALL_VALUES:
+        chart_data = budget_summary[budget_summary['project name'] == selected_project].copy()
+    else:
+        chart_data = budget_summary.groupby(period_col).agg({**agg_dict, 'period_original': 'first'}).reset_index()
+
+    # Sort by original period value: labels ('Январь 2025', 'Q1 2025') do not sort chronologically
+    chart_data = _sort_by_original_period(chart_data, freq_code).reset_index(drop=True)
+    cumulative = _cumulative_budget(chart_data, df, filters, period_col, freq_code, 'project name', list(agg_dict))
+    for col in agg_dict:
+        chart_data[f'{col}_cum'] = cumulative[col]
+
+    summary = chart_data[[period_col] + [f'{col}_cum' for col in agg_dict]].copy()
+    summary.columns = [period_label, 'Бюджет План (накопительно)', 'Бюджет Факт (накопительно)'] + (
+        ['Скорректированный бюджет (накопительно)'] if adjusted_budget_col else [])
+
+    return {
+        'chart_data': chart_data,
+        'summary': summary,
+        'period_col': period_col,
+        'period_label': period_label,
+        'adjusted_col': adjusted_budget_col,
+    }, None
+
+
+# ==================== БДДС по лотам ====================
+def compute_budget_by_section(df, filters=None, period_type='Месяц', view_type=VIEW_MONTHLY):
+    """
+    Расчет для панели "БДДС по лотам"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (section, block)
+        period_type: 'Месяц', 'Квартал' или 'Год'
+        view_type: 'За месяц' или 'Накопительно'
+
+    Returns:
+        (result, error): result содержит 'summary' (по периодам и разделам),
+        'chart_data', 'period_col', 'period_label' и 'title_suffix'
+    """
+    if 'budget plan' not in df.columns or 'budget fact' not in df.columns:
+        return None, "Столбцы бюджета (budget plan, budget fact) не найдены в данных."
+
+    period_col, period_label, freq_code = get_plan_period_column(period_type)
+
+    if period_col not in df.columns:
+        return None, f"Столбец периода '{period_col}' не найден."
+
+    budget_summary = _indexed_budget_summary(
+        df, filters, period_col, freq_code, 'section', ['budget plan', 'budget fact', 'reserve budget'])
+    if budget_summary is None:
+        filtered_df = _prepare_budget_frame(apply_filters(df, filters))
+        budget_summary = filtered_df.groupby([period_col, 'section']).agg({
+            'budget plan': 'sum',
+            'budget fact': 'sum',
+            'reserve budget': 'sum'
+        }).reset_index()
+
+    budget_summary['period_original'] = budget_summary[period_col]
+    budget_summary[period_col] = format_periods(budget_summary[period_col])
+
+    selected_section = (filters or {}).get('section', ALL_VALUES)
+    if selected_section is not None and selected_section != ALL_VALUES:
+        chart_data = budget_summary[budget_summary['section'] == selected_section].copy()
+    else:
+        # Aggregate across all sections
+        chart_data = budget_summary.groupby(period_col).agg({
+            'budget plan': 'sum',
+            'budget fact': 'sum',
+            'reserve budget': 'sum',
+            'period_original': 'first'  # Keep first period_original for sorting
+        }).reset_index()
+
+    chart_data = _sort_by_original_period(chart_data, freq_code)
+
+    title_suffix = ''
+    if view_type == VIEW_CUMULATIVE:
+        value_cols = ['budget plan', 'budget fact', 'reserve budget']
+        cumulative = _cumulative_budget(chart_data, df, filters, period_col, freq_code, 'section', value_cols)
+        for col in value_cols:
+            chart_data[col] = cumulative[col]
+        title_suffix = ' (накопительно)'
+
+    return {
+        'summary': budget_summary,
+        'chart_data': chart_data,
+        'period_col': period_col,
+        'period_label': period_label,
+        'title_suffix': title_suffix,
+    }, None
+
+
+# ==================== Бюджет план/факт ====================
+BUDGET_TYPE_COLUMNS = {
+    'Бюджет План': 'budget plan',
+    'Бюджет Факт': 'budget fact',
+    'Бюджет Корректировка': 'budget adjusted',
+    'Резерв бюджета': 'reserve budget',
+}
+
+
+def compute_budget_by_type(df, filters=None, show_reserve=False):
+    """
+    Расчет для панели "Бюджет план/факт"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, section, block)
+        show_reserve: Включать ли резерв бюджета
+
+    Returns:
+        (result, error): result содержит 'by_project' (агрегаты по проектам),
+        'by_type' (длинный формат: проект, тип бюджета, сумма) и 'budget_types'
+    """
+    filtered_df = apply_filters(df, filters)
+
+    if 'budget plan' not in filtered_df.columns or 'budget fact' not in filtered_df.columns:
+        return None, "Столбцы бюджета (budget plan, budget fact) не найдены в данных."
+
+    adjusted_budget_col = find_adjusted_budget_column(df)
+
+    # Budget types to show (always show Plan and Fact, optionally Reserve)
+    budget_types = ['Бюджет План', 'Бюджет Факт']
+    if adjusted_budget_col:
+        budget_types.append('Бюджет Корректировка')
+    if show_reserve:
+        budget_types.append('Резерв бюджета')
+
+    result = {'by_project': None, 'by_type': None, 'budget_types': budget_types}
+    if filtered_df.empty:
+        return result, None
+    if 'project name' not in filtered_df.columns:
+        return None, "Колонка 'project name' не найдена в данных для построения гистограммы."
+
+    filtered_df['budget plan'] = ensure_numeric(filtered_df['budget plan']).fillna(0)
+    filtered_df['budget fact'] = ensure_numeric(filtered_df['budget fact']).fillna(0)
+    filtered_df['reserve budget'] = filtered_df['budget plan'] - filtered_df['budget fact']
+
+    budget_by_project = filtered_df.groupby('project name').agg({
+        'budget plan': 'sum',
+        'budget fact': 'sum',
+        'reserve budget': 'sum'
+    }).reset_index()
+
+    if adjusted_budget_col and adjusted_budget_col in filtered_df.columns:
+        adjusted = pd.to_numeric(filtered_df[adjusted_budget_col], errors='coerce').fillna(0)
+        budget_by_project['budget adjusted'] = adjusted.groupby(filtered_df['project name']).sum().values
+    else:
+        budget_by_project['budget adjusted'] = 0
+
+    # Transform to long format: for each project, one row per budget type
+    value_columns = [BUDGET_TYPE_COLUMNS[t] for t in budget_types]
+    by_type = budget_by_project.melt(
+        id_vars=['project name'],
+        value_vars=value_columns,
+        var_name='Тип бюджета',
+        value_name='Сумма'
+    )
+    by_type['Тип бюджета'] = by_type['Тип бюджета'].map({v: k for k, v in BUDGET_TYPE_COLUMNS.items()})
+    by_type['Сумма_млн'] = by_type['Сумма'] / 1000000
+
+    result['by_project'] = budget_by_project
+    result['by_type'] = by_type
+    return result, None
+
+
+# ==================== Утвержденный бюджет ====================
+def calculate_approved_budget(df, rule_name='default'):
+    """
+    Рассчитывает утвержденный бюджет на основе правил распределения.
+
+    Логика расчета:
+    1. Группируем задачи по проекту/разделу/задаче
+    2. Для каждой группы находим все месяцы этапа (от минимальной даты начала до максимальной даты окончания)
+    3. Для каждого месяца находим все задачи, активные в этом месяце (интервальный индекс)
+    4. Суммируем плановый бюджет активных задач - это 100% для месяца
+    5. Распределяем эту сумму по правилу между месяцами этапа
+
+    Правила распределения:
+    - default: 50% - первый месяц, 45% - равномерно по промежуточным месяцам, 5% - последний месяц
+
+    Args:
+        df: DataFrame с данными проектов
+        rule_name: название правила из справочника
+
+    Returns:
+        DataFrame с распределением утвержденного бюджета по месяцам
+    """
+    # Справочник правил распределения бюджета
+    budget_rules = {
+        'default': {
+            'first_month_percent': 0.50,  # 50% на первый месяц
+            'middle_months_percent': 0.45,  # 45% на промежуточные месяцы
+            'last_month_percent': 0.05,  # 5% на последний месяц
+            'description': '50% - первый месяц, 45% - равномерно по промежуточным месяцам, 5% - последний месяц'
+        }
+    }
+
+    # Получаем правило
+    if rule_name not in budget_rules:
+        rule_name = 'default'
+    rule = budget_rules[rule_name]
+
+    # Проверяем наличие необходимых колонок
+    required_cols = ['budget plan', 'plan start', 'plan end']
+    missing_cols = [col for col in required_cols if col not in df.columns]
+    if missing_cols:
+        return pd.DataFrame(), f"Отсутствуют необходимые колонки: {', '.join(missing_cols)}"
+
+    # Копируем данные для работы
+    checkpoint("Подготовка задач")
+    work_df = df.copy()
+
+    # Конвертируем даты
+    work_df['plan start'] = ensure_datetime(work_df['plan start'])
+    work_df['plan end'] = ensure_datetime(work_df['plan end'])
+    work_df['budget plan'] = ensure_numeric(work_df['budget plan'])
+
+    # Фильтруем строки с валидными данными
+    valid_mask = (
+        work_df['plan start'].notna() &
+        work_df['plan end'].notna() &
+        work_df['budget plan'].notna() &
+        (work_df['budget plan'] > 0) &
+        (work_df['plan start'] <= work_df['plan end'])
+    )
+    work_df = work_df[valid_mask].copy()
+
+    if work_df.empty:
+        return pd.DataFrame(), "Нет данных с валидными датами и бюджетом"
+
+    # Определяем группировку: группируем по комбинации project + section + task
+    # Это позволяет правильно обрабатывать случаи, когда выбраны разные уровни фильтрации
+    grouping_cols = []
+    if 'project name' in work_df.columns:
+        grouping_cols.append('project name')
+    if 'section' in work_df.columns:
+        grouping_cols.append('section')
+    if 'task name' in work_df.columns:
+        grouping_cols.append('task name')
+
+    # Если нет колонок для группировки, обрабатываем все задачи вместе
+    if not grouping_cols:
+        # Создаем фиктивную группу для всех задач
+        work_df['_group'] = 'all'
+        grouping_cols = ['_group']
+
+    # Номера групп в порядке groupby (строки с пустыми ключами в группы не входят)
+    checkpoint("Группировка задач по этапам")
+    grouped = work_df.groupby(grouping_cols)
+    group_codes = grouped.ngroup().to_numpy()
+    group_keys = grouped.size().index.to_frame(index=False)
+
+    # Все месяцы этапа каждой группы: от месяца минимальной даты начала до месяца максимальной даты окончания
+    first_month = grouped['plan start'].min().to_numpy().astype('datetime64[M]')
+    last_month = grouped['plan end'].max().to_numpy().astype('datetime64[M]')
+    group_months = (last_month - first_month).astype('int64') + 1
+    month_group = np.repeat(np.arange(len(group_months)), group_months)
+    month_number = np.arange(group_months.sum()) - np.repeat(np.cumsum(group_months) - group_months, group_months)
+    months = first_month[month_group] + month_number
+
+    # Плановый бюджет задач, активных в месяце, - это 100% для месяца; суммы по интервальному индексу группы
+    checkpoint("Бюджет активных задач по месяцам")
+    index = IntervalIndex(work_df['plan start'], work_df['plan end'], group_codes, work_df['budget plan'].to_numpy())
+    month_start, month_end = month_windows(months)
+    month_totals = index.sum(month_start, month_end, month_group)
+    month_tasks = index.count(month_start, month_end, month_group)
+
+    # Распределение по правилу: один месяц - весь бюджет; два - первый и последний;
+    # больше двух - первый, равномерно промежуточные и последний
+    checkpoint("Распределение по правилу")
+    num_months = group_months[month_group]
+    first_month_percent = np.where(num_months == 1, 1.0, rule['first_month_percent'])
+    last_month_percent = np.where(
+        num_months == 2, rule['middle_months_percent'] + rule['last_month_percent'], rule['last_month_percent']
+    )
+    middle_months_percent = np.where(
+        num_months > 2, rule['middle_months_percent'] / np.maximum(num_months - 2, 1), 0.0
+    )
+    month_percent = np.where(
+        month_number == 0, first_month_percent,
+        np.where(month_number == num_months - 1, last_month_percent, middle_months_percent)
+    )
+
+    # Месяцы без активных задач пропускаются
+    keep = month_tasks > 0
+    if not keep.any():
+        return pd.DataFrame(), "Нет данных для расчета утвержденного бюджета"
+
+    approved_budget_df = pd.DataFrame({
+        'month': pd.Series(months[keep].astype('datetime64[s]')).dt.to_period('M'),
+        'approved budget': month_totals[keep] * month_percent[keep],
+        'budget plan': month_totals[keep],  # Плановый бюджет для месяца (100%)
+        'rule_name': rule_name,
+    })
+    # Значения группировки (без фиктивной колонки _group)
+    for col in grouping_cols:
+        if col != '_group':
+            approved_budget_df[col] = group_keys[col].to_numpy()[month_group[keep]]
+
+    return approved_budget_df, None
+
+
+def calculate_forecast_budget(df, edited_data=None, rule_name='default'):
+    """
+    Рассчитывает прогнозный бюджет на основе утвержденного бюджета с учетом возможных изменений.
+
+    Args:
+        df: DataFrame с исходными данными проектов
+        edited_data: DataFrame с отредактированными данными (даты, утвержденный бюджет)
+        rule_name: название правила распределения
+
+    Returns:
+        DataFrame с распределением прогнозного бюджета по месяцам
+    """
+    # Используем отредактированные данные, если они есть, иначе исходные
+    work_df = edited_data.copy() if edited_data is not None else df.copy()
+
+    # Рассчитываем утвержденный бюджет на основе текущих данных
+    approved_budget_df, error = calculate_approved_budget(work_df, rule_name=rule_name)
+
+    if error:
+        return pd.DataFrame(), error
+
+    # Прогнозный бюджет = утвержденный бюджет (но может быть изменен пользователем)
+    # Если пользователь изменил утвержденный бюджет вручную, используем эти значения
+    forecast_budget_df = approved_budget_df.copy()
+
+    # Переименовываем колонку для ясности
+    if 'approved budget' in forecast_budget_df.columns:
+        forecast_budget_df['forecast budget'] = forecast_budget_df['approved budget']
+
+    return forecast_budget_df, None
+
+
+def summarize_budget_by_month(budget_df, value_column):
+    """
+    Агрегирует распределенный бюджет по месяцам для графика
+
+    Args:
+        budget_df: Результат calculate_approved_budget / calculate_forecast_budget
+        value_column: 'approved budget' или 'forecast budget'
+
+    Returns:
+        DataFrame с колонками month, value_column, 'budget plan', 'Месяц'
+    """
+    monthly = budget_df.groupby('month').agg({
+        value_column: 'sum',
+        'budget plan': 'sum'  # Для сравнения
+    }).reset_index()
+    monthly = monthly.sort_values('month')
+    monthly['Месяц'] = monthly['month'].apply(format_month_label)
+    return monthly
+
+
+def compute_approved_budget(df, filters=None, rule_name='default'):
+    """
+    Расчет для панели "Утвержденный бюджет"
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Фильтры {колонка: значение} (project name, section, block, task name)
+        rule_name: Правило распределения бюджета
+
+    Returns:
+        (result, error): result содержит 'approved' (распределение по задачам)
+        и 'monthly' (суммы по месяцам)
+    """
+    filtered_df = apply_filters(df, filters)
+
+    approved_budget_df, error = calculate_approved_budget(filtered_df, rule_name=rule_name)
+    if error:
+        return None, error
+    if approved_budget_df.empty:
+        return None, InfoMessage("Нет данных для построения графика утвержденного бюджета.")
+
+    return {
+        'approved': approved_budget_df,
+        'monthly': summarize_budget_by_month(approved_budget_df, 'approved budget'),
+    }, None
+
+
+def compute_forecast_budget(df, project, edited_data=None, rule_name='default'):
+    """
+    Расчет для панели "Прогнозный бюджет" по одному проекту
+
+    Args:
+        df: DataFrame с данными проектов
+        project: Название проекта
+        edited_data: Отредактированные пользователем данные проекта (или None)
+        rule_name: Правило распределения бюджета
+
+    Returns:
+        (result, error): result содержит 'forecast' и 'monthly'
+    """
+    project_df = df[df['project name'].astype(str).str.strip() == str(project).strip()]
+    if edited_data is None:
+        edited_data = project_df
+
+    forecast_budget_df, error = calculate_forecast_budget(project_df, edited_data=edited_data, rule_name=rule_name)
+    if error:
+        return None, error
+    if forecast_budget_df.empty:
+        return None, InfoMessage("Нет данных для построения графика прогнозного бюджета.")
+
+    return {
+        'forecast': forecast_budget_df,
+        'monthly': summarize_budget_by_month(forecast_budget_df, 'forecast budget'),
+    }, None
@@ -0,0 +1,1081 @@
+"""
+Построение графиков Plotly для панелей аналитики.
+
+Функции принимают результаты расчетов из dashboard_data и возвращают
+go.Figure; отображение (st.plotly_chart) или экспорт остается на стороне
+вызывающего кода.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from figure_payload import use_compact_template
+from perf import timed
+
+
+# Цвет фона графиков (темная тема приложения)
+DARK_BG = "hsl(216,28%,7%)"
+
+# Типы трасс графиков модуля: шаблон по умолчанию урезается до их стилей
+# (px.line и px.area строят scatter); новый тип трассы нужно добавить сюда
+FIGURE_TRACE_TYPES = ('bar', 'scatter', 'pie')
+use_compact_template(FIGURE_TRACE_TYPES)
+
+BUDGET_COLORS = {
+    'Бюджет План': '#2E86AB',
+    'Бюджет Факт': '#A23B72',
+    'Бюджет Корректировка': '#F18F01',
+    'Резерв бюджета': '#06A77D'
+}
+
+HORIZONTAL_LEGEND = dict(
+    orientation="h",
+    yanchor="bottom",
+    y=1.02,
+    xanchor="right",
+    x=1
+)
+
+
+def apply_dark_background(fig):
+    """Устанавливает темный фон графика и области построения"""
+    fig.update_layout(
+        plot_bgcolor=DARK_BG,
+        paper_bgcolor=DARK_BG
+    )
+    return fig
+
+
+def _int_label(x):
+    return f'{int(x)}' if pd.notna(x) else ''
+
+
+def _int_label_nonzero(x):
+    return f'{int(x)}' if pd.notna(x) and x != 0 else ''
+
+
+# ==================== Динамика отклонений по месяцам ====================
+@timed('figure')
+def build_reason_bar_figure(reason_counts):
+    """Столбчатая диаграмма количества задач по причинам отклонений"""
+    fig = px.bar(
+        reason_counts,
+        x='Причина',
+        y='Количество',
+        title='Количество задач по причинам',
+        labels={'Причина': 'Причина отклонения', 'Количество': 'Количество задач'},
+        text='Количество',
+        template=None
+    )
+    apply_dark_background(fig)
+    fig.update_xaxes(tickangle=-45)
+    fig.update_traces(textposition='outside', textfont=dict(size=14, color='white'))
+    return fig
+
+
+@timed('figure')
+def build_reason_pie_figure(reason_counts):
+    """Круговая диаграмма причин отклонений"""
+    fig = px.pie(
+        reason_counts,
+        values='Количество',
+        names='Причина',
+        title='Причины отклонений'
+    )
+    apply_dark_background(fig)
+    fig.update_traces(texttemplate='%{label}<br>%{value}<br>(%{percent:.0%})', textposition='auto')
+    return fig
+
+
+# ==================== БДДС по месяцам ====================
+def _budget_period_bar(x, values, name, color):
+    return go.Bar(
+        x=x,
+        y=values,
+        name=name,
+        marker_color=color,
+        text=values.apply(_int_label_nonzero),
+        textposition='outside',
+        textfont=dict(size=14, color='white'),
+        customdata=values.apply(_int_label),
+        hovertemplate=f'<b>%{{x}}</b><br>{name}: %{{customdata}}<br><extra></extra>'
+    )
+
+
+@timed('figure')
+def build_budget_by_period_figure(result, hide_reserve=True, hide_adjusted=True):
+    """
+    График "БДДС по месяцам"
+
+    Args:
+        result: Результат dashboard_data.compute_budget_by_period
+        hide_reserve: Скрыть резерв бюджета
+        hide_adjusted: Скрыть скорректированный бюджет
+    """
+    chart_data = result['chart_data']
+    period_col = result['period_col']
+    adjusted_budget_col = result['adjusted_col']
+    x = chart_data[period_col]
+
+    fig = go.Figure()
+    fig.add_trace(_budget_period_bar(x, chart_data['budget plan'], 'Бюджет План', '#2E86AB'))
+    fig.add_trace(_budget_period_bar(x, chart_data['budget fact'], 'Бюджет Факт', '#A23B72'))
+
+    # Add reserve budget only if checkbox is not checked (reserve is not hidden)
+    if not hide_reserve:
+        fig.add_trace(_budget_period_bar(x, chart_data['reserve budget'], 'Резерв бюджета', '#06A77D'))
+
+    # Add adjusted budget if available and not hidden
+    if adjusted_budget_col and adjusted_budget_col in chart_data.columns and not hide_adjusted:
+        fig.add_trace(_budget_period_bar(x, chart_data[adjusted_budget_col], 'Скорректированный бюджет', '#F18F01'))
+
+    fig.update_layout(
+        title=f"БДДС{result['title_suffix']}",
+        xaxis_title=result['period_label'],
+        yaxis_title='Сумма бюджета',
+        barmode='group',
+        xaxis=dict(tickangle=-45)
+    )
+    return apply_dark_background(fig)
+
+
+@timed('figure')
+def build_budget_cumulative_figure(result):
+    """
+    График "БДДС накопительно"
+
+    Args:
+        result: Результат dashboard_data.compute_budget_cumulative
+    """
+    chart_data = result['chart_data']
+    x = chart_data[result['period_col']]
+    traces = [('budget plan', 'Бюджет План (накопительно)', '#2E86AB'),
+              ('budget fact', 'Бюджет Факт (накопительно)', '#A23B72')]
+    if result['adjusted_col']:
+        traces.append((result['adjusted_col'], 'Скорректированный бюджет (накопительно)', '#F18F01'))
+
+    fig = go.Figure()
+    for column, name, color in traces:
+        values = chart_data[f'{column}_cum']
+        fig.add_trace(go.Bar(
+            x=x,
+            y=values,
+            name=name,
+            marker_color=color,
+            text=values.apply(lambda v: f'{v:,.0f}' if pd.notna(v) else ''),
+            textposition='outside',
+            textfont=dict(size=14, color='white')
+        ))
+
+    fig.update_layout(
+        title='БДДС накопительно',
+        xaxis_title=result['period_label'],
+        yaxis_title='Сумма бюджета (накопительно)',
+        barmode='group',
+        xaxis=dict(tickangle=-45)
+    )
+    return apply_dark_background(fig)
+
+
+# ==================== БДДС по лотам ====================
+@timed('figure')
+def build_budget_by_section_figure(result, hide_reserve=True):
+    """
+    График "План/факт/резерв по лотам"
+
+    Args:
+        result: Результат dashboard_data.compute_budget_by_section
+        hide_reserve: Скрыть резерв бюджета
+    """
+    section_data = result['chart_data']
+    x = section_data[result['period_col']]
+
+    traces = [('budget plan', 'Бюджет План', '#2E86AB'), ('budget fact', 'Бюджет Факт', '#A23B72')]
+    if not hide_reserve:
+        traces.append(('reserve budget', 'Резерв бюджета', '#06A77D'))
+
+    fig = go.Figure()
+    for column, name, color in traces:
+        fig.add_trace(go.Bar(
+            x=x,
+            y=section_data[column],
+            name=name,
+            marker_color=color,
+            text=section_data[column].apply(_int_label),
+            textposition='outside',
+            textfont=dict(size=18, color='white')
+        ))
+
+    fig.update_layout(
+        title=dict(text=f"План/факт/резерв по лотам{result['title_suffix']}", font=dict(size=24)),
+        xaxis_title=dict(text=result['period_label'], font=dict(size=20)),
+        yaxis_title=dict(text='Сумма бюджета', font=dict(size=20)),
+        barmode='group',
+        xaxis=dict(tickangle=0, tickfont=dict(size=16)),
+        yaxis=dict(tickfont=dict(size=16)),
+        legend=dict(font=dict(size=18)),
+        height=600
+    )
+    return apply_dark_background(fig)
+
+
+# ==================== Бюджет план/факт ====================
+@timed('figure')
+def build_budget_by_type_figure(by_type):
+    """
+    Гистограмма бюджета план/факт/корректировка/резерв по проектам
+
+    Args:
+        by_type: DataFrame 'by_type' из dashboard_data.compute_budget_by_type
+    """
+    fig = px.bar(
+        by_type,
+        x='project name',
+        y='Сумма',
+        color='Тип бюджета',
+        title='Бюджет план/факт/корректировка/резерв по проектам',
+        labels={'project name': 'Проект', 'Сумма': 'Сумма бюджета (руб.)'},
+        barmode='group',
+        text='Сумма_млн',
+        color_discrete_map=BUDGET_COLORS,
+        template=None
+    )
+    fig.update_layout(
+        xaxis_title='Проект',
+        yaxis_title='Сумма бюджета (руб.)',
+        height=600,
+        legend=HORIZONTAL_LEGEND,
+        xaxis=dict(tickangle=-45, tickfont=dict(size=12))
+    )
+    # Add text labels on the edge of bars (в миллионах рублей)
+    fig.update_traces(
+        textposition='outside',
+        texttemplate='%{text:.1f} млн руб.',
+        textfont=dict(size=12, color='white')
+    )
+    return apply_dark_background(fig)
+
+
+# ==================== Утвержденный и прогнозный бюджет ====================
+def _build_monthly_budget_figure(monthly, value_column, name, color, title, text_format):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=monthly['Месяц'],
+        y=monthly[value_column],
+        name=name,
+        marker_color=color,
+        text=monthly[value_column].apply(lambda x: format(x, text_format) if pd.notna(x) else ''),
+        textposition='outside',
+        textfont=dict(size=14, color='white')
+    ))
+    # Плановый бюджет для сравнения (линия)
+    fig.add_trace(go.Scatter(
+        x=monthly['Месяц'],
+        y=monthly['budget plan'],
+        name='Плановый бюджет (сумма)',
+        mode='lines+markers',
+        line=dict(color='#F18F01', width=2),
+        marker=dict(size=8, color='#F18F01')
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title='Месяц',
+        yaxis_title='Бюджет',
+        hovermode='x unified',
+        legend=HORIZONTAL_LEGEND,
+        height=600
+    )
+    return apply_dark_background(fig)
+
+
+@timed('figure')
+def build_approved_budget_figure(monthly):
+    """График утвержденного бюджета по месяцам"""
+    return _build_monthly_budget_figure(
+        monthly, 'approved budget', 'Утвержденный бюджет', '#2E86AB',
+        'Утвержденный бюджет по месяцам', '.0f'
+    )
+
+
+@timed('figure')
+def build_forecast_budget_figure(monthly, project):
+    """График прогнозного бюджета по месяцам для проекта"""
+    return _build_monthly_budget_figure(
+        monthly, 'forecast budget', 'Прогнозный бюджет', '#06A77D',
+        f'Прогнозный бюджет по месяцам (Проект: {project})', ',.0f'
+    )
+
+
+# ==================== Динамика отклонений ====================
+@timed('figure')
+def build_deviation_count_figure(grouped_data, period_label):
+    """Количество задач с отклонениями по периодам"""
+    fig = px.bar(
+        grouped_data,
+        x='period',
+        y='Количество задач',
+        title=f'Количество задач с отклонениями по {period_label.lower()}',
+        labels={'period': period_label, 'Количество задач': 'Количество задач'},
+        text='Количество задач',
+        template=None
+    )
+    apply_dark_background(fig)
+    fig.update_xaxes(tickangle=-45)
+    fig.update_traces(textposition='outside', textfont=dict(size=14, color='white'))
+    return fig
+
+
+@timed('figure')
+def build_deviation_days_line_figure(grouped_data, period_label):
+    """Линия суммарных дней отклонений по периодам"""
+    fig = px.line(
+        grouped_data,
+        x='period',
+        y='Всего дней отклонений',
+        title=f'Всего дней отклонений по {period_label.lower()}',
+        markers=True,
+        text='Всего дней отклонений'
+    )
+    apply_dark_background(fig)
+    fig.update_xaxes(tickangle=-45)
+    fig.update_traces(textposition='top center')
+    return fig
+
+
+@timed('figure')
+def build_deviation_days_by_project_figure(project_data):
+    """Дни отклонений по периодам, сгруппированные по проектам"""
+    fig = px.bar(
+        project_data,
+        x='period',
+        y='Всего дней отклонений',
+        color='project name',
+        title='Дни отклонений по периоду',
+        labels={'period': '', 'Всего дней отклонений': 'Дни отклонений'},
+        text='Всего дней отклонений',
+        template=None
+    )
+    fig.update_layout(barmode='group')
+    apply_dark_background(fig)
+    fig.update_xaxes(tickangle=-45, title_text='')
+    fig.update_traces(
+        textposition='outside',
+        textfont=dict(size=14, color='white')
+    )
+    # Horizontal text for all traces
+    for i, trace in enumerate(fig.data):
+        fig.data[i].update(textangle=0)
+    return fig
+
+
+def build_total_annotations(totals, x_column, y_column, font_size=14):
+    """
+    Аннотации с итоговыми значениями над столбцами накопительной диаграммы
+
+    Для отрицательных итогов аннотация располагается над нулевой линией.
+    """
+    annotations = []
+    for x_value, total in zip(totals[x_column], totals[y_column]):
+        annotations.append(
+            dict(
+                x=x_value,
+                y=total if total >= 0 else 0,
+                text=f'{int(total)}',
+                showarrow=False,
+                xanchor='center',
+                yanchor='bottom',
+                yshift=20,  # Фиксированное расстояние 20px от верхней точки столбца
+                font=dict(size=font_size, color='white', weight='bold')
+            )
+        )
+    return annotations
+
+
+@timed('figure')
+def build_deviation_days_by_reason_figure(reason_data, period_totals):
+    """Дни отклонений по периодам с секторами по причинам и итогами над столбцами"""
+    fig = px.bar(
+        reason_data,
+        x='period',
+        y='Всего дней отклонений',
+        color='reason of deviation',
+        title='Дни отклонений по периоду и причинам',
+        labels={'period': '', 'Всего дней отклонений': 'Дни отклонений'},
+        text='Всего дней отклонений',
+        template=None
+    )
+    # Используем накопление (stack) для отображения секторов причин в одном столбце
+    fig.update_layout(barmode='stack')
+    apply_dark_background(fig)
+    fig.update_xaxes(tickangle=-45, title_text='')
+    # Итоговые значения выводятся над столбцами через аннотации
+    fig.update_traces(
+        textposition='none',
+        textfont=dict(size=12, color='white')
+    )
+    for i, trace in enumerate(fig.data):
+        fig.data[i].update(textangle=0)
+    fig.update_layout(annotations=build_total_annotations(period_totals, 'period', 'Всего дней отклонений'))
+    return fig
+
+
+# ==================== Отклонение текущего срока от базового плана ====================
+def _gantt_trace(rows, name, color, show_completion):
+    texts = []
+    for _, row in rows.iterrows():
+        # Text for end of bar (end date)
+        text_label = row['Дата окончания'].strftime('%d.%m.%Y')
+        percent = row.get('Процент выполнения')
+        if show_completion and pd.notna(percent) and percent != "":
+            text_label = f"{text_label} ({percent})"
+        texts.append(text_label)
+    # For date axis, end dates go to x and start dates to base: the bar spans from base to x
+    return go.Bar(
+        x=list(rows['Дата окончания']),
+        base=list(rows['Дата начала']),
+        y=list(rows['Задача']),
+        orientation='h',
+        name=name,
+        marker_color=color,
+        text=texts,
+        textposition='outside',
+        textfont=dict(size=12, color='white'),
+        hovertemplate=f'<b>%{{y}}</b><br>Тип: {name}<br>Начало: %{{base|%d.%m.%Y}}<br>Окончание: %{{x|%d.%m.%Y}}<br><extra></extra>'
+    )
+
+
+@timed('figure')
+def build_plan_fact_gantt_figure(bar_df, project='Все', show_completion=False, y_label='Задача'):
+    """
+    Диаграмма Ганта "Срок работ план/факт"
+
+    Args:
+        bar_df: 'bars' из dashboard_data.compute_plan_fact_dates
+            (с колонкой 'Процент выполнения', если show_completion)
+            или из dashboard_data.plan_fact_overview
+        project: Выбранный проект ('Все' - все проекты)
+        show_completion: Показывать процент выполнения (план скрывается)
+        y_label: Подпись оси полос (задача, проект или раздел)
+    """
+    fig = go.Figure()
+    unique_tasks_sorted = bar_df['Задача'].unique().tolist()
+    valid = bar_df['Дата начала'].notna() & bar_df['Дата окончания'].notna()
+    plan_df = bar_df[(bar_df['Тип'] == 'План') & valid]
+    fact_df = bar_df[(bar_df['Тип'] == 'Факт') & valid]
+
+    # Plan bars are hidden when completion percentage is shown
+    if not plan_df.empty and not show_completion:
+        fig.add_trace(_gantt_trace(plan_df, 'План', '#2E86AB', show_completion))
+    if not fact_df.empty:
+        fig.add_trace(_gantt_trace(fact_df, 'Факт', '#FF6347', show_completion))
+
+    if project == 'Все':
+        chart_title = 'Срок работ план/факт (все проекты)'
+    else:
+        chart_title = f'Срок работ план/факт - {project}'
+
+    fig.update_layout(
+        title=chart_title,
+        xaxis_title='Дата',
+        yaxis_title=y_label,
+        height=max(600, len(unique_tasks_sorted) * 50),
+        barmode='group',
+        hovermode='closest',
+        legend=HORIZONTAL_LEGEND,
+        xaxis=dict(
+            type='date',
+            tickformat='%d.%m.%Y'
+        ),
+        yaxis=dict(
+            categoryorder='array',
+            categoryarray=list(reversed(unique_tasks_sorted))
+        )
+    )
+    return apply_dark_background(fig)
+
+
+# ==================== Значения отклонений от базового плана ====================
+@timed('figure')
+def build_deviation_by_tasks_figure(deviations, y_label='Проект', show_completion=False):
+    """
+    Горизонтальная диаграмма суммарных дней отклонений
+
+    Args:
+        deviations: 'deviations' из dashboard_data.compute_deviation_by_tasks
+        y_label: Подпись оси группировки
+        show_completion: Добавлять процент выполнения к подписям столбцов
+    """
+    # Format text for display on bars
+    text_values = []
+    for _, row in deviations.iterrows():
+        if show_completion and pd.notna(row.get('Процент выполнения')):
+            text_values.append(f"{row['Суммарно дней отклонений']:.0f} ({row['Процент выполнения']:.1f}%)")
+        else:
+            text_values.append(f"{row['Суммарно дней отклонений']:.0f}")
+
+    fig = px.bar(
+        deviations,
+        x='Суммарно дней отклонений',
+        y='Отображение',
+        orientation='h',
+        title='Отклонения от базового плана',
+        labels={'Суммарно дней отклонений': 'Суммарно дней отклонений', 'Отображение': y_label},
+        text=text_values,
+        color_discrete_sequence=['#1f77b4'],
+        template=None
+    )
+
+    # For horizontal bars, reverse the list so largest is at top
+    category_list = deviations['Отображение'].tolist()
+    fig.update_layout(
+        showlegend=False,
+        yaxis=dict(
+            categoryorder='array',
+            categoryarray=list(reversed(category_list))
+        )
+    )
+    apply_dark_background(fig)
+    fig.update_traces(textposition='outside', textfont=dict(size=14, color='white'))
+    return fig
+
+
+@timed('figure')
+def build_deviation_detail_figure(detail_deviations, y_label='Задача (Раздел)'):
+    """
+    Горизонтальная диаграмма отклонений по разделам и задачам
+
+    Args:
+        detail_deviations: Результат dashboard_data.compute_deviation_detail
+            или dashboard_data.deviation_detail_overview (суммы по разделам)
+        y_label: Подпись оси полос
+    """
+    fig = px.bar(
+        detail_deviations,
+        x='Суммарно дней отклонений',
+        y='Отображение',
+        orientation='h',
+        title='Детализация отклонений по разделам и задачам',
+        labels={'Суммарно дней отклонений': 'Суммарно дней отклонений', 'Отображение': y_label},
+        text=detail_deviations['Суммарно дней отклонений'].apply(lambda x: f'{int(x):,}' if pd.notna(x) else ''),
+        color_discrete_sequence=['#1f77b4'],
+        template=None
+    )
+
+    # Set category order to show largest values at top
+    category_list = detail_deviations['Отображение'].tolist()
+    fig.update_layout(
+        showlegend=False,
+        yaxis=dict(
+            categoryorder='array',
+            categoryarray=list(reversed(category_list))
+        ),
+        height=max(400, len(detail_deviations) * 30)  # Dynamic height based on number of items
+    )
+    apply_dark_background(fig)
+    fig.update_traces(textposition='outside', textfont=dict(size=12, color='white'))
+    return fig
+
+
+# ==================== Изменения между версиями ====================
+VERSION_DIFF_COLORS = {
+    'Добавлено': '#06A77D',
+    'Удалено': '#A23B72',
+    'Изменено': '#F18F01',
+}
+
+
+@timed('figure')
+def build_version_diff_figure(summary):
+    """
+    Горизонтальная диаграмма с накоплением: число добавленных, удаленных и
+    измененных задач по проектам
+
+    Args:
+        summary: 'summary' из dashboard_data.compute_version_diff
+    """
+    fig = go.Figure()
+    for label, color in VERSION_DIFF_COLORS.items():
+        fig.add_trace(go.Bar(
+            y=summary['Проект'],
+            x=summary[label],
+            name=label,
+            orientation='h',
+            marker_color=color
+        ))
+    fig.update_layout(
+        barmode='stack',
+        title='Изменения задач по проектам',
+        xaxis_title='Количество задач',
+        yaxis=dict(
+            title='Проект',
+            categoryorder='array',
+            categoryarray=list(reversed(summary['Проект'].tolist()))
+        ),
+        legend=HORIZONTAL_LEGEND,
+        height=max(400, len(summary) * 30)
+    )
+    return apply_dark_background(fig)
+
+
+# ==================== Динамика причин отклонений ====================
+@timed('figure')
+def build_reason_totals_figure(by_reason):
+    """Столбчатая диаграмма количества отклонений по причинам"""
+    fig = px.bar(
+        by_reason,
+        x='reason of deviation',
+        y='Количество',
+        title='Динамика причин отклонений по причинам',
+        labels={'reason of deviation': 'Причина отклонения', 'Количество': 'Количество отклонений'},
+        text='Количество',
+        color_discrete_sequence=['#1f77b4'],
+        template=None
+    )
+    fig.update_xaxes(tickangle=-45)
+    fig.update_traces(
+        textposition='outside',
+        textfont=dict(size=12, color='white')
+    )
+    return apply_dark_background(fig)
+
+
+def _add_trend_line(fig, totals, x_column, y_column='Количество'):
+    """Добавляет линейный тренд по итогам периодов"""
+    totals = totals.sort_values(x_column)
+    if len(totals) <= 1:
+        return
+    y_values = totals[y_column].values
+    x_numeric = range(len(y_values))
+    p = np.poly1d(np.polyfit(x_numeric, y_values, 1))
+    fig.add_trace(go.Scatter(
+        x=totals[x_column].tolist(),
+        y=p(x_numeric),
+        mode='lines',
+        name='Линия тренда',
+        line=dict(dash='dash', width=3, color='white'),
+        showlegend=True,
+        hoverinfo='skip'
+    ))
+
+
+@timed('figure')
+def build_reason_dynamics_by_period_figure(dynamics, period_col, period_label,
+                                           by_reason=True, show_trend=False):
+    """
+    Динамика причин отклонений по периодам
+
+    Args:
+        dynamics: 'dynamics' из dashboard_data.compute_dynamics_of_reasons
+        period_col: Колонка периода
+        period_label: Подпись оси периода
+        by_reason: Разбивать столбцы по причинам (иначе - один столбец на период)
+        show_trend: Показывать линию тренда
+    """
+    if not by_reason:
+        # Single column per period (sum of all reasons)
+        chart_data = dynamics.groupby(period_col)['Количество'].sum().reset_index()
+        chart_data['reason of deviation'] = 'Все проекты'
+        fig = px.bar(
+            chart_data,
+            x=period_col,
+            y='Количество',
+            title='Динамика причин отклонений по периодам',
+            labels={period_col: period_label, 'Количество': 'Количество отклонений'},
+            text='Количество',
+            color_discrete_sequence=['#1f77b4'],
+            template=None
+        )
+    else:
+        # Stacked bars: all reasons in one column per period
+        chart_data = dynamics
+        fig = px.bar(
+            dynamics,
+            x=period_col,
+            y='Количество',
+            color='reason of deviation',
+            title='Динамика причин отклонений по периодам',
+            labels={period_col: period_label, 'reason of deviation': 'Причина отклонения', 'Количество': 'Количество отклонений'},
+            text='Количество',
+            barmode='stack',
+            template=None
+        )
+
+    fig.update_xaxes(tickangle=-45)
+    # Show values inside bars, horizontal text
+    fig.update_traces(
+        textposition='inside',
+        textfont=dict(size=12, color='white')
+    )
+    for i, trace in enumerate(fig.data):
+        fig.data[i].update(textangle=0)
+
+    total_by_period = chart_data.groupby(period_col)['Количество'].sum().reset_index()
+    if by_reason:
+        # Total values above the highest bar of each period
+        max_y_value = dynamics['Количество'].max()
+        for period, total in zip(total_by_period[period_col], total_by_period['Количество']):
+            if total <= 0:
+                continue
+            max_bar_height = dynamics.loc[dynamics[period_col] == period, 'Количество'].max()
+            y_offset = max_y_value * 0.10 if max_y_value > 0 else max_bar_height * 0.10
+            fig.add_annotation(
+                x=period,
+                y=max_bar_height + y_offset,
+                text=f'<b>{int(total)}</b>',
+                showarrow=False,
+                font=dict(size=14, color='white'),
+                xanchor='center',
+                yanchor='bottom',
+                bgcolor='rgba(0,0,0,0.5)',
+                xshift=10
+            )
+
+    if show_trend:
+        _add_trend_line(fig, total_by_period, period_col)
+
+    return apply_dark_background(fig)
+
+
+# ==================== Выдача рабочей/проектной документации ====================
+@timed('figure')
+def build_rd_delay_figure(result):
+    """
+    Горизонтальная диаграмма "Просрочка выдачи РД"
+
+    Args:
+        result: Результат dashboard_data.compute_rd_delay
+    """
+    chart_data = result['chart_data']
+    y_column = result['y_column']
+    y_title = result['y_title']
+    text_values = chart_data['Отклонение разделов РД'].apply(lambda v: f"{v:.0f}" if pd.notna(v) else "").tolist()
+
+    fig = px.bar(
+        chart_data,
+        x='Отклонение разделов РД',
+        y=y_column,
+        orientation='h',
+        title='Просрочка выдачи РД',
+        labels={y_column: y_title, 'Отклонение разделов РД': 'Отклонение разделов РД'},
+        text=text_values,
+        color_discrete_sequence=['#2E86AB'],
+        template=None
+    )
+    fig.update_traces(
+        textposition='outside',
+        textfont=dict(size=14, color='white'),
+        marker=dict(
+            line=dict(width=1, color='white')
+        ),
+        showlegend=False
+    )
+
+    # Vertical line at 0 separates positive and negative deviations
+    fig.add_vline(x=0, line_dash="dash", line_color="gray")
+
+    # For horizontal bars, reverse the list so largest is at top
+    category_list = chart_data[y_column].tolist()
+    fig.update_layout(
+        xaxis_title='Отклонение разделов РД',
+        yaxis_title=y_title,
+        height=max(600, len(chart_data) * 40),
+        showlegend=False,
+        yaxis=dict(
+            tickangle=0,
+            categoryorder='array',
+            categoryarray=list(reversed(category_list))
+        ),
+        bargap=0.1
+    )
+    return apply_dark_background(fig)
+
+
+@timed('figure')
+def build_rd_execution_figure(pie_data):
+    """
+    Круговая диаграмма "Исполнение РД"
+
+    Args:
+        pie_data: Словарь {статус: количество} из dashboard_data.compute_rd_execution
+    """
+    fig = px.pie(
+        values=list(pie_data.values()),
+        names=list(pie_data.keys()),
+        title='Исполнение РД',
+        color_discrete_map={
+            'На согласовании': '#2E86AB',
+            'Выдано в производство работ': '#06A77D'
+        },
+        template=None
+    )
+    apply_dark_background(fig)
+    fig.update_traces(
+        textposition='inside',
+        textinfo='label',
+        texttemplate='%{label}',
+        textfont=dict(size=14, color='white'),
+        customdata=list(pie_data.values()),
+        hovertemplate='<b>%{label}</b><br>Значение: %{customdata}<br>Процент: %{percent:.0f}%<br><extra></extra>'
+    )
+
+    # Text with values and percentages
+    total = sum(pie_data.values())
+    custom_texts = []
+    for name, value in pie_data.items():
+        percent_val = (value / total * 100) if total > 0 else 0
+        custom_texts.append(f"{name}<br>{value}<br>({percent_val:.0f}%)")
+    for i, trace in enumerate(fig.data):
+        if i < len(custom_texts):
+            trace.text = [custom_texts[i]]
+    return fig
+
+
+@timed('figure')
+def build_rd_issue_dynamics_figure(dynamics_df):
+    """
+    Линейный график "Динамика выдачи РД" (накопительно)
+
+    Args:
+        dynamics_df: Результат dashboard_data.compute_rd_issue_dynamics
+    """
+    fig = px.line(
+        dynamics_df,
+        x='Дата',
+        y='Количество',
+        color='Тип',
+        title='Динамика выдачи РД',
+        markers=True,
+        labels={'Количество': 'Количество', 'Дата': 'Дата (Старт План)'},
+        text='Текст'
+    )
+    fig.update_layout(
+        xaxis_title='Дата (Старт План)',
+        yaxis_title='Количество',
+        hovermode='x unified',
+        legend=dict(HORIZONTAL_LEGEND, title_text='')
+    )
+    apply_dark_background(fig)
+    # Legend labels with the source columns
+    fig.for_each_trace(lambda t: t.update(
+        name='План (РД по Договору)' if t.name == 'План'
+        else 'Факт (Выдано в производство работ)' if t.name == 'Факт'
+        else t.name
+    ))
+    # Text labels always visible
+    fig.update_traces(
+        line=dict(width=2),
+        marker=dict(size=8),
+        mode='lines+markers+text',
+        textposition='top center',
+        textfont=dict(size=10, color='white')
+    )
+    return fig
+
+
+# ==================== Ресурсы и техника ====================
+VERTICAL_LEGEND = dict(
+    orientation="v",
+    yanchor="middle",
+    y=0.5,
+    xanchor="left",
+    x=1.1
+)
+
+DELTA_SIGN_COLORS = [
+    ('Дельта (+)', lambda values: values > 0, '#2ecc71'),
+    ('Дельта (-)', lambda values: values < 0, '#e74c3c'),
+    ('Дельта (0)', lambda values: values == 0, '#95a5a6'),
+]
+
+
+def _delta_label(x):
+    return f'{int(x)}' if pd.notna(x) and abs(x) >= 0.5 else '0'
+
+
+def _zero_label(x):
+    return f'{int(x)}' if pd.notna(x) else '0'
+
+
+@timed('figure')
+def build_contractor_delta_pie_figure(delta_pct):
+    """Круговая диаграмма дельты (%) по контрагентам (размер сектора - модуль дельты)"""
+    # Pie charts don't support negative values: plot absolute values, show signed ones
+    pie_data = delta_pct.copy()
+    if 'Дельта (%)_abs' not in pie_data.columns:
+        # Строка 'Прочие' (dashboard_data.limit_categories) приходит с суммой модулей
+        pie_data['Дельта (%)_abs'] = pie_data['Дельта (%)'].abs()
+    fig = px.pie(
+        pie_data,
+        values='Дельта (%)_abs',
+        names='Контрагент',
+        title='Распределение дельты (%) по контрагентам',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_layout(
+        height=600,
+        showlegend=True,
+        legend=VERTICAL_LEGEND,
+        title_font_size=16
+    )
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        texttemplate='%{label}<br>%{customdata:.0f}%<br>(%{percent})',
+        textfont=dict(size=12, color='white'),
+        customdata=pie_data['Дельта (%)'].tolist(),
+        hovertemplate='<b>%{label}</b><br>Дельта (%): %{customdata:.0f}%<br>Процент: %{percent}<br><extra></extra>'
+    )
+    return apply_dark_background(fig)
+
+
+@timed('figure')
+def build_contractor_bar_figure(contractor_data):
+    """Столбчатая диаграмма плана, среднего за месяц и дельты по контрагентам"""
+    fig = go.Figure()
+    for column, color in [('План', '#3498db'), ('Среднее за месяц', '#2ecc71')]:
+        fig.add_trace(go.Bar(
+            name=column,
+            x=contractor_data['Контрагент'],
+            y=contractor_data[column],
+            marker_color=color,
+            text=contractor_data[column].apply(_zero_label),
+            textposition='outside',
+            textfont=dict(size=12, color='white')
+        ))
+
+    # Delta is shown as absolute value, colored by sign
+    delta_values = contractor_data['Дельта'].fillna(0)
+    delta_abs = delta_values.abs()
+    for name, sign_mask, color in DELTA_SIGN_COLORS:
+        mask = sign_mask(delta_values)
+        if mask.any():
+            fig.add_trace(go.Bar(
+                name=name,
+                x=contractor_data.loc[mask, 'Контрагент'],
+                y=delta_abs[mask],
+                marker_color=color,
+                text=delta_abs[mask].apply(_delta_label),
+                textposition='outside',
+                textfont=dict(size=12, color='white'),
+                showlegend=False
+            ))
+
+    fig.update_layout(
+        title='План, Среднее за месяц и Дельта по контрагентам',
+        xaxis_title='Контрагент',
+        yaxis_title='Значение',
+        barmode='group',
+        height=600,
+        legend=HORIZONTAL_LEGEND,
+        xaxis=dict(tickangle=-45)
+    )
+    return apply_dark_background(fig)
+
+
+@timed('figure')
+def build_contractor_plan_avg_pie_figure(plan_avg):
+    """Круговая диаграмма суммы плана и среднего за месяц по контрагентам"""
+    fig = px.pie(
+        plan_avg,
+        values='Сумма',
+        names='Контрагент',
+        title='Распределение суммы Плана и Среднего за месяц по контрагентам',
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+    fig.update_layout(
+        height=600,
+        showlegend=True,
+        legend=VERTICAL_LEGEND,
+        title_font_size=16
+    )
+    fig.update_traces(
+        textposition='inside',
+        textinfo='label',
+        texttemplate='%{label}',
+        textfont=dict(size=11, color='white'),
+        customdata=list(zip(plan_avg['Доля факта (%)'], plan_avg['Доля отклонения (%)'], plan_avg['Сумма'])),
+        hovertemplate='<b>%{label}</b><br>Сумма: %{customdata[2]:.0f}<br>Процент: %{percent}<br>Доля факта: %{customdata[0]:.0f}%<br>Доля отклонения: %{customdata[1]:.0f}%<br><extra></extra>'
+    )
+    return apply_dark_background(fig)
+
+
+def _skud_bar_figure(data, x, title, color=None, facet_col=None):
+    fig = px.bar(
+        data,
+        x=x,
+        y='Среднее за месяц',
+        color=color,
+        facet_col=facet_col,
+        title=title,
+        labels={x: 'Месяц', 'Среднее за месяц': 'Среднее за месяц (чел.)'} if x == 'period_display'
+        else {'Среднее за месяц': 'Среднее за месяц (чел.)'},
+        text='Среднее за месяц',
+        template=None
+    )
+    if color:
+        fig.update_layout(barmode='group')
+    fig.update_traces(
+        textposition='outside',
+        textfont=dict(size=12, color='white')
+    )
+    fig.update_xaxes(tickangle=-45)
+    return apply_dark_background(fig)
+
+
+def _skud_line_figure(data):
+    fig = px.line(
+        data,
+        x='period_display',
+        y='Среднее за месяц',
+        title='Среднее за месяц по людям в динамике',
+        labels={'period_display': 'Месяц', 'Среднее за месяц': 'Среднее за месяц (чел.)'},
+        markers=True
+    )
+    fig.update_xaxes(tickangle=-45)
+    return apply_dark_background(fig)
+
+
+@timed('figure')
+def build_skud_figure(result, grouping):
+    """
+    График панели "СКУД стройка" по результату compute_skud
+
+    Returns:
+        go.Figure или None, если график с выбранной группировкой не строится
+    """
+    grouped_data = result['grouped']
+    grouping_cols = result['grouping_cols']
+    has_period = result['has_period']
+
+    if grouping == 'Без группировки':
+        if has_period:
+            return _skud_line_figure(grouped_data)
+        # Single value bar chart
+        fig = px.bar(
+            grouped_data,
+            y='Среднее за месяц',
+            title='Среднее за месяц по людям',
+            labels={'Среднее за месяц': 'Среднее за месяц (чел.)'},
+            text='Среднее за месяц',
+            template=None
+        )
+        fig.update_traces(
+            textposition='outside',
+            textfont=dict(size=12, color='white')
+        )
+        return apply_dark_background(fig)
+
+    if has_period and len(grouping_cols) == 1:
+        return _skud_bar_figure(grouped_data, 'period_display', 'Среднее за месяц по людям в динамике',
+                                color=grouping_cols[0])
+    if has_period and len(grouping_cols) > 1:
+        # First grouping column as color, second as facet
+        return _skud_bar_figure(grouped_data, 'period_display', 'Среднее за месяц по людям в динамике',
+                                color=grouping_cols[0], facet_col=grouping_cols[1])
+    if has_period:
+        return _skud_line_figure(grouped_data)
+    if len(grouping_cols) == 1:
+        # Single month selected
+        return _skud_bar_figure(grouped_data, grouping_cols[0], 'Среднее за месяц по людям')
+    return None
@@ -0,0 +1,372 @@
+"""
+Модуль загрузки данных проектов, ресурсов и техники.
+
+Не зависит от Streamlit: используется как приложением (через load_data),
+так и пакетной генерацией отчетов (batch_render.py).
+"""
+import csv
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from date_parser import parse_date_columns
+from fill_gaps import fill_project_gaps
+from schema import apply_schema
+
+
+# Соответствие русских названий колонок английским (используемым в расчетах)
+COLUMN_MAPPING = {
+    'Проект': 'project name',
+    'Аббревиатура': 'abbreviation',
+    'Блок': 'block',
+    'Раздел': 'section',
+    'Задача': 'task name',
+    'Старт Факт': 'base start',
+    'Конец Факт': 'base end',
+    'Старт План': 'plan start',
+    'Конец План': 'plan end',
+    'Отклонение': 'deviation',
+    'Отклонений в днях': 'deviation in days',
+    'Причина отклонений': 'reason of deviation',
+    'Бюджет План': 'budget plan',
+    'Бюджет Факт': 'budget fact',
+    'Резерв': 'reserve'
+}
+
+DATE_COLUMNS = ['base start', 'base end', 'plan start', 'plan end']
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Priority: UTF-8 first (most common), then UTF-8 with BOM, then Windows encodings
+CSV_ENCODINGS = ['utf-8', 'utf-8-sig', 'windows-1251', 'cp1251']
+
+# Колонки данных проектов, которые читают панели (исходные названия и алиасы)
+PROJECT_COLUMNS = set(COLUMN_MAPPING) | set(COLUMN_MAPPING.values()) | {
+    'Бюджет Корректировка', 'budget adjusted', 'adjusted budget',
+    'Резерв бюджета', 'reserve budget', 'План Старт',
+}
+# Колонки РД панели документации и просрочки РД ищут по вхождению подстроки
+PROJECT_COLUMN_FRAGMENTS = ('рд', 'согласовани', 'подрядчик', 'производств', 'доработк')
+
+
+def _is_project_column(name):
+    return name in PROJECT_COLUMNS or any(fragment in name.lower() for fragment in PROJECT_COLUMN_FRAGMENTS)
+
+
+# Планы разбора по типам данных:
+# - text_columns - колонки, читаемые как строки без определения типа;
+# - keep_column - какие колонки читать (None - все);
+# - decimal - десятичный разделитель в CSV.
+PARSE_PLANS = {
+    'project': {
+        'text_columns': {'Проект', 'Аббревиатура', 'Блок', 'Раздел', 'Задача', 'Причина отклонений',
+                         'project name', 'abbreviation', 'block', 'section', 'task name', 'reason of deviation'},
+        'keep_column': _is_project_column,
+        'decimal': ',',
+    },
+    'resources': {
+        'text_columns': {'Проект', 'Контрагент', 'Подразделение'},
+        'keep_column': None,
+        'decimal': ',',
+    },
+}
+PARSE_PLANS['technique'] = PARSE_PLANS['resources']
+
+# Файлы, прочитанные с заполнением пропусков: (sha256 содержимого, имя файла) -> DataFrame
+FILLED_CACHE_SIZE = 8
+_filled_cache = OrderedDict()
+_filled_lock = threading.Lock()
+
+
+def detect_data_type(df, file_name=None):
+    """Detect the type of data based on column structure and filename"""
+    columns = [str(col).lower() for col in df.columns]
+    file_name_lower = str(file_name).lower() if file_name else ''
+
+    # Check for project data (has task name, plan start/end, budget plan)
+    if any(col in columns for col in ['задача', 'task name']) and \
+       any(col in columns for col in ['старт план', 'plan start']) and \
+       any(col in columns for col in ['бюджет план', 'budget plan']):
+        return 'project'
+
+    # Check for resources/technique data (has Контрагент/Подразделение, недели, План)
+    # Check for contractor column (Контрагент or Подразделение)
+    has_contractor = any(col in columns for col in ['контрагент', 'подразделение', 'contractor'])
+    # Check for week columns
+    has_weeks = (any(col in columns for col in ['1 неделя', '2 неделя', '3 неделя']) or \
+                 any('неделя' in col for col in columns))
+    # Check for plan column (План, План на месяц, etc.)
+    has_plan = any(col in columns for col in ['план', 'план на месяц', 'plan'])
+    # Check for delta column (Дельта, Отклонение)
+    has_delta = any(col in columns for col in ['дельта', 'отклонение', 'deviation', 'delta'])
+
+    if has_contractor and has_weeks and (has_plan or has_delta):
+        # Check filename first for better accuracy
+        if 'ресурс' in file_name_lower or 'resource' in file_name_lower:
+            return 'resources'
+        elif 'техник' in file_name_lower or 'technique' in file_name_lower:
+            return 'technique'
+        # If filename doesn't help, check column names more carefully
+        elif 'ресурс' in ' '.join(columns) or 'resource' in ' '.join(columns):
+            return 'resources'
+        elif 'техник' in ' '.join(columns) or 'technique' in ' '.join(columns):
+            return 'technique'
+        # Check for "Среднее за неделю" (resources) vs "Среднее за месяц" (technique)
+        elif any('среднее за неделю' in col for col in columns):
+            return 'resources'
+        elif any('среднее за месяц' in col for col in columns):
+            return 'technique'
+        else:
+            # Default to resources if we can't determine (most common case)
+            return 'resources'
+
+    # Default to project if we can't determine
+    return 'project'
+
+
+def _read_csv(source, encodings=CSV_ENCODINGS, **options):
+    """
+    Читает CSV, перебирая кодировки и разделители
+
+    Args:
+        source: Файловый объект с методом seek (загруженный файл или открытый файл)
+        encodings: Кодировки в порядке перебора
+        **options: Дополнительные параметры pd.read_csv (nrows, usecols, dtype...)
+
+    Returns:
+        Кортеж (DataFrame, кодировка, с которой файл прочитан)
+    """
+    for encoding in encodings:
+        try:
+            # First try with semicolon delimiter (common in European CSV files)
+            source.seek(0)  # Reset file pointer
+            df = pd.read_csv(source, sep=';', encoding=encoding,
+                             quoting=csv.QUOTE_MINIMAL, quotechar='"', doublequote=True, **options)
+            return df, encoding
+        except (UnicodeDecodeError, pd.errors.ParserError):
+            try:
+                # If semicolon fails, try comma delimiter
+                source.seek(0)  # Reset file pointer
+                df = pd.read_csv(source, sep=',', encoding=encoding,
+                                 quoting=csv.QUOTE_MINIMAL, quotechar='"', doublequote=True, **options)
+                return df, encoding
+            except (UnicodeDecodeError, pd.errors.ParserError):
+                continue
+    # Last resort: try with UTF-8 and default settings
+    source.seek(0)  # Reset file pointer
+    try:
+        return pd.read_csv(source, encoding='utf-8', **options), 'utf-8'
+    except Exception:
+        source.seek(0)  # Reset file pointer
+        return pd.read_csv(source, **options), None
+
+
+def normalize_column_name(name):
+    """Название колонки без переносов строк и пробелов по краям"""
+    # Handles CSV headers split across multiple lines
+    return str(name).replace('\n', ' ').replace('\r', ' ').strip()
+
+
+def _parse_options(data_type, header):
+    """
+    Параметры чтения файла по плану разбора его типа данных
+
+    Args:
+        data_type: Тип данных, определенный по заголовку
+        header: Исходные названия колонок из заголовка файла
+
+    Returns:
+        Словарь параметров для pd.read_csv / pd.read_excel (usecols, dtype)
+    """
+    plan = PARSE_PLANS[data_type]
+    options = {
+        'dtype': {col: str for col in header if normalize_column_name(col) in plan['text_columns']}
+    }
+    keep_column = plan['keep_column']
+    if keep_column is not None:
+        # A callable (not a list) never fails on columns missing from the header
+        options['usecols'] = lambda col: keep_column(normalize_column_name(col))
+    return options
+
+
+# Колонки, которые add_period_columns вычисляет из дат
+PERIOD_COLUMNS = tuple(
+    f'{prefix}_{level}'
+    for prefix in ('plan_start', 'plan', 'base_start', 'base')
+    for level in ('day', 'month', 'quarter', 'year')
+) + ('actual_month', 'actual_quarter', 'actual_year')
+
+
+def add_period_columns(df):
+    """
+    Добавляет колонки периодов (день, месяц, квартал, год) для всех дат
+
+    Args:
+        df: DataFrame с уже разобранными колонками дат (изменяется на месте)
+    """
+    # Extract day, month, quarter, year from plan dates
+    for date_col, prefix in [('plan start', 'plan_start'), ('plan end', 'plan'),
+                             ('base start', 'base_start'), ('base end', 'base')]:
+        if date_col in df.columns:
+            mask = df[date_col].notna()
+            if mask.any():
+                # Day level
+                df.loc[mask, f'{prefix}_day'] = df.loc[mask, date_col].dt.date
+                # Month level
+                df.loc[mask, f'{prefix}_month'] = df.loc[mask, date_col].dt.to_period('M')
+                # Quarter level
+                df.loc[mask, f'{prefix}_quarter'] = df.loc[mask, date_col].dt.to_period('Q')
+                # Year level
+                df.loc[mask, f'{prefix}_year'] = df.loc[mask, date_col].dt.to_period('Y')
+
+    # Also create plan_month, plan_quarter, plan_year for backward compatibility
+    if 'plan end' in df.columns:
+        mask = df['plan end'].notna()
+        if mask.any():
+            df.loc[mask, 'plan_month'] = df.loc[mask, 'plan end'].dt.to_period('M')
+            df.loc[mask, 'plan_quarter'] = df.loc[mask, 'plan end'].dt.to_period('Q')
+            df.loc[mask, 'plan_year'] = df.loc[mask, 'plan end'].dt.to_period('Y')
+
+    if 'base end' in df.columns:
+        mask = df['base end'].notna()
+        if mask.any():
+            df.loc[mask, 'actual_month'] = df.loc[mask, 'base end'].dt.to_period('M')
+            df.loc[mask, 'actual_quarter'] = df.loc[mask, 'base end'].dt.to_period('Q')
+            df.loc[mask, 'actual_year'] = df.loc[mask, 'base end'].dt.to_period('Y')
+    return df
+
+
+def read_data_file(source, file_name=None, fill_missing=False):
+    """
+    Читает файл с данными и приводит его к формату, ожидаемому панелями
+
+    Args:
+        source: Загруженный файл Streamlit, открытый бинарный файл или путь к файлу
+        file_name: Имя файла (используется для определения формата и типа данных)
+        fill_missing: Заполнить пропуски в данных проектов (fill_gaps.fill_project_gaps);
+            результат кэшируется по хэшу содержимого файла
+
+    Returns:
+        DataFrame с метаданными в df.attrs ('data_type', 'file_name', для данных
+        проектов также 'memory_before' и 'memory_after' - байты колонок схемы
+        до и после приведения типов)
+
+    Raises:
+        ValueError: если формат файла не поддерживается
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return read_data_file(f, file_name or os.path.basename(source), fill_missing)
+
+    original_name = file_name if file_name else getattr(source, 'name', '')
+    source_name = str(getattr(source, 'name', original_name)).lower()
+
+    if fill_missing:
+        source.seek(0)
+        cache_key = (hashlib.sha256(source.read()).hexdigest(), original_name)
+        source.seek(0)
+        with _filled_lock:
+            cached = _filled_cache.get(cache_key)
+            if cached is not None:
+                _filled_cache.move_to_end(cache_key)
+        if cached is not None:
+            return cached.copy()
+
+    is_csv = source_name.endswith('.csv')
+    if not is_csv and not source_name.endswith(('.xlsx', '.xls')):
+        raise ValueError("Неподдерживаемый формат файла. Загрузите CSV или Excel файл.")
+
+    # Data type is detected on the header row alone and selects the parse plan
+    if is_csv:
+        header, encoding = _read_csv(source, nrows=0)
+    else:
+        header = pd.read_excel(source, nrows=0)
+    data_type = detect_data_type(pd.DataFrame(columns=[normalize_column_name(col) for col in header.columns]),
+                                 original_name)
+    options = _parse_options(data_type, list(header.columns))
+
+    if is_csv:
+        # The encoding that decoded the header is tried first
+        encodings = [encoding] + [e for e in CSV_ENCODINGS if e != encoding] if encoding else CSV_ENCODINGS
+        df, _ = _read_csv(source, encodings, decimal=PARSE_PLANS[data_type]['decimal'], **options)
+    else:
+        source.seek(0)
+        df = pd.read_excel(source, **options)
+
+    df.columns = [normalize_column_name(col) for col in df.columns]
+
+    # Create aliases for Russian column names if they exist and English names don't
+    for russian_name, english_name in COLUMN_MAPPING.items():
+        if russian_name in df.columns and english_name not in df.columns:
+            df[english_name] = df[russian_name]
+
+    # Convert date columns - dominant format (DD.MM.YYYY) detected on a sample
+    parse_date_columns(df, DATE_COLUMNS)
+
+    if fill_missing and data_type == 'project':
+        # Gaps are filled before the period columns and the schema are derived from the data
+        df = fill_project_gaps(df, only_missing=True)
+
+    # Add time period columns for grouping from all date fields
+    add_period_columns(df)
+
+    # Store metadata in DataFrame attributes
+    df.attrs['data_type'] = data_type
+    df.attrs['file_name'] = original_name
+
+    # Project data: typed once here, dashboards rely on the dtypes
+    if df.attrs['data_type'] == 'project':
+        report = apply_schema(df)
+        df.attrs['memory_before'] = int(report['Байт до'].sum())
+        df.attrs['memory_after'] = int(report['Байт после'].sum())
+
+    if fill_missing:
+        with _filled_lock:
+            _filled_cache[cache_key] = df
+            while len(_filled_cache) > FILLED_CACHE_SIZE:
+                _filled_cache.popitem(last=False)
+        return df.copy()
+    return df
+
+
+def concat_data(frames):
+    """
+    Объединяет DataFrame одного типа данных
+
+    Колонки, приведенные к разным типам в разных файлах (например, целые
+    дни отклонений и дни с пропусками), выравниваются повторным
+    приведением данных проектов к схеме.
+    """
+    df = pd.concat(frames, ignore_index=True)
+    if frames[0].attrs.get('data_type') == 'project':
+        apply_schema(df)
+        df.attrs['data_type'] = 'project'
+    return df
+
+
+def load_directory(data_dir):
+    """
+    Загружает все поддерживаемые файлы из каталога и объединяет их по типам
+
+    Args:
+        data_dir: Путь к каталогу с файлами CSV/Excel
+
+    Returns:
+        Словарь {'project': DataFrame|None, 'resources': ..., 'technique': ...}
+    """
+    datasets = {'project': None, 'resources': None, 'technique': None}
+    for entry in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, entry)
+        if not os.path.isfile(path) or not entry.lower().endswith(SUPPORTED_EXTENSIONS):
+            continue
+        df = read_data_file(path, entry)
+        data_type = df.attrs.get('data_type', 'project')
+        if datasets[data_type] is None:
+            datasets[data_type] = df
+        else:
+            # Concatenate if multiple files of the same type
+            datasets[data_type] = concat_data([datasets[data_type], df])
+    return datasets
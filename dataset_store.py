@@ -0,0 +1,362 @@
+"""
+Хранилище версий данных проектов
+
+Каждый загруженный файл данных проектов (из каталогов, заданных в
+настройках, или вручную) сохраняется как неизменяемая версия, поэтому
+старые выгрузки доступны без повторного разбора файлов.
+
+Строки хранятся один раз: для строки считается хеш содержимого
+(row_hashes), и версия - это позиции ее строк в общем пуле строк. В пул
+(колоночный DataFrame) добавляются только строки, которых там еще нет,
+так что еженедельная выгрузка, где изменилась часть задач, занимает место
+только под измененные строки. Пулы разделены по схеме (набор колонок и
+типов), чтобы версия восстанавливалась с исходными типами.
+
+На диске версия - файл HISTORY_DIR/vNNNNNN.pkl с метаданными, позициями
+строк и новыми строками пула; файлы не изменяются после записи. Колонки
+периодов на диск не пишутся и вычисляются из дат при чтении.
+
+Запросы:
+- as_of / version_at - версия на момент времени;
+- load_version / version_rows - набор данных версии или его строки
+  (срез пула по позициям);
+- task_history - агрегат по задачам во всех версиях (например, сумма
+  дней отклонений по каждой задаче в каждой выгрузке).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from auth import BASE_DIR
+from data_loader import PERIOD_COLUMNS, add_period_columns
+from schema import ensure_numeric
+
+HISTORY_DIR = os.path.join(BASE_DIR, 'dataset_history')
+
+# Ключ задачи в версиях данных
+TASK_KEY_COLUMNS = ('project name', 'block', 'section', 'task name')
+
+# Сколько восстановленных наборов данных версий хранить в памяти
+VERSION_CACHE_SIZE = 4
+
+# Хеш пустого значения (NaN, None, NaT) в строковых и прочих колонках
+_NA_HASH = pd.util.hash_array(np.array([None], dtype=object))[0]
+
+_HASH_MULTIPLIER = np.uint64(1000003)
+
+
+class StoredVersion:
+    """Метаданные сохраненной версии (не изменяются после записи)"""
+
+    def __init__(self, version_id, created, source, content_hash, rows, new_rows, uploaded_by, attrs, schema):
+        self.id = version_id
+        self.created = created
+        self.source = source            # путь или имя загруженного файла
+        self.content_hash = content_hash
+        self.rows = rows
+        self.new_rows = new_rows        # сколько строк версия добавила в пул
+        self.uploaded_by = uploaded_by
+        self.attrs = attrs              # DataFrame.attrs набора данных
+        self.schema = schema            # ((колонка, тип), ...)
+        self.positions = None           # позиции строк версии в пуле схемы
+
+    def label(self):
+        """Подпись версии для списков выбора"""
+        return f"№{self.id} от {self.created.strftime('%d.%m.%Y %H:%M')} - {os.path.basename(self.source)}"
+
+
+class _Pool:
+    """Уникальные строки всех версий одной схемы"""
+
+    def __init__(self):
+        self.segments = []  # DataFrame новых строк каждой версии
+        self.hashes = []    # хеши строк сегментов
+        self.size = 0
+        self._frame = None
+        self._index = None
+        self._task_codes = None
+
+    def add(self, rows, hashes):
+        self.segments.append(rows)
+        self.hashes.append(hashes)
+        self.size += len(rows)
+        self._frame = self._index = self._task_codes = None
+
+    def index(self):
+        if self._index is None:
+            self._index = pd.Index(np.concatenate(self.hashes) if self.hashes else np.array([], dtype=np.uint64))
+        return self._index
+
+    def frame(self):
+        if self._frame is None:
+            self._frame = pd.concat(self.segments, ignore_index=True) if len(self.segments) > 1 else self.segments[0]
+        return self._frame
+
+    def task_codes(self):
+        """(номер задачи для каждой строки пула, DataFrame ключей задач по номерам)"""
+        if self._task_codes is None:
+            frame = self.frame()
+            keys = [col for col in TASK_KEY_COLUMNS if col in frame.columns]
+            grouped = frame.groupby(keys, sort=False, dropna=False)
+            codes = grouped.ngroup().to_numpy()
+            tasks = frame[keys].take(np.unique(codes, return_index=True)[1]).reset_index(drop=True)
+            self._task_codes = (codes, tasks)
+        return self._task_codes
+
+
+_lock = threading.Lock()
+_loaded = False
+_versions = []  # StoredVersion по возрастанию номера
+_pools = {}     # схема -> _Pool
+_frames = OrderedDict()  # номер версии -> восстановленный DataFrame (LRU)
+
+
+def _schema(frame):
+    return tuple((str(col), str(dtype)) for col, dtype in frame.dtypes.items())
+
+
+def _hash_columns(frame):
+    # Колонки периодов вычисляются из дат и не меняют идентичность строки
+    return [col for col in frame.columns if col not in PERIOD_COLUMNS]
+
+
+def _column_hashes(values):
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufmM':
+        return pd.util.hash_array(values.to_numpy())
+    # Строки хешируются по уникальным значениям: их обычно намного меньше, чем строк
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return np.full(len(values), _NA_HASH, dtype=np.uint64)
+    unique_hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+    return np.where(codes >= 0, unique_hashes[codes], _NA_HASH).astype(np.uint64)
+
+
+def row_hashes(frame):
+    """
+    Хеш содержимого каждой строки (uint64), одинаковый в разных процессах
+
+    Колонки периодов (data_loader.PERIOD_COLUMNS) не учитываются: они
+    вычисляются из дат.
+    """
+    combined = np.zeros(len(frame), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for col in _hash_columns(frame):
+            combined = combined * _HASH_MULTIPLIER ^ _column_hashes(frame[col])
+    return combined
+
+
+def _version_path(version_id):
+    return os.path.join(HISTORY_DIR, f'v{version_id:06d}.pkl')
+
+
+def _restore_periods(rows, schema):
+    """Вычисляет колонки периодов строк, прочитанных с диска, с типами из схемы"""
+    add_period_columns(rows)
+    rows = rows.reindex(columns=[col for col, _ in schema])
+    derived = {col: dtype for col, dtype in schema if col in PERIOD_COLUMNS}
+    return rows.astype(derived) if derived else rows
+
+
+def _register(version, rows, hashes):
+    _pools.setdefault(version.schema, _Pool()).add(rows, hashes)
+    _versions.append(version)
+
+
+def _load():
+    """Читает сохраненные версии при первом обращении"""
+    global _loaded
+    if _loaded:
+        return
+    if os.path.isdir(HISTORY_DIR):
+        for name in sorted(os.listdir(HISTORY_DIR)):
+            if not (name.startswith('v') and name.endswith('.pkl')):
+                continue
+            record = pd.read_pickle(os.path.join(HISTORY_DIR, name))
+            version = StoredVersion(**record['meta'])
+            version.positions = record['positions']
+            _register(version, _restore_periods(record['rows'], version.schema), record['hashes'])
+    _loaded = True
+
+
+def add_version(df, source, uploaded_by=None):
+    """
+    Сохраняет набор данных проектов как новую версию
+
+    Если содержимое совпадает с последней версией того же источника, новая
+    версия не создается.
+
+    Args:
+        df: DataFrame данных проектов (после read_data_file)
+        source: Путь или имя файла
+        uploaded_by: Пользователь, загрузивший файл (None - загрузка из каталога)
+
+    Returns:
+        StoredVersion - новая или совпавшая последняя версия
+    """
+    frame = df.reset_index(drop=True)
+    schema = _schema(frame)
+    hashes = row_hashes(frame)
+    content_hash = hashlib.sha256(repr(schema).encode('utf-8') + hashes.tobytes()).hexdigest()
+
+    with _lock:
+        _load()
+        latest = next((v for v in reversed(_versions) if v.source == source), None)
+        if latest is not None and latest.content_hash == content_hash:
+            return latest
+
+        pool = _pools.get(schema)
+        positions = pool.index().get_indexer(hashes) if pool is not None else np.full(len(hashes), -1)
+        new = positions < 0
+        # Одинаковые строки внутри файла тоже хранятся один раз
+        new_hashes, first = np.unique(hashes[new], return_index=True)
+        base = pool.size if pool is not None else 0
+        positions[new] = base + np.searchsorted(new_hashes, hashes[new])
+        rows = frame.take(np.flatnonzero(new)[first]).reset_index(drop=True)
+
+        version = StoredVersion(
+            version_id=_versions[-1].id + 1 if _versions else 1,
+            created=datetime.now(),
+            source=source,
+            content_hash=content_hash,
+            rows=len(frame),
+            new_rows=len(rows),
+            uploaded_by=uploaded_by,
+            attrs=dict(df.attrs),
+            schema=schema,
+        )
+        version.positions = positions.astype(np.int64)
+
+        os.makedirs(HISTORY_DIR, exist_ok=True)
+        path = _version_path(version.id)
+        meta = {key: value for key, value in vars(version).items() if key != 'positions'}
+        meta['version_id'] = meta.pop('id')
+        stored_rows = rows.drop(columns=[col for col in PERIOD_COLUMNS if col in rows.columns])
+        pd.to_pickle({'meta': meta, 'positions': version.positions, 'rows': stored_rows, 'hashes': new_hashes},
+                     path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+        _register(version, rows, new_hashes)
+        return version
+
+
+def list_versions(source=None):
+    """Сохраненные версии по возрастанию номера (только источника source, если он задан)"""
+    with _lock:
+        _load()
+        return [v for v in _versions if source is None or v.source == source]
+
+
+def version_at(when=None, source=None):
+    """Последняя версия, сохраненная не позже when (None - последняя вообще)"""
+    for version in reversed(list_versions(source)):
+        if when is None or version.created <= when:
+            return version
+    return None
+
+
+def get_version(version_id):
+    """Метаданные версии (KeyError, если версии нет)"""
+    version = next((v for v in list_versions() if v.id == version_id), None)
+    if version is None:
+        raise KeyError(f"Версия данных {version_id} не найдена")
+    return version
+
+
+def version_rows(version_id, rows):
+    """
+    Строки версии с номерами rows (без восстановления всего набора данных)
+
+    Returns:
+        DataFrame с RangeIndex и колонками версии
+    """
+    version = get_version(version_id)
+    with _lock:
+        return _pools[version.schema].frame().take(version.positions[rows]).reset_index(drop=True)
+
+
+def load_version(version_id):
+    """
+    Набор данных версии
+
+    Повторный вызов возвращает тот же объект DataFrame (кэши панелей
+    остаются действительными); изменять его на месте нельзя.
+    """
+    with _lock:
+        _load()
+        cached = _frames.get(version_id)
+        if cached is not None:
+            _frames.move_to_end(version_id)
+            return cached
+        version = next((v for v in _versions if v.id == version_id), None)
+        if version is None:
+            raise KeyError(f"Версия данных {version_id} не найдена")
+        frame = _pools[version.schema].frame().take(version.positions).reset_index(drop=True)
+        frame.attrs = dict(version.attrs)
+        _frames[version_id] = frame
+        while len(_frames) > VERSION_CACHE_SIZE:
+            _frames.popitem(last=False)
+        return frame
+
+
+def as_of(when, source=None):
+    """Набор данных последней версии на момент when (None, если версий нет)"""
+    version = version_at(when, source)
+    return load_version(version.id) if version is not None else None
+
+
+def task_history(value_col='deviation in days', versions=None):
+    """
+    Сумма колонки по каждой задаче в каждой версии
+
+    Считается по пулам строк без восстановления наборов данных версий:
+    номера задач вычисляются один раз для строк пула.
+
+    Args:
+        value_col: Числовая колонка
+        versions: Список StoredVersion (по умолчанию - все версии)
+
+    Returns:
+        DataFrame: ключи задачи (TASK_KEY_COLUMNS, которые есть в данных) и
+        по колонке на версию (номер версии); NaN - задачи нет в версии.
+        None, если версий с колонкой value_col нет
+    """
+    with _lock:
+        _load()
+        if versions is None:
+            versions = list(_versions)
+        parts = []
+        for schema in dict.fromkeys(v.schema for v in versions):
+            pool = _pools[schema]
+            if value_col not in pool.frame().columns:
+                continue
+            codes, tasks = pool.task_codes()
+            values = np.nan_to_num(ensure_numeric(pool.frame()[value_col]).to_numpy(dtype='float64', na_value=np.nan))
+            part = tasks.copy()
+            for version in versions:
+                if version.schema != schema:
+                    continue
+                version_codes = codes[version.positions]
+                sums = np.bincount(version_codes, weights=values[version.positions], minlength=len(tasks))
+                present = np.bincount(version_codes, minlength=len(tasks)) > 0
+                part[version.id] = np.where(present, sums, np.nan)
+            parts.append(part)
+
+    if not parts:
+        return None
+    if len(parts) == 1:
+        result = parts[0]
+    else:
+        # Версии разных схем сводятся по общим ключам задачи
+        keys = [col for col in TASK_KEY_COLUMNS if all(col in part.columns for part in parts)]
+        parts = [part.drop(columns=[col for col in TASK_KEY_COLUMNS if col in part.columns and col not in keys])
+                 for part in parts]
+        result = pd.concat(parts, ignore_index=True).groupby(keys, sort=False, dropna=False).sum(min_count=1)
+        version_cols = [v.id for v in versions if v.id in result.columns]
+        result = result[version_cols].reset_index()
+    keys = [col for col in result.columns if col in TASK_KEY_COLUMNS]
+    return result.sort_values(keys, kind='stable', ignore_index=True)
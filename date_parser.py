@@ -0,0 +1,111 @@
+"""
+Модуль разбора дат из выгрузок
+
+Даты в выгрузках почти всегда в одном формате (ДД.ММ.ГГГГ), поэтому формат
+колонки определяется по выборке значений, а колонка разбирается с явным
+форматом. Каждое уникальное значение разбирается один раз; значения, не
+подошедшие под формат, разбираются по отдельности с автоопределением
+(dayfirst, format='mixed'), как раньше разбиралась вся колонка.
+
+Признак разобранной колонки - тип datetime64: ensure_datetime возвращает
+такие колонки без повторного разбора.
+"""
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+# Форматы, встречающиеся в выгрузках; при равном числе совпадений выбирается первый
+DATE_FORMATS = [
+    '%d.%m.%Y',
+    '%d.%m.%Y %H:%M:%S',
+    '%d.%m.%Y %H:%M',
+    '%d.%m.%y',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y',
+]
+
+# Сколько уникальных значений проверяется при определении формата
+SAMPLE_SIZE = 200
+
+
+def detect_date_format(values, sample_size=SAMPLE_SIZE):
+    """
+    Преобладающий формат дат в выборке значений
+
+    Args:
+        values: Строковые значения (Index или Series)
+
+    Returns:
+        Формат из DATE_FORMATS или None, если ни один формат не подошел
+    """
+    sample = pd.Series(values[:sample_size], dtype=object)
+    sample = sample[sample != '']
+    if sample.empty:
+        return None
+
+    best_format, best_matches = None, 0
+    for date_format in DATE_FORMATS:
+        matches = pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+        if matches > best_matches:
+            best_format, best_matches = date_format, matches
+            if matches == len(sample):
+                break
+    return best_format
+
+
+def parse_dates(values, date_format=None):
+    """
+    Разбирает колонку дат
+
+    Args:
+        values: Series со строками, датами или числами
+        date_format: Формат дат (None - определить по выборке)
+
+    Returns:
+        Series datetime64 (неразобранные значения - NaT)
+    """
+    if is_datetime64_any_dtype(values):
+        return values
+    if is_numeric_dtype(values) and not is_bool_dtype(values):
+        return pd.to_datetime(values, errors='coerce', dayfirst=True)
+
+    # Each unique value is parsed once; -1 codes (missing values) map to the trailing NaT
+    codes, uniques = pd.factorize(values)
+    texts = pd.Index(uniques, dtype=object).astype(str).str.strip()
+    if date_format is None:
+        date_format = detect_date_format(texts)
+
+    if date_format is not None:
+        unique_dates = pd.Series(pd.to_datetime(texts, format=date_format, errors='coerce'))
+    else:
+        unique_dates = pd.Series(pd.NaT, index=range(len(texts)), dtype='datetime64[ns]')
+
+    outliers = (unique_dates.isna() & (texts != '')).to_numpy()
+    if outliers.any():
+        # Date/datetime objects (mixed object columns from Excel) are converted as is, not via their text
+        raw = [value.strip() if isinstance(value, str) else value for value in uniques[outliers]]
+        fallback = pd.to_datetime(pd.Series(raw, dtype=object), errors='coerce', dayfirst=True, format='mixed')
+        unique_dates[outliers] = fallback.to_numpy()
+
+    unique_dates = pd.concat([unique_dates, pd.Series([pd.NaT], dtype=unique_dates.dtype)], ignore_index=True)
+    return pd.Series(unique_dates.to_numpy().take(codes), index=values.index, name=values.name)
+
+
+def ensure_datetime(values):
+    """Колонка дат как datetime64: уже разобранные колонки возвращаются без изменений"""
+    if is_datetime64_any_dtype(values):
+        return values
+    return parse_dates(values)
+
+
+def parse_date_columns(df, columns):
+    """
+    Разбирает колонки дат DataFrame на месте (отсутствующие колонки пропускаются)
+
+    Returns:
+        df
+    """
+    for col in columns:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    return df
@@ -0,0 +1,157 @@
+"""
+Компактная сериализация графиков Plotly
+
+st.plotly_chart отправляет в браузер JSON фигуры (plotly.io.to_json).
+Plotly кодирует массивы numpy как типизированные массивы base64
+({'dtype', 'bdata'}, их понимает Plotly.js), но только если тип массива
+есть в Plotly.js: целые int64 вне диапазона int32 (суммы бюджета в рублях)
+и списки чисел уходят десятичным текстом. Кроме того, каждый график несет
+полный шаблон оформления (template) со стилями всех типов графиков.
+
+Без потери точности и без изменения вида графиков:
+- compact_figure перед отправкой приводит числовые массивы трасс к самому
+  узкому типу, который Plotly.js читает как base64: целые значения -
+  int8/int16/int32, большие целые и дробные - float32, если значения
+  представимы точно, иначе float64;
+- use_compact_template оставляет в шаблоне по умолчанию стили только тех
+  типов графиков и подграфиков (polar, scene, ...), которые строит
+  приложение, - шаблон не повторяется в каждом графике целиком.
+Текстовые массивы (подписи, категории осей) не меняются.
+raw_payload_size - размер графика без этих мер, для сравнения.
+"""
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.basedatatypes import BasePlotlyType
+from _plotly_utils.basevalidators import DataArrayValidator
+from plotly.validator_cache import ValidatorCache
+
+# Целые типы, которые Plotly.js читает как base64, от узкого к широкому
+INT_TYPES = (np.int8, np.int16, np.int32)
+
+# Наибольшее целое, которое float64 хранит точно
+FLOAT64_EXACT_INT = 2 ** 53
+
+# Раздел шаблона layout -> типы трасс, которые его используют
+SUBPLOT_TEMPLATE_KEYS = {
+    'polar': ('scatterpolar', 'scatterpolargl', 'barpolar'),
+    'ternary': ('scatterternary',),
+    'scene': ('scatter3d', 'surface', 'mesh3d', 'cone', 'streamtube', 'isosurface', 'volume'),
+    'geo': ('scattergeo', 'choropleth'),
+}
+
+_base_templates = {}  # JSON урезанного шаблона -> имя полного шаблона в plotly.io.templates
+
+
+def _compact_array(values, is_data_array):
+    """
+    Самый узкий числовой массив с теми же значениями или None, если
+    массив нечисловой (или уже компактный). Списки приводятся к массивам
+    только для свойств-массивов данных (x, y, customdata, ...): остальные
+    списки (domain.x, range) Plotly.js в base64 не принимает
+    """
+    if isinstance(values, (list, tuple)):
+        numbers = all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values)
+        if not (is_data_array and values and numbers):
+            return None
+        values = np.asarray(values)
+    if not isinstance(values, np.ndarray) or values.size == 0 or values.dtype.kind not in 'iuf':
+        return None
+
+    if values.dtype.kind == 'f':
+        finite = values[np.isfinite(values)]
+        integral = finite.size == values.size and bool(np.all(finite == np.trunc(finite)))
+    else:
+        finite, integral = values, True
+    if integral:
+        low, high = finite.min(), finite.max()
+        for int_type in INT_TYPES:
+            info = np.iinfo(int_type)
+            if info.min <= low and high <= info.max:
+                return None if values.dtype == int_type else values.astype(int_type)
+        if values.dtype.kind != 'f' and max(abs(int(low)), abs(int(high))) > FLOAT64_EXACT_INT:
+            return None
+
+    narrow = values.astype(np.float32)
+    with np.errstate(invalid='ignore', over='ignore'):
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=values.dtype.kind == 'f'):
+            return None if values.dtype == np.float32 else narrow
+    return None if values.dtype == np.float64 else values.astype(np.float64)
+
+
+def _compact_props(obj, path=()):
+    """Пути и компактные массивы числовых свойств трассы (с вложенными, например marker.color)"""
+    # to_plotly_json - только для списка заданных свойств: массивы numpy в нем уже в base64
+    for key in obj.to_plotly_json():
+        value = obj[key]
+        if isinstance(value, BasePlotlyType):
+            yield from _compact_props(value, path + (key,))
+            continue
+        is_data_array = isinstance(ValidatorCache.get_validator(obj._path_str, key), DataArrayValidator)
+        compact = _compact_array(value, is_data_array)
+        if compact is not None:
+            yield path + (key,), compact
+
+
+def compact_template(template, trace_types):
+    """
+    Копия шаблона только со стилями trace_types и подграфиков, которые
+    они используют (polar, scene, ...)
+    """
+    spec = template.to_plotly_json()
+    data = {trace_type: styles for trace_type, styles in spec.get('data', {}).items() if trace_type in trace_types}
+    layout = {name: value for name, value in spec.get('layout', {}).items()
+              if set(SUBPLOT_TEMPLATE_KEYS.get(name, trace_types)) & set(trace_types)}
+    return go.layout.Template(data=data, layout=layout)
+
+
+def use_compact_template(trace_types):
+    """
+    Делает шаблоном по умолчанию урезанную до trace_types копию текущего
+    шаблона по умолчанию
+
+    Шаблон копируется в каждую фигуру при ее создании, поэтому урезать его
+    один раз дешевле, чем в каждой фигуре перед отправкой. Графики с
+    другими типами трасс строятся без стилей шаблона для этих типов.
+    """
+    base = pio.templates.default
+    if base in _base_templates.values():
+        return
+    name = f'{base}_compact'
+    pio.templates[name] = compact_template(pio.templates[base], trace_types)
+    _base_templates[_template_key(pio.templates[name].to_plotly_json())] = base
+    pio.templates.default = name
+
+
+def _template_key(spec):
+    return json.dumps(spec, sort_keys=True)
+
+
+def raw_payload_size(fig):
+    """
+    Размер JSON фигуры без compact_figure и с полным шаблоном (до
+    use_compact_template), в байтах
+    """
+    spec = fig.to_plotly_json()
+    template = spec['layout'].get('template')
+    base = _base_templates.get(_template_key(template)) if template else None
+    if base is not None:
+        spec['layout']['template'] = pio.templates[base].to_plotly_json()
+    return len(pio.to_json(spec, validate=False))
+
+
+def compact_figure(fig):
+    """
+    Уменьшает JSON фигуры без изменения графика (фигура изменяется на месте)
+
+    Returns:
+        fig
+    """
+    for trace in fig.data:
+        for path, values in list(_compact_props(trace)):
+            # Plotly не меняет свойство, если новые значения равны старым (тип не учитывается)
+            trace[path] = None
+            trace[path] = values
+    return fig
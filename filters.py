@@ -0,0 +1,162 @@
+"""
+Модуль фильтров по умолчанию для ролей и отчетов
+
+Чтение идет через config_cache (словарь в памяти), запись - в таблицу
+default_filters с последующим сбросом кэша.
+"""
+import json
+import sqlite3
+from typing import List, Optional
+
+import config_cache
+from auth import DB_PATH
+
+# Отчеты, для которых настраиваются фильтры (названия панелей приложения)
+AVAILABLE_REPORTS = [
+    "Динамика отклонений по месяцам",
+    "Динамика отклонений",
+    "Отклонение текущего срока от базового плана",
+    "Значения отклонений от базового плана",
+    "Изменения между версиями",
+    "Динамика причин отклонений",
+    "БДДС по месяцам",
+    "БДДС по лотам",
+    "Бюджет план/факт",
+    "Утвержденный бюджет",
+    "Прогнозный бюджет",
+    "Выдача рабочей/проектной документации",
+    "Аналитика по технике",
+    "График движения рабочей силы",
+    "СКУД стройка"
+]
+
+# Типы значений фильтров
+FILTER_TYPES = {
+    'string': 'Строка',
+    'select': 'Выбор из списка',
+    'multiselect': 'Множественный выбор',
+    'number': 'Число',
+    'date': 'Дата',
+    'boolean': 'Да/Нет'
+}
+
+
+def parse_filter_value(value: Optional[str], filter_type: str):
+    """Приводит сохраненное строковое значение к типу фильтра"""
+    if value is None or value == '':
+        return None
+    if filter_type in ('select', 'multiselect'):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return [value] if filter_type == 'multiselect' else value
+        if filter_type == 'multiselect' and not isinstance(parsed, list):
+            return [parsed]
+        return parsed
+    if filter_type == 'number':
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    if filter_type == 'boolean':
+        return str(value).strip().lower() in ('1', 'true', 'да', 'yes')
+    return value
+
+
+def get_default_filters(role: str, report_name: str) -> dict:
+    """Фильтры по умолчанию роли для отчета: {ключ: значение нужного типа}"""
+    return {
+        key: parse_filter_value(item['value'], item['type'])
+        for key, item in config_cache.get_filters(role, report_name).items()
+    }
+
+
+def set_default_filter(role: str, report_name: str, filter_key: str, filter_value: Optional[str],
+                       filter_type: str = 'string', updated_by: Optional[str] = None) -> bool:
+    """Сохраняет фильтр по умолчанию (заменяет существующий с тем же ключом)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO default_filters (role, report_name, filter_key, filter_value, filter_type, updated_by)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(role, report_name, filter_key) DO UPDATE SET
+                filter_value = excluded.filter_value,
+                filter_type = excluded.filter_type,
+                updated_at = CURRENT_TIMESTAMP,
+                updated_by = excluded.updated_by
+        ''', (role, report_name, filter_key.strip(), filter_value, filter_type, updated_by))
+        conn.commit()
+        conn.close()
+    except sqlite3.Error:
+        return False
+    config_cache.bump_version()
+    return True
+
+
+def delete_default_filter(role: str, report_name: str, filter_key: str) -> bool:
+    """Удаляет фильтр по умолчанию"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM default_filters
+        WHERE role = ? AND report_name = ? AND filter_key = ?
+    ''', (role, report_name, filter_key))
+    deleted = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    if deleted:
+        config_cache.bump_version()
+    return deleted
+
+
+def get_all_default_filters(role: Optional[str] = None, report_name: Optional[str] = None) -> List[dict]:
+    """Список фильтров (словари role, report_name, filter_key, filter_value, filter_type, updated_at, updated_by)"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    conditions = []
+    params = []
+    if role:
+        conditions.append('role = ?')
+        params.append(role)
+    if report_name:
+        conditions.append('report_name = ?')
+        params.append(report_name)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    cursor.execute(f'''
+        SELECT role, report_name, filter_key, filter_value, filter_type, updated_at, updated_by
+        FROM default_filters
+        {where}
+        ORDER BY role, report_name, filter_key
+    ''', params)
+    columns = ['role', 'report_name', 'filter_key', 'filter_value', 'filter_type', 'updated_at', 'updated_by']
+    filters = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    conn.close()
+    return filters
+
+
+def copy_filters_to_role(source_role: str, target_role: str, report_name: Optional[str] = None,
+                         updated_by: Optional[str] = None) -> bool:
+    """Копирует фильтры роли в другую роль (для одного отчета или для всех)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        condition = 'AND report_name = ?' if report_name else ''
+        params = [target_role, updated_by, source_role] + ([report_name] if report_name else [])
+        cursor.execute(f'''
+            INSERT INTO default_filters (role, report_name, filter_key, filter_value, filter_type, updated_by)
+            SELECT ?, report_name, filter_key, filter_value, filter_type, ?
+            FROM default_filters
+            WHERE role = ? {condition}
+            ON CONFLICT(role, report_name, filter_key) DO UPDATE SET
+                filter_value = excluded.filter_value,
+                filter_type = excluded.filter_type,
+                updated_at = CURRENT_TIMESTAMP,
+                updated_by = excluded.updated_by
+        ''', params)
+        conn.commit()
+        conn.close()
+    except sqlite3.Error:
+        return False
+    config_cache.bump_version()
+    return True
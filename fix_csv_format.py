@@ -1,75 +1,190 @@
-#!/usr/bin/env python3
-"""Fix CSV formatting to properly quote fields with commas and special characters"""
-
-import pandas as pd
-import csv
-from pathlib import Path
-
-def fix_csv_formatting(input_file, output_file):
-    """Read CSV and save with proper formatting"""
-    # Read the CSV file
-    encodings = ['utf-8-sig', 'windows-1251', 'utf-8', 'cp1251']
-    df = None
-    
-    for encoding in encodings:
-        try:
-            df = pd.read_csv(input_file, sep=';', encoding=encoding)
-            print(f"Read file with encoding: {encoding}")
-            break
-        except Exception as e:
-            continue
-    
-    if df is None:
-        print("Error: Could not read file")
-        return
-    
-    print(f"Loaded {len(df)} rows, {len(df.columns)} columns")
-    
-    # Save with proper CSV formatting
-    # Quote fields that contain commas to avoid parsing issues when opened in Excel or other tools
-    # that might auto-detect comma as delimiter
-    def should_quote_field(val):
-        if pd.isna(val):
-            return False
-        val_str = str(val)
-        return ',' in val_str or '"' in val_str or '\n' in val_str or '\r' in val_str
-    
-    # Custom quoting function
-    class CustomQuoting:
-        def __init__(self):
-            pass
-    
-    # Use QUOTE_NONNUMERIC to quote all non-numeric fields, or QUOTE_MINIMAL with custom logic
-    # Actually, let's use QUOTE_NONNUMERIC which will quote all text fields
-    df.to_csv(output_file, sep=';', index=False, encoding='utf-8-sig', 
-              quoting=csv.QUOTE_NONNUMERIC, quotechar='"', doublequote=True)
-    
-    print(f"Saved fixed CSV to: {output_file}")
-    
-    # Verify the file can be read back correctly
-    try:
-        df_check = pd.read_csv(output_file, sep=';', encoding='utf-8-sig')
-        print(f"Verification: Successfully read back {len(df_check)} rows")
-        
-        # Check for any lines with wrong field count
-        with open(output_file, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f, delimiter=';')
-            rows = list(reader)
-            header_count = len(rows[0])
-            problematic = [i+1 for i, row in enumerate(rows[1:], 1) if len(row) != header_count]
-            if problematic:
-                print(f"Warning: Lines with incorrect field count: {problematic}")
-            else:
-                print("All lines have correct field count")
-    except Exception as e:
-        print(f"Warning: Could not verify file: {e}")
-
-if __name__ == "__main__":
-    input_file = Path("sample_project_data_filled.csv")
-    output_file = Path("sample_project_data_fixed.csv")
-    
-    if not input_file.exists():
-        print(f"Error: Input file not found: {input_file}")
-    else:
-        fix_csv_formatting(input_file, output_file)
-
+#!/usr/bin/env python3
+"""
+Fix CSV formatting to properly quote fields with commas and special characters
+
+The file is processed in one streaming pass with constant memory: the
+encoding is detected while decoding (the pass restarts with the next
+encoding if decoding fails), the delimiter is taken from the header line,
+line endings inside fields are normalized to \\n, text fields are re-quoted
+and every row is written out as soon as it is read. Rows with a wrong field
+count are reported with their line numbers: short rows are padded, trailing
+empty fields are trimmed, other rows are written unchanged.
+
+validate_csv without an output is the pre-flight check used by the app
+before parsing an uploaded CSV.
+
+Usage:
+    python fix_csv_format.py [input.csv] [output.csv]
+"""
+
+import csv
+import io
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+# Encodings tried in order; utf-8-sig also reads UTF-8 without BOM
+ENCODINGS = ['utf-8-sig', 'windows-1251']
+
+OUTPUT_DELIMITER = ';'
+
+# Fields that look like numbers are written unquoted (as with QUOTE_NONNUMERIC)
+_NUMBER = re.compile(r'-?\d+(\.\d+)?')
+
+# Formatted values are memoized: exports repeat the same projects, dates and numbers
+FIELD_CACHE_SIZE = 65536
+
+
+class CsvReport:
+    """Result of a validation pass"""
+
+    def __init__(self):
+        self.encoding = None
+        self.delimiter = None
+        self.columns = 0
+        self.rows = 0
+        self.issues = []  # dicts: line, fields, action ('padded', 'trimmed', 'kept', 'error')
+
+    @property
+    def ok(self):
+        return self.encoding is not None and not self.issues
+
+    def malformed_lines(self):
+        """Line numbers of rows with a wrong field count or unreadable rows"""
+        return [issue['line'] for issue in self.issues]
+
+
+@lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _format_field(value):
+    value = value.replace('\r\n', '\n').replace('\r', '\n')
+    if value == '' or _NUMBER.fullmatch(value):
+        return value
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _detect_delimiter(line):
+    counts = {delimiter: line.count(delimiter) for delimiter in (';', ',', '\t')}
+    return max(counts, key=counts.get) if any(counts.values()) else OUTPUT_DELIMITER
+
+
+def _open_binary(source):
+    if isinstance(source, (str, Path)):
+        return open(source, 'rb'), True
+    return source, False
+
+
+def _process(binary, encoding, out, report):
+    """One pass with the given encoding; raises UnicodeDecodeError if it does not fit"""
+    binary.seek(0)
+    text = io.TextIOWrapper(binary, encoding=encoding, newline='')
+    try:
+        header_line = text.readline()
+        report.delimiter = _detect_delimiter(header_line)
+        reader = csv.reader(_chain(header_line, text), delimiter=report.delimiter, quotechar='"')
+
+        header = next(reader, [])
+        report.columns = len(header)
+        if out is not None:
+            out.write(OUTPUT_DELIMITER.join(map(_format_field, header)) + '\n')
+
+        while True:
+            start_line = reader.line_num + 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error:
+                report.issues.append({'line': start_line, 'fields': None, 'action': 'error'})
+                continue
+            if not row:
+                continue  # blank line
+
+            report.rows += 1
+            fields = len(row)
+            if fields != report.columns:
+                if fields < report.columns:
+                    row = row + [''] * (report.columns - len(row))
+                    action = 'padded'
+                elif not any(row[report.columns:]):
+                    action = 'trimmed'
+                    row = row[:report.columns]
+                else:
+                    action = 'kept'
+                report.issues.append({'line': start_line, 'fields': fields, 'action': action})
+            if out is not None:
+                out.write(OUTPUT_DELIMITER.join(map(_format_field, row)) + '\n')
+    finally:
+        # Leave the caller's binary file open
+        text.detach()
+
+
+def _chain(first_line, lines):
+    yield first_line
+    yield from lines
+
+
+def validate_csv(source, output=None, encodings=ENCODINGS):
+    """
+    Validate (and optionally rewrite) a CSV file in one streaming pass
+
+    Args:
+        source: Path or binary file object (rewound before reading)
+        output: Path or text file object for the normalized file (None - only validate)
+        encodings: Encodings to try in order
+
+    Returns:
+        CsvReport; report.encoding is None if no encoding could decode the file
+    """
+    binary, close_source = _open_binary(source)
+    out, close_output = output, False
+    if isinstance(output, (str, Path)):
+        out, close_output = open(output, 'w', encoding='utf-8-sig', newline=''), True
+    try:
+        for encoding in encodings:
+            report = CsvReport()
+            if out is not None:
+                out.seek(0)
+                out.truncate()
+            try:
+                _process(binary, encoding, out, report)
+            except UnicodeDecodeError:
+                continue
+            report.encoding = encoding
+            return report
+        return CsvReport()
+    finally:
+        if close_output:
+            out.close()
+        if close_source:
+            binary.close()
+        else:
+            binary.seek(0)
+
+
+def fix_csv_formatting(input_file, output_file):
+    """Rewrite the CSV with proper formatting and report malformed rows"""
+    report = validate_csv(input_file, output_file)
+    if report.encoding is None:
+        print("Error: Could not read file")
+        return report
+
+    print(f"Read file with encoding: {report.encoding}, delimiter: {report.delimiter!r}")
+    print(f"Processed {report.rows} rows, {report.columns} columns")
+    print(f"Saved fixed CSV to: {output_file}")
+    if report.issues:
+        for issue in report.issues:
+            print(f"Warning: line {issue['line']}: {issue['fields']} fields ({issue['action']})")
+    else:
+        print("All lines have correct field count")
+    return report
+
+
+if __name__ == "__main__":
+    input_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("sample_project_data_filled.csv")
+    output_file = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("sample_project_data_fixed.csv")
+
+    if not input_file.exists():
+        print(f"Error: Input file not found: {input_file}")
+    else:
+        fix_csv_formatting(input_file, output_file)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator of synthetic construction-portfolio data.
+
+Produces files in the same schemas as the samples shipped with the app:
+project files (Russian columns of sample_project_data_fixed.csv, including
+the RD columns) and resource/technique files (week-column schema of
+sample_resources_data.csv / sample_technique_data.csv). The same seed and
+row count always produce the same file, so benchmark runs are comparable
+across commits.
+
+Usage:
+    python generate_synthetic_data.py OUTPUT_DIR [--rows 1000 10000 ...]
+                                      [--kinds project resources technique]
+                                      [--seed 42]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+PROJECT_COLUMNS = [
+    '№', 'Проект', 'Аббревиатура', 'Блок', 'Раздел', 'Задача',
+    'Старт План', 'Конец План', 'Старт Факт', 'Конец Факт',
+    'Отклонение', 'Отклонений в днях', 'Причина отклонений',
+    'Бюджет План', 'Бюджет Факт', 'Резерв',
+    'РД по Договору', 'Отклонение разделов РД', 'Всего загружено', 'На согласовании',
+    'Выдана подрядчику', 'Выдано в производство работ', 'На доработке'
+]
+
+PROJECT_NAMES = ['Дмитровский', 'Есипово V', 'Завод', 'Ленинский']
+
+SECTIONS = [
+    'КОРОБКА, КРОВЛЯ, СТЕНЫ', 'Внутренние лестницы', 'ОКНА', 'ВИТРАЖИ',
+    'ПРОМЫШЛЕННЫЕ ПОЛЫ, ПОЛЫ АБК, ПЕРЕКРЫТИЯ, ПОКРЫТИЯ', 'ДВЕРИ, РАСПАШНЫЕ ВОРОТА',
+    'ВНУТРЕННИЕ СЕТИ: ВОДОСНАБЖЕНИЕ, ВОДОТВЕДЕНИЕ, ОТОПЛЕНИЕ, ВЕНТИЛЯЦИЯ',
+    'ВНУТРЕННИЕ СЕТИ: ЭЛЕТРОСНАБЖЕНИЕ', 'ВНУТРЕННИЕ СЕТИ: ПОЖАРНЫЕ', 'ОТДЕЛОЧНЫЕ РАБОТЫ',
+    'ИНЖЕНЕРНЫЕ СЕТИ: ЭЛЕКТРОСНАБЖЕНИЕ', 'ИНЖЕНЕРНЫЕ СЕТИ: ТЕПЛОСНАБЖЕНИЯ', 'ДЕКОР ФАСАДОВ'
+]
+
+TASKS = [
+    'Фундаменты сборные', 'Фундаменты монолитные', 'Цокольные панели', 'Железобетонные колонны',
+    'Металлические конструкции', 'Профилированный лист', 'Ограждающие конструкции', 'Кровля',
+    'Наружные витражи', 'ОСНОВАНИЕ ПОД ПОЛЫ', 'ВНЕПЛОЩАДОЧНЫЕ ИНЖЕНЕРНЫЕ СЕТИ', 'ОТДЕЛОЧНЫЕ РАБОТЫ',
+    'ДГУ', 'Разрешение на ввод в эксплуатацию'
+]
+
+REASONS = ['Недостаточно трудоресурсов', 'Не передан фронт работ', 'Нет оплаты подрядчику', 'Нет РД', 'Ошибки в РД']
+
+CONTRACTORS = [
+    'ООО Пакс Механизация', 'ООО Гринстрой', 'ООО СК Сети', 'ООО СТМ Оскол', 'ООО СтройСервис',
+    'ООО Альфа С (БЛОК U3 U4)', 'ООО Инвесткомстрой (БЛОК U1 U2)', 'ООО Стройдекор',
+    'ООО СвайСпецСтрой', 'ООО Апекс Контракшн', 'ООО Мегастрой', 'ООО Технофло'
+]
+
+SHORT_MONTHS = ['янв', 'фев', 'мар', 'апр', 'май', 'июн', 'июл', 'авг', 'сен', 'окт', 'ноя', 'дек']
+
+WEEK_COLUMNS = [f'{week} неделя' for week in range(1, 6)]
+
+# Files are written the way the samples are: project data as UTF-8 with BOM,
+# resources/technique exports as cp1251
+ENCODINGS = {'project': 'utf-8-sig', 'resources': 'cp1251', 'technique': 'cp1251'}
+
+BASE_DATE = np.datetime64('2024-01-01')
+
+
+def _project_names(n_rows):
+    """Portfolio grows with the file: 4 projects per 1000 rows (at least the sample four)"""
+    n_projects = max(len(PROJECT_NAMES), n_rows // 250)
+    extra = [f'Объект {i}' for i in range(1, n_projects - len(PROJECT_NAMES) + 1)]
+    return np.array(PROJECT_NAMES + extra)
+
+
+def _format_dates(days):
+    return pd.Series(BASE_DATE + days.astype('timedelta64[D]')).dt.strftime('%d.%m.%Y')
+
+
+def generate_project_data(n_rows, seed=42):
+    """
+    Project schedule/budget rows with the Russian column names of the sample file
+
+    Returns:
+        DataFrame with PROJECT_COLUMNS (dates as DD.MM.YYYY strings)
+    """
+    rng = np.random.default_rng(seed)
+    projects = _project_names(n_rows)
+    project_idx = rng.integers(0, len(projects), n_rows)
+    section_idx = rng.integers(0, len(SECTIONS), n_rows)
+
+    plan_start = rng.integers(0, 4 * 365, n_rows)
+    plan_duration = rng.integers(0, 540, n_rows)
+    plan_end = plan_start + plan_duration
+    deviation_days = np.where(rng.random(n_rows) < 0.35, rng.integers(-150, 200, n_rows), 0)
+    base_start = plan_start + np.where(deviation_days > 0, rng.integers(0, 60, n_rows), 0)
+    base_end = plan_end + deviation_days
+    has_deviation = deviation_days != 0
+
+    budget_plan = rng.integers(10, 500, n_rows) * 1000
+    budget_fact = (budget_plan * rng.uniform(0.85, 1.2, n_rows)).round(-3).astype(int)
+
+    rd_contract = rng.integers(1, 25, n_rows)
+    rd_loaded = np.minimum(rd_contract, rng.integers(0, 25, n_rows))
+    on_approval = rng.integers(0, 3, n_rows)
+    in_production = np.maximum(rd_loaded - on_approval, 0)
+    rework = np.where(rng.random(n_rows) < 0.3, rng.integers(1, 4, n_rows).astype(float), np.nan)
+
+    return pd.DataFrame({
+        '№': np.arange(2, n_rows + 2),
+        'Проект': projects[project_idx],
+        'Аббревиатура': np.array(['ККК', 'ВЛ', 'ВП', 'ПСВ', 'О', 'ППП'])[section_idx % 6],
+        'Блок': np.array([f'Блок {i}' for i in range(1, 5)])[rng.integers(0, 4, n_rows)],
+        'Раздел': np.array(SECTIONS)[section_idx],
+        'Задача': np.array(TASKS)[rng.integers(0, len(TASKS), n_rows)],
+        'Старт План': _format_dates(plan_start),
+        'Конец План': _format_dates(plan_end),
+        'Старт Факт': _format_dates(base_start),
+        'Конец Факт': _format_dates(base_end),
+        'Отклонение': has_deviation.astype(int),
+        'Отклонений в днях': deviation_days,
+        'Причина отклонений': np.array(REASONS)[rng.integers(0, len(REASONS), n_rows)],
+        'Бюджет План': budget_plan,
+        'Бюджет Факт': budget_fact,
+        'Резерв': budget_fact - budget_plan,
+        'РД по Договору': rd_contract,
+        'Отклонение разделов РД': rd_contract - rd_loaded,
+        'Всего загружено': rd_loaded,
+        'На согласовании': on_approval,
+        'Выдана подрядчику': np.nan,
+        'Выдано в производство работ': in_production,
+        'На доработке': rework,
+    }, columns=PROJECT_COLUMNS)
+
+
+def generate_contractor_data(n_rows, kind='resources', seed=42):
+    """
+    Resource (people) or technique (machines) rows in the week-column schema
+
+    Resources report 'Среднее за неделю', technique reports 'Среднее за месяц'.
+    """
+    rng = np.random.default_rng(seed)
+    projects = _project_names(n_rows)
+    plan = rng.integers(1, 60, n_rows)
+    weeks = np.clip(plan[:, None] + rng.integers(-20, 10, (n_rows, len(WEEK_COLUMNS))), 0, None)
+    weeks[:, -1] = np.where(rng.random(n_rows) < 0.6, 0, weeks[:, -1])
+    if kind == 'resources':
+        average_col = 'Среднее за неделю'
+        average = weeks[:, :4].mean(axis=1).round().astype(int)
+    else:
+        average_col = 'Среднее за месяц'
+        average = weeks.sum(axis=1) // 4
+    delta = average - plan
+    delta_pct = np.round(delta / plan * 100).astype(int)
+
+    months = rng.integers(0, 24, n_rows)
+    periods = [f'{SHORT_MONTHS[m % 12]}.{24 + m // 12}' for m in range(24)]
+
+    data = {
+        'Проект': projects[rng.integers(0, len(projects), n_rows)],
+        'Контрагент': np.array(CONTRACTORS)[rng.integers(0, len(CONTRACTORS), n_rows)],
+        'Период': np.array(periods)[months],
+        'План': plan,
+        average_col: average,
+    }
+    for i, week_col in enumerate(WEEK_COLUMNS):
+        data[week_col] = weeks[:, i]
+    data['Дельта'] = delta
+    data['Дельта (%)'] = [f'{value}%' for value in delta_pct]
+    return pd.DataFrame(data)
+
+
+def generate(kind, n_rows, seed=42):
+    """Generate a frame of the given kind ('project', 'resources' or 'technique')"""
+    if kind == 'project':
+        return generate_project_data(n_rows, seed)
+    return generate_contractor_data(n_rows, kind, seed)
+
+
+def dataset_file_name(kind, n_rows, seed=42):
+    """File name that data_loader.detect_data_type recognizes for the kind"""
+    names = {'project': 'synthetic_project', 'resources': 'synthetic_resources', 'technique': 'synthetic_technique'}
+    return f'{names[kind]}_{n_rows}_seed{seed}.csv'
+
+
+def write_dataset(kind, n_rows, output_dir, seed=42):
+    """Generate and write one CSV file, reusing an existing file with the same name"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, dataset_file_name(kind, n_rows, seed))
+    if not os.path.exists(path):
+        generate(kind, n_rows, seed).to_csv(path, sep=';', index=False, encoding=ENCODINGS[kind])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic construction-portfolio data files')
+    parser.add_argument('output_dir', help='Directory to write CSV files to')
+    parser.add_argument('--rows', nargs='+', type=int, default=[1000, 10000, 100000, 1000000],
+                        help='Row counts to generate')
+    parser.add_argument('--kinds', nargs='+', default=list(ENCODINGS), choices=list(ENCODINGS),
+                        help='Data kinds to generate')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        for kind in args.kinds:
+            print(write_dataset(kind, n_rows, args.output_dir, args.seed))
+
+
+if __name__ == "__main__":
+    main()
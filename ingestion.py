@@ -0,0 +1,270 @@
+"""
+Модуль автоматической загрузки данных из каталогов, заданных в настройках
+
+Фоновый поток следит за путями из настроек (finance_files_path,
+plan_fact_files_path, resources_files_path) и перечитывает только новые и
+измененные файлы: изменение определяется по mtime и размеру и
+подтверждается хешем содержимого (файл, который только "потрогали", не
+разбирается заново). Результат публикуется как новая версия набора данных
+(DatasetVersion) заменой одной ссылки, поэтому все сессии видят либо
+предыдущую, либо новую версию целиком. Каждый разобранный файл данных
+проектов также сохраняется в историю версий (dataset_store).
+
+Если установлен watchdog, изменения в каталогах будят поток сразу, иначе
+каталоги опрашиваются раз в POLL_INTERVAL секунд.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+
+import dataset_store
+from data_loader import SUPPORTED_EXTENSIONS, concat_data, read_data_file
+from settings import SETTING_KEYS, get_setting
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# Интервал опроса каталогов, секунды
+POLL_INTERVAL = 30.0
+
+# Пауза после события файловой системы, чтобы файл успел записаться, секунды
+SETTLE_SECONDS = 2.0
+
+DATA_TYPES = ('project', 'resources', 'technique')
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DatasetVersion:
+    """Опубликованный снимок данных из каталогов (не изменяется после публикации)"""
+
+    def __init__(self, version, frames, files):
+        self.version = version
+        self.created = datetime.now()
+        self.frames = frames  # {'project': DataFrame|None, 'resources': ..., 'technique': ...}
+        self.files = files    # {путь: {'source', 'type', 'rows', 'size', 'mtime', 'sha256'}}
+
+
+_scan_lock = threading.Lock()
+_files = {}  # путь -> {'source', 'mtime', 'size', 'sha256', 'frame'}
+_current = None
+_version_counter = 0
+_last_scan = None
+_listeners = []
+_wake = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+_observer = None
+_observed_dirs = ()
+
+
+def configured_paths():
+    """Непустые пути из настроек: {ключ настройки: путь}"""
+    paths = {}
+    for key in SETTING_KEYS:
+        value = (get_setting(key) or '').strip()
+        if value:
+            paths[key] = value
+    return paths
+
+
+def _list_files(path):
+    if os.path.isfile(path):
+        return [path] if path.lower().endswith(SUPPORTED_EXTENSIONS) else []
+    if not os.path.isdir(path):
+        return []
+    files = []
+    for entry in sorted(os.listdir(path)):
+        file_path = os.path.join(path, entry)
+        if os.path.isfile(file_path) and entry.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append(file_path)
+    return files
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _publish(files):
+    global _current, _version_counter
+    frames = {}
+    for data_type in DATA_TYPES:
+        parts = [entry['frame'] for path, entry in sorted(files.items())
+                 if entry['frame'].attrs.get('data_type', 'project') == data_type]
+        if not parts:
+            frames[data_type] = None
+        elif len(parts) == 1:
+            frames[data_type] = parts[0]
+        else:
+            # Concatenate if multiple files of the same type
+            frames[data_type] = concat_data(parts)
+
+    _version_counter += 1
+    version = DatasetVersion(_version_counter, frames, {
+        path: {
+            'source': entry['source'],
+            'type': entry['frame'].attrs.get('data_type', 'project'),
+            'rows': len(entry['frame']),
+            'size': entry['size'],
+            'mtime': entry['mtime'],
+            'sha256': entry['sha256'],
+        }
+        for path, entry in sorted(files.items())
+    })
+    _current = version
+
+    for callback in list(_listeners):
+        try:
+            callback(version)
+        except Exception:
+            pass  # Подписчик не должен прерывать загрузку
+    return version
+
+
+def scan():
+    """
+    Один проход по настроенным путям: разбирает новые и измененные файлы и
+    при изменениях публикует новую версию
+
+    Returns:
+        Словарь: time, version (номер текущей версии или None), published
+        (опубликована ли новая версия), parsed и removed (списки путей),
+        errors (список (путь, текст ошибки)), files (количество файлов)
+    """
+    global _files, _last_scan
+    with _scan_lock:
+        seen = {}
+        parsed = []
+        errors = []
+        for source, root in configured_paths().items():
+            for path in _list_files(root):
+                if path in seen:
+                    continue
+                try:
+                    stat = os.stat(path)
+                    entry = _files.get(path)
+                    if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                        seen[path] = entry
+                        continue
+                    digest = _file_hash(path)
+                    if entry and entry['sha256'] == digest:
+                        seen[path] = dict(entry, mtime=stat.st_mtime_ns, size=stat.st_size)
+                        continue
+                    frame = read_data_file(path)
+                except Exception as e:
+                    errors.append((path, str(e)))
+                    if path in _files:
+                        # Keep the last successfully parsed content
+                        seen[path] = _files[path]
+                    continue
+                seen[path] = {
+                    'source': source,
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'sha256': digest,
+                    'frame': frame,
+                }
+                parsed.append(path)
+                if frame.attrs.get('data_type', 'project') == 'project':
+                    try:
+                        dataset_store.add_version(frame, path)
+                    except Exception as e:
+                        errors.append((path, f"История версий: {e}"))
+
+        removed = sorted(set(_files) - set(seen))
+        published = bool(parsed or removed)
+        _files = seen
+        if published:
+            _publish(seen)
+
+        _last_scan = {
+            'time': datetime.now(),
+            'version': _current.version if _current is not None else None,
+            'published': published,
+            'parsed': parsed,
+            'removed': removed,
+            'errors': errors,
+            'files': len(seen),
+        }
+        return _last_scan
+
+
+def current_version():
+    """Последняя опубликованная версия данных (None, если данных нет)"""
+    return _current
+
+
+def last_scan():
+    """Результат последнего прохода scan (None, если проходов не было)"""
+    return _last_scan
+
+
+def subscribe(callback):
+    """Регистрирует callback(version), вызываемый после публикации каждой версии"""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def on_any_event(self, event):
+        if str(event.src_path).lower().endswith(SUPPORTED_EXTENSIONS):
+            _wake.set()
+
+
+def _watch(paths):
+    global _observer, _observed_dirs
+    if Observer is None:
+        return
+    dirs = tuple(sorted({path if os.path.isdir(path) else os.path.dirname(path)
+                         for path in paths if os.path.exists(path)}))
+    if dirs == _observed_dirs:
+        return
+    if _observer is not None:
+        _observer.stop()
+        _observer = None
+    _observed_dirs = dirs
+    if dirs:
+        _observer = Observer()
+        handler = _ChangeHandler()
+        for directory in dirs:
+            _observer.schedule(handler, directory, recursive=False)
+        _observer.daemon = True
+        _observer.start()
+
+
+def _run(poll_interval):
+    while True:
+        try:
+            scan()
+            _watch(configured_paths().values())
+        except Exception:
+            pass  # Следующий проход повторит попытку
+        if _wake.wait(poll_interval):
+            time.sleep(SETTLE_SECONDS)
+            _wake.clear()
+
+
+def start(poll_interval=POLL_INTERVAL):
+    """Запускает фоновый поток загрузки (повторные вызовы ничего не делают)"""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, args=(poll_interval,), name='data-ingestion', daemon=True)
+            _thread.start()
+
+
+def request_scan():
+    """Просит фоновый поток проверить каталоги, не дожидаясь опроса"""
+    _wake.set()
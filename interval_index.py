@@ -0,0 +1,164 @@
+"""
+Интервальный индекс дат задач
+
+Интервалы [начало, конец] (plan start - plan end, base start - base end)
+хранятся как два отсортированных массива: начала и концы в днях. Задача
+активна в окне [a, b], если начало <= b и конец >= a. Начало не позже
+конца, поэтому задачи, закончившиеся до a, уже учтены среди начавшихся не
+позже b, и
+
+    число активных = (начал <= b) - (концов < a)
+
+- два бинарных поиска. Суммы весов (например, бюджета) считаются так же
+по префиксным суммам весов в порядке начал и концов. Список активных
+задач выбирается из задач, начавшихся не позже b.
+
+Интервалы можно разбить на группы (задачи одного проекта, раздела и т.п.):
+ключ сортировки - (группа, день), и запрос выполняется внутри группы.
+
+Индекс по колонкам набора данных строится один раз на объект DataFrame
+(task_intervals) и используется всеми панелями.
+"""
+import numpy as np
+
+import backends
+from date_parser import ensure_datetime
+
+_NAT = np.datetime64('NaT', 'D').view('int64')
+
+
+def _days(values):
+    """Даты -> номера дней (int64); пустые даты - _NAT"""
+    return np.asarray(values, dtype='datetime64[D]').view('int64')
+
+
+class IntervalIndex:
+    """Отсортированные начала и концы интервалов с префиксными суммами весов"""
+
+    def __init__(self, starts, ends=None, groups=None, weights=None):
+        """
+        Args:
+            starts: Даты начала (datetime64)
+            ends: Даты окончания (None - интервал из одного дня начала)
+            groups: Номера групп 0..k-1 (None - одна группа); строки с
+                отрицательным номером не индексируются
+            weights: Веса для sum: массив n или n x k (несколько весов на
+                интервал); None - только count, active и starting
+
+        Строки без дат и с началом позже окончания не индексируются.
+        """
+        start_days = _days(starts)
+        end_days = start_days if ends is None else _days(ends)
+        codes = np.zeros(len(start_days), dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+        valid = (start_days != _NAT) & (end_days != _NAT) & (start_days <= end_days) & (codes >= 0)
+
+        self.rows = np.flatnonzero(valid)
+        start_days, end_days, codes = start_days[valid], end_days[valid], codes[valid]
+        self.origin = int(start_days.min()) if len(start_days) else 0
+        # Ключ (группа, день): дни группы занимают [группа * span, группа * span + span - 2]
+        self.span = int(end_days.max()) - self.origin + 2 if len(end_days) else 2
+
+        start_keys = codes * self.span + (start_days - self.origin)
+        end_keys = codes * self.span + (end_days - self.origin)
+        self._start_order = np.argsort(start_keys, kind='stable')
+        self._end_order = np.argsort(end_keys, kind='stable')
+        self._start_keys = start_keys[self._start_order]
+        self._end_keys = end_keys[self._end_order]
+        self._end_days = end_days
+
+        self._start_sums = self._end_sums = None
+        if weights is not None:
+            values = np.asarray(weights)[valid]
+            if values.dtype.kind not in 'iu':
+                values = np.nan_to_num(values.astype('float64'))
+            # Целые веса суммируются без округления
+            self._start_sums = self._prefix_sums(values[self._start_order])
+            self._end_sums = self._prefix_sums(values[self._end_order])
+
+    @staticmethod
+    def _prefix_sums(values):
+        sums = np.cumsum(values, axis=0)
+        return np.concatenate([np.zeros((1,) + sums.shape[1:], dtype=sums.dtype), sums])
+
+    def _keys(self, window_start, window_end, groups):
+        """Границы поиска: начало группы, (группа, a) и (группа, b)"""
+        a = _days(window_start) - self.origin
+        b = _days(window_end) - self.origin
+        base = (np.zeros_like(a) if groups is None else np.asarray(groups, dtype=np.int64)) * self.span
+        return base, base + np.clip(a, 0, self.span - 1), base + np.clip(b, -1, self.span - 2)
+
+    def _active_bounds(self, window_start, window_end, groups):
+        base, a_key, b_key = self._keys(window_start, window_end, groups)
+        started = (np.searchsorted(self._start_keys, base, 'left'),
+                   np.searchsorted(self._start_keys, b_key, 'right'))
+        ended = (np.searchsorted(self._end_keys, base, 'left'),
+                 np.searchsorted(self._end_keys, a_key, 'left'))
+        return started, ended
+
+    def count(self, window_start, window_end, groups=None):
+        """Число интервалов, пересекающих окна [window_start, window_end] (массивы или скаляры)"""
+        (s_lo, s_hi), (e_lo, e_hi) = self._active_bounds(window_start, window_end, groups)
+        return (s_hi - s_lo) - (e_hi - e_lo)
+
+    def sum(self, window_start, window_end, groups=None):
+        """Сумма весов интервалов, пересекающих окна (для весов n x k - по каждому весу)"""
+        if self._start_sums is None:
+            raise ValueError("Индекс построен без весов")
+        (s_lo, s_hi), (e_lo, e_hi) = self._active_bounds(window_start, window_end, groups)
+        return (self._start_sums[s_hi] - self._start_sums[s_lo]) - (self._end_sums[e_hi] - self._end_sums[e_lo])
+
+    def active(self, window_start, window_end, group=0):
+        """Номера строк интервалов, пересекающих окно (по возрастанию)"""
+        base, a_key, b_key = self._keys(window_start, window_end, group)
+        lo = np.searchsorted(self._start_keys, base, 'left')
+        hi = np.searchsorted(self._start_keys, b_key, 'right')
+        candidates = self._start_order[lo:hi]
+        ends = self._end_days[candidates] - self.origin + base
+        return np.sort(self.rows[candidates[ends >= a_key]])
+
+    def starting(self, window_start, window_end, group=0):
+        """Номера строк интервалов, которые начинаются в окне (по возрастанию)"""
+        base, a_key, b_key = self._keys(window_start, window_end, group)
+        lo = np.searchsorted(self._start_keys, a_key, 'left')
+        hi = np.searchsorted(self._start_keys, b_key, 'right')
+        return np.sort(self.rows[self._start_order[lo:hi]])
+
+
+class TaskIntervals(IntervalIndex):
+    """Интервальный индекс по колонкам дат набора данных"""
+
+    def __init__(self, df, start_col, end_col=None):
+        self.start_dates = ensure_datetime(df[start_col])
+        self.end_dates = ensure_datetime(df[end_col]) if end_col is not None else None
+        super().__init__(self.start_dates, self.end_dates)
+
+
+_caches = {}  # (колонка начала, колонка окончания) -> backends.SnapshotCache
+
+
+def task_intervals(df, start_col='plan start', end_col='plan end'):
+    """
+    Индекс интервалов [start_col, end_col] набора данных
+
+    Строится один раз на объект DataFrame (версию данных); end_col=None -
+    индекс по одной дате. Номера строк индекса - позиции строк df.
+    """
+    key = (start_col, end_col)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches.setdefault(key, backends.SnapshotCache(lambda data: TaskIntervals(data, start_col, end_col)))
+    return cache.get(df)
+
+
+def month_windows(months):
+    """
+    Окна месяцев для запросов индекса
+
+    Args:
+        months: Массив месяцев datetime64[M]
+
+    Returns:
+        (первые дни месяцев, последние дни месяцев) - массивы datetime64[D]
+    """
+    months = np.asarray(months, dtype='datetime64[M]')
+    return months.astype('datetime64[D]'), (months + 1).astype('datetime64[D]') - 1
@@ -0,0 +1,115 @@
+"""
+Отменяемые задачи расчета панелей
+
+Долгие расчеты панелей (утвержденный бюджет по всему портфелю, крупные
+группировки, подготовка диаграммы Ганта) выполняются в пуле потоков как
+задачи с ключом, например (сессия, панель). Новая задача с тем же ключом
+отменяет предыдущую: когда пользователь быстро перебирает значения
+фильтра, считается только последний выбор.
+
+Отмена кооперативная: расчетные функции вызывают checkpoint(этап) между
+этапами и в длинных циклах. В отмененной задаче checkpoint выбрасывает
+JobCancelled, и поток освобождается для следующей задачи. Вне задачи
+checkpoint ничего не делает, поэтому те же функции работают в тестах,
+пакетной выгрузке и прогреве. Этап, переданный в checkpoint, - текст
+прогресса задачи (Job.stage) для отображения пользователю.
+
+Не зависит от Streamlit: ожидание задачи и статус на странице - в
+project_visualization_app.run_panel_job.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Потоков расчета на процесс (расчеты pandas в основном держат GIL)
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+_lock = threading.Lock()
+_jobs = {}  # ключ -> последняя задача ключа, пока она не завершилась
+_executor = None
+
+
+class JobCancelled(Exception):
+    """Задача отменена (новой задачей с тем же ключом или вызывающим кодом)"""
+
+
+class Job:
+    """Задача расчета: результат, отмена и текущий этап"""
+
+    def __init__(self, key):
+        self.key = key
+        self.stage = None
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Просит задачу остановиться на ближайшем checkpoint"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait(self, timeout=None):
+        """Ждет завершения не дольше timeout секунд; True, если задача завершена"""
+        wait([self.future], timeout)
+        return self.future.done()
+
+    def result(self):
+        """Результат функции задачи; исключение функции (или JobCancelled) пробрасывается"""
+        return self.future.result()
+
+
+def checkpoint(stage=None):
+    """
+    Точка отмены расчета: в отмененной задаче выбрасывает JobCancelled
+
+    Args:
+        stage: Название начинающегося этапа (текст прогресса задачи)
+    """
+    job = _current_job.get()
+    if job is None:
+        return
+    if job.cancelled:
+        raise JobCancelled(job.key)
+    if stage is not None:
+        job.stage = stage
+
+
+def _run(job, func, args, kwargs):
+    _current_job.set(job)
+    try:
+        checkpoint()
+        return func(*args, **kwargs)
+    finally:
+        with _lock:
+            if _jobs.get(job.key) is job:
+                del _jobs[job.key]
+
+
+def submit(key, func, *args, **kwargs):
+    """
+    Запускает func(*args, **kwargs) как задачу, отменяя незавершенную
+    задачу с тем же ключом
+
+    Задача выполняется в копии контекста вызывающего потока (например,
+    текущая панель perf.dashboard_run).
+
+    Returns:
+        Job
+    """
+    global _executor
+    job = Job(key)
+    context = contextvars.copy_context()
+    with _lock:
+        previous = _jobs.get(key)
+        if previous is not None:
+            previous.cancel()
+        _jobs[key] = job
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='dashboard-job')
+        executor = _executor
+    job.future = executor.submit(context.run, _run, job, func, args, kwargs)
+    return job
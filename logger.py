@@ -0,0 +1,255 @@
+"""
+Модуль логирования действий пользователей
+
+События (действия пользователей и время отрисовки панелей) не пишутся в
+SQLite в потоке запроса: log_action только кладет их в очередь в памяти,
+а фоновый поток записывает накопленные события пакетами, одной
+транзакцией на пакет. Так запрос не ждет блокировки файла users.db,
+которую делят все сессии.
+
+Чтение логов для административной панели - постраничное по ключу
+(created_at, id), по индексам (username, created_at) и (action, created_at).
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from auth import DB_PATH
+
+# Максимальное количество событий в одной транзакции
+BATCH_SIZE = 200
+
+# Как часто фоновый поток сбрасывает неполный пакет, секунды
+FLUSH_INTERVAL = 1.0
+
+# Ожидание блокировки базы при записи и чтении, секунды
+BUSY_TIMEOUT = 5.0
+
+# Сколько раз повторять запись пакета, если база заблокирована
+WRITE_RETRIES = 3
+
+# Действие, под которым записывается время отрисовки панели
+RENDER_ACTION = 'render'
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_dropped_events = 0
+
+_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS user_activity_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        action TEXT NOT NULL,
+        details TEXT,
+        ip_address TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (username) REFERENCES users(username)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_activity_logs_username_created ON user_activity_logs (username, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_activity_logs_action_created ON user_activity_logs (action, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_activity_logs_created ON user_activity_logs (created_at)',
+]
+
+
+def ensure_log_schema(cursor):
+    """Создает таблицу логов и ее индексы, если их нет"""
+    for statement in _SCHEMA:
+        cursor.execute(statement)
+
+
+def _connect():
+    return sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+
+
+def _timestamp():
+    # Формат и часовой пояс совпадают с DEFAULT CURRENT_TIMESTAMP в SQLite
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _write_batch(conn, batch):
+    global _dropped_events
+    for attempt in range(WRITE_RETRIES):
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO user_activity_logs (username, action, details, ip_address, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', batch)
+            return
+        except sqlite3.OperationalError:
+            time.sleep(BUSY_TIMEOUT * (attempt + 1) / WRITE_RETRIES)
+    _dropped_events += len(batch)
+
+
+def _writer_loop():
+    conn = _connect()
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        ensure_log_schema(conn.cursor())
+        conn.commit()
+    except sqlite3.Error:
+        pass
+
+    while True:
+        try:
+            batch = [_queue.get(timeout=FLUSH_INTERVAL)]
+        except queue.Empty:
+            continue
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_batch(conn, batch)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name='activity-log-writer', daemon=True)
+            _writer.start()
+
+
+def log_action(username: str, action: str, details: Optional[str] = None, ip_address: Optional[str] = None):
+    """Ставит действие пользователя в очередь на запись в лог"""
+    _ensure_writer()
+    _queue.put((username, action, details, ip_address, _timestamp()))
+
+
+def log_render_latency(username: str, dashboard: str, seconds: float):
+    """Ставит в очередь время отрисовки панели (действие RENDER_ACTION)"""
+    log_action(username, RENDER_ACTION, f'{dashboard}: {seconds * 1000:.0f} мс')
+
+
+def flush(timeout: Optional[float] = 5.0) -> bool:
+    """
+    Ждет, пока фоновый поток запишет все события из очереди
+
+    Returns:
+        True, если очередь записана, False - если истек timeout
+    """
+    if _writer is None:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def pending_count() -> int:
+    """Количество событий, еще не записанных в базу"""
+    return _queue.unfinished_tasks
+
+
+def dropped_count() -> int:
+    """Количество событий, потерянных из-за недоступности базы"""
+    return _dropped_events
+
+
+atexit.register(flush)
+
+
+def _filters(username: Optional[str], action: Optional[str]) -> Tuple[List[str], list]:
+    conditions = []
+    params = []
+    if username:
+        conditions.append('username = ?')
+        params.append(username)
+    if action:
+        conditions.append('action = ?')
+        params.append(action)
+    return conditions, params
+
+
+def get_logs(limit: int = 100, username: Optional[str] = None, action: Optional[str] = None,
+             before: Optional[Tuple[str, int]] = None) -> List[tuple]:
+    """
+    Страница логов, от новых к старым
+
+    Args:
+        limit: Размер страницы
+        username: Фильтр по пользователю
+        action: Фильтр по действию
+        before: Ключ (created_at, id) последней записи предыдущей страницы;
+            None - первая страница
+
+    Returns:
+        Список кортежей (id, username, action, details, ip_address, created_at)
+    """
+    conditions, params = _filters(username, action)
+    if before is not None:
+        conditions.append('(created_at, id) < (?, ?)')
+        params.extend(before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT id, username, action, details, ip_address, created_at
+        FROM user_activity_logs
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', params + [int(limit)])
+    logs = cursor.fetchall()
+    conn.close()
+    return logs
+
+
+def get_logs_count(username: Optional[str] = None, action: Optional[str] = None) -> int:
+    """Количество записей лога с учетом фильтров"""
+    conditions, params = _filters(username, action)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT COUNT(*) FROM user_activity_logs {where}', params)
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def _distinct_values(column: str) -> List[str]:
+    # Пропуск по индексу: каждое следующее значение - один поиск в индексе,
+    # вместо полного просмотра таблицы в SELECT DISTINCT
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        WITH RECURSIVE distinct_values(value) AS (
+            SELECT MIN({column}) FROM user_activity_logs
+            UNION ALL
+            SELECT (SELECT MIN({column}) FROM user_activity_logs WHERE {column} > value)
+            FROM distinct_values
+            WHERE value IS NOT NULL
+        )
+        SELECT value FROM distinct_values WHERE value IS NOT NULL
+    ''')
+    values = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return values
+
+
+def get_log_usernames() -> List[str]:
+    """Пользователи, встречающиеся в логе, по алфавиту"""
+    return _distinct_values('username')
+
+
+def get_log_actions() -> List[str]:
+    """Действия, встречающиеся в логе, по алфавиту"""
+    return _distinct_values('action')
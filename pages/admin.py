@@ -11,6 +11,11 @@ import pandas as pd
 from datetime import datetime
 import sqlite3
 
+import dataset_store
+import ingestion
+import backends
+import perf
+import warmup
 from auth import (
     check_authentication, 
     get_current_user, 
@@ -22,7 +27,15 @@ from auth import (
     DB_PATH,
     render_sidebar_menu
 )
-from logger import log_action, get_logs, get_logs_count
+from logger import (
+    log_action,
+    get_logs,
+    get_logs_count,
+    get_log_usernames,
+    get_log_actions,
+    flush as flush_logs,
+    dropped_count
+)
 from settings import (
     get_setting, 
     set_setting, 
@@ -68,6 +81,7 @@ except ImportError as e:
 
 # Инициализация базы данных
 init_db()
+ingestion.start()
 
 # Проверка, что мы в контексте Streamlit
 def is_streamlit_context():
@@ -236,9 +250,10 @@ if user is not None:
     """, unsafe_allow_html=True)
     
     # Вкладки административной панели
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    tab1, tab2, tab_perf, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "👥 Управление пользователями", 
         "📊 Статистика", 
+        "⏱️ Производительность",
         "🔧 Настройки системы",
         "📝 Логи действий",
         "🔄 Обновление отчетов",
@@ -392,7 +407,8 @@ if user is not None:
     ''')
     role_stats = cursor.fetchall()
     
-    # Статистика логов
+    # Статистика логов (сначала дописываем события из очереди)
+    flush_logs()
     total_logs = get_logs_count()
     recent_logs = get_logs_count(action='login')
     
@@ -419,6 +435,97 @@ if user is not None:
     else:
         st.info("Нет данных")
     
+    # ==================== TAB: Производительность ====================
+    with tab_perf:
+        st.subheader("Производительность панелей")
+        st.info("""
+        Замеры последних запусков панелей в текущем процессе сервера (сбрасываются при перезапуске):
+        время этапов загрузки, фильтрации, агрегации, построения и сериализации графиков,
+        изменение памяти процесса и размер графиков.
+        """)
+
+        perf.MEASURE_PAYLOAD = st.checkbox(
+            "Измерять размер графиков (дополнительная сериализация каждого графика)",
+            value=perf.MEASURE_PAYLOAD,
+            key='perf_measure_payload'
+        )
+
+        available = backends.available_backends()
+        current_backend = backends.get_backend_name()
+        selected_backend = st.selectbox(
+            "Движок расчетов панелей бюджета, отклонений и ресурсов",
+            available,
+            index=available.index(current_backend),
+            format_func=lambda name: backends.BACKEND_LABELS.get(name, name),
+            key='perf_backend',
+            help="Выбор сохраняется для всего развертывания. В списке только установленные движки."
+        )
+        if selected_backend != current_backend:
+            backends.select_backend(selected_backend, updated_by=user['username'])
+            log_action(user['username'], 'change_backend', f"Движок расчетов: {selected_backend}")
+            st.success(f"Движок расчетов: {backends.BACKEND_LABELS.get(selected_backend, selected_backend)}")
+
+        stats = perf.get_stats()
+        if stats:
+            rows = []
+            for item in stats:
+                is_size = item['stage'] in ('payload_bytes', 'payload_raw_bytes')
+                # Times are shown in ms, payload sizes in KB
+                scale = 1 / 1024 if is_size else 1000
+                rows.append({
+                    'Панель': item['dashboard'],
+                    'Этап': perf.STAGE_LABELS.get(item['stage'], item['stage']),
+                    'Замеров': item['count'],
+                    'p50': round(item['p50'] * scale, 1),
+                    'p90': round(item['p90'] * scale, 1),
+                    'p95': round(item['p95'] * scale, 1),
+                    'Максимум': round(item['max'] * scale, 1),
+                    'Ед.': 'КБ' if is_size else 'мс',
+                    'Память p50 (МБ)': round(item['memory_p50'] / 2**20, 1) if item['memory_p50'] is not None else None,
+                    'Память max (МБ)': round(item['memory_max'] / 2**20, 1) if item['memory_max'] is not None else None,
+                })
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+            if st.button("Сбросить статистику", key='perf_reset'):
+                perf.reset_stats()
+                st.rerun()
+        else:
+            st.info("Нет замеров. Откройте любую панель на главной странице.")
+
+        st.markdown("---")
+        st.markdown("### Профилирование (cProfile)")
+        st.caption("Следующий запуск выбранной панели будет выполнен под cProfile; результат можно скачать как .prof "
+                   "и открыть в snakeviz или pstats.")
+
+        any_dashboard = 'Любая панель'
+        dashboards = sorted({item['dashboard'] for item in stats if item['dashboard'] != perf.NO_DASHBOARD})
+        profile_target = st.selectbox("Панель", [any_dashboard] + dashboards, key='perf_profile_target')
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Профилировать следующий запуск", type="primary", key='perf_request_profile'):
+                perf.request_profile('' if profile_target == any_dashboard else profile_target)
+                log_action(user['username'], 'request_profile', f'Запрошено профилирование: {profile_target}')
+                st.rerun()
+        with col2:
+            if perf.profile_requested() is not None and st.button("Отменить", key='perf_cancel_profile'):
+                perf.cancel_profile_request()
+                st.rerun()
+
+        pending = perf.profile_requested()
+        if pending is not None:
+            st.info(f"⏳ Ожидается запуск панели: {pending or any_dashboard}")
+
+        profile = perf.last_profile()
+        if profile:
+            st.write(f"**Последний профиль:** {profile['dashboard']} ({profile['created'].strftime('%d.%m.%Y %H:%M:%S')})")
+            st.download_button(
+                "📥 Скачать .prof",
+                data=profile['data'],
+                file_name=f"profile_{profile['created'].strftime('%Y%m%d_%H%M%S')}.prof",
+                mime='application/octet-stream',
+                key='perf_download_profile'
+            )
+
     # ==================== TAB 3: Настройки системы ====================
     with tab3:
         st.subheader("Настройки путей к файлам данных")
@@ -466,6 +573,7 @@ if user is not None:
                 set_setting('resources_files_path', resources_path, SETTING_KEYS.get('resources_files_path'), user['username'])
                 
                 log_action(user['username'], 'update_settings', 'Обновлены настройки путей к файлам')
+                ingestion.request_scan()
                 st.success("✅ Настройки успешно сохранены!")
                 st.rerun()
             except Exception as e:
@@ -497,11 +605,7 @@ if user is not None:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT username FROM user_activity_logs ORDER BY username')
-        usernames = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        usernames = get_log_usernames()
         
         filter_username = st.selectbox(
             "Фильтр по пользователю",
@@ -509,11 +613,7 @@ if user is not None:
         )
     
     with col2:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT action FROM user_activity_logs ORDER BY action')
-        actions = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        actions = get_log_actions()
         
         filter_action = st.selectbox(
             "Фильтр по действию",
@@ -527,8 +627,30 @@ if user is not None:
     username_filter = None if filter_username == 'Все' else filter_username
     action_filter = None if filter_action == 'Все' else filter_action
     
+    # Постраничный просмотр: стек ключей (created_at, id), с которых начинаются страницы
+    logs_filter_key = (username_filter, action_filter, log_limit)
+    if st.session_state.get('logs_filter_key') != logs_filter_key:
+        st.session_state['logs_filter_key'] = logs_filter_key
+        st.session_state['logs_page_keys'] = [None]
+    page_keys = st.session_state['logs_page_keys']
+    
     # Получение логов
-    logs = get_logs(limit=log_limit, username=username_filter, action=action_filter)
+    logs = get_logs(limit=log_limit, username=username_filter, action=action_filter, before=page_keys[-1])
+    
+    if dropped_count():
+        st.warning(f"Не удалось записать событий лога: {dropped_count()}")
+    
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ Новее", disabled=len(page_keys) == 1, use_container_width=True):
+            page_keys.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Страница {len(page_keys)}")
+    with col_next:
+        if st.button("Старее ➡️", disabled=len(logs) < log_limit, use_container_width=True):
+            page_keys.append((logs[-1][5], logs[-1][0]))
+            st.rerun()
     
     if logs:
         logs_data = []
@@ -567,12 +689,71 @@ if user is not None:
     st.markdown("---")
     
     # Информация о последнем обновлении
-    last_update = st.session_state.get('last_report_update', None)
-    if last_update:
-        st.info(f"Последнее обновление: {last_update}")
+    dataset = ingestion.current_version()
+    if dataset:
+        st.info(
+            f"Текущая версия данных: {dataset.version} от {dataset.created.strftime('%Y-%m-%d %H:%M:%S')}, "
+            f"файлов: {len(dataset.files)}"
+        )
+        st.dataframe(pd.DataFrame([
+            {
+                'Файл': path,
+                'Тип': info['type'],
+                'Строк': info['rows'],
+                'Размер, КБ': round(info['size'] / 1024, 1),
+                'Изменен': datetime.fromtimestamp(info['mtime'] / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+            }
+            for path, info in dataset.files.items()
+        ]), use_container_width=True, hide_index=True)
     else:
         st.warning("Отчеты еще не обновлялись")
     
+    # История версий: каждая загрузка файла проектов хранится без повторения неизмененных строк
+    stored_versions = dataset_store.list_versions()
+    if stored_versions:
+        with st.expander(f"🕓 История версий данных проектов ({len(stored_versions)})"):
+            st.dataframe(pd.DataFrame([
+                {
+                    'Версия': version.id,
+                    'Файл': version.source,
+                    'Сохранена': version.created.strftime('%Y-%m-%d %H:%M:%S'),
+                    'Загрузил': version.uploaded_by or 'каталог',
+                    'Строк': version.rows,
+                    'Новых строк': version.new_rows
+                }
+                for version in reversed(stored_versions)
+            ]), use_container_width=True, hide_index=True)
+    
+    last_scan = ingestion.last_scan()
+    if last_scan:
+        st.caption(
+            f"Последняя проверка каталогов: {last_scan['time'].strftime('%Y-%m-%d %H:%M:%S')}, "
+            f"перечитано файлов: {len(last_scan['parsed'])}, удалено: {len(last_scan['removed'])}"
+        )
+        for path, error in last_scan['errors']:
+            st.error(f"❌ {path}: {error}")
+    
+    # Прогрев панелей после публикации новой версии данных
+    warmup_progress = warmup.get_progress()
+    if warmup_progress:
+        warmup_statuses = {
+            'running': 'выполняется',
+            'done': 'завершен',
+            'cancelled': 'отменен (опубликована более новая версия)'
+        }
+        st.progress(
+            warmup_progress['done'] / warmup_progress['total'] if warmup_progress['total'] else 1.0,
+            text=(
+                f"Прогрев панелей, версия {warmup_progress['version']}: "
+                f"{warmup_statuses[warmup_progress['status']]} "
+                f"({warmup_progress['done']}/{warmup_progress['total']})"
+            )
+        )
+        if warmup_progress['current']:
+            st.caption(f"Сейчас прогревается: {warmup_progress['current']}")
+        for label, error in warmup_progress['errors']:
+            st.warning(f"⚠️ Прогрев {label}: {error}")
+    
     st.markdown("---")
     
     # Кнопка обновления
@@ -581,11 +762,16 @@ if user is not None:
     with col1:
         if st.button("🔄 Обновить отчеты", type="primary", use_container_width=True):
             try:
-                # Здесь должна быть логика обновления отчетов
-                # Для демонстрации просто обновляем время
-                st.session_state['last_report_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                # Перечитываются только новые и измененные файлы
+                result = ingestion.scan()
+                st.session_state['last_report_update'] = result['time'].strftime('%Y-%m-%d %H:%M:%S')
                 
-                log_action(user['username'], 'force_update_reports', 'Принудительное обновление отчетов')
+                log_action(
+                    user['username'],
+                    'force_update_reports',
+                    f"Принудительное обновление отчетов: версия {result['version']}, "
+                    f"перечитано файлов: {len(result['parsed'])}"
+                )
                 st.success("✅ Отчеты успешно обновлены!")
                 st.rerun()
             except Exception as e:
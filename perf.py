@@ -0,0 +1,218 @@
+"""
+Модуль измерения производительности панелей.
+
+Замеры (время и изменение памяти процесса) собираются в памяти процесса
+по парам (панель, этап) в скользящем окне последних запусков и
+показываются администратору в pages/admin.py. Не зависит от Streamlit:
+этапы размечаются декоратором timed или контекстным менеджером stage, а
+текущая панель задается dashboard_run в маршрутизации приложения.
+
+Этапы: 'ingestion' (загрузка файла), 'filtering', 'aggregation',
+'figure' (построение go.Figure), 'plotly_chart' (сериализация и отправка
+графика), 'total' (весь запуск панели). Размер графиков
+(payload_bytes, и payload_raw_bytes - без figure_payload) записывается
+через record_value.
+"""
+import cProfile
+import contextvars
+import functools
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Количество последних замеров, по которым считаются перцентили
+WINDOW_SIZE = 200
+
+# Панель для замеров вне dashboard_run (например, загрузка файлов)
+NO_DASHBOARD = '(вне панели)'
+
+STAGE_LABELS = {
+    'total': 'Весь запуск',
+    'ingestion': 'Загрузка данных',
+    'filtering': 'Фильтрация',
+    'aggregation': 'Агрегация',
+    'figure': 'Построение графиков',
+    'plotly_chart': 'Сериализация графиков',
+    'payload_bytes': 'Размер графика (байт)',
+    'payload_raw_bytes': 'Размер графика без сжатия (байт)',
+}
+
+# Считать размер JSON графиков (требует повторной сериализации фигуры)
+MEASURE_PAYLOAD = True
+
+_current_dashboard = contextvars.ContextVar('current_dashboard', default=NO_DASHBOARD)
+_lock = threading.Lock()
+_samples = {}  # (dashboard, stage) -> deque of (value, memory delta in bytes or None)
+_profile_requested = None  # None, или имя панели ('' - любая панель)
+_last_profile = None
+
+
+def _rss_bytes():
+    """Резидентная память процесса (None, если недоступна)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def record(stage, value, memory_delta=None, dashboard=None):
+    """Добавляет замер этапа для панели (по умолчанию - текущей)"""
+    key = (dashboard or _current_dashboard.get(), stage)
+    with _lock:
+        window = _samples.get(key)
+        if window is None:
+            window = _samples[key] = deque(maxlen=WINDOW_SIZE)
+        window.append((value, memory_delta))
+
+
+def record_value(stage, value):
+    """Замер, не являющийся временем (например, размер графика в байтах)"""
+    record(stage, value)
+
+
+@contextmanager
+def stage(name):
+    """Замеряет время и изменение памяти блока как этап текущей панели"""
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        rss_after = _rss_bytes()
+        delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        record(name, elapsed, delta)
+
+
+def timed(stage_name):
+    """Декоратор: каждый вызов функции замеряется как этап stage_name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_profile(dashboard=''):
+    """Включает cProfile для следующего запуска панели ('' - любой панели)"""
+    global _profile_requested
+    _profile_requested = dashboard
+
+
+def cancel_profile_request():
+    global _profile_requested
+    _profile_requested = None
+
+
+def profile_requested():
+    """Имя панели, для которой ожидается профилирование (None - не ожидается)"""
+    return _profile_requested
+
+
+def _take_profile_request(dashboard):
+    global _profile_requested
+    with _lock:
+        if _profile_requested is None or _profile_requested not in ('', dashboard):
+            return False
+        _profile_requested = None
+        return True
+
+
+def _store_profile(dashboard, profiler):
+    global _last_profile
+    fd, path = tempfile.mkstemp(suffix='.prof')
+    os.close(fd)
+    try:
+        profiler.dump_stats(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    _last_profile = {
+        'dashboard': dashboard,
+        'created': datetime.now(),
+        'data': data,
+    }
+
+
+def last_profile():
+    """Последний снятый профиль: словарь dashboard, created, data (байты .prof) или None"""
+    return _last_profile
+
+
+@contextmanager
+def dashboard_run(dashboard):
+    """
+    Размечает запуск панели: этапы внутри блока относятся к dashboard,
+    общее время записывается как этап 'total'. Если запрошено
+    профилирование, запуск выполняется под cProfile.
+    """
+    token = _current_dashboard.set(dashboard)
+    profiler = cProfile.Profile() if _take_profile_request(dashboard) else None
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            profiler = None
+    try:
+        with stage('total'):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _store_profile(dashboard, profiler)
+        _current_dashboard.reset(token)
+
+
+def get_stats():
+    """
+    Перцентили замеров по панелям и этапам
+
+    Returns:
+        Список словарей: dashboard, stage, count, p50, p90, p95, max,
+        memory_p50 и memory_max (изменение памяти, байты; None - нет данных)
+    """
+    with _lock:
+        snapshot = {key: list(window) for key, window in _samples.items()}
+
+    stats = []
+    for (dashboard, stage_name), samples in sorted(snapshot.items()):
+        values = np.array([value for value, _ in samples], dtype=float)
+        memory = np.array([delta for _, delta in samples if delta is not None], dtype=float)
+        p50, p90, p95 = np.percentile(values, [50, 90, 95])
+        stats.append({
+            'dashboard': dashboard,
+            'stage': stage_name,
+            'count': len(values),
+            'p50': p50,
+            'p90': p90,
+            'p95': p95,
+            'max': values.max(),
+            'memory_p50': np.percentile(memory, 50) if len(memory) else None,
+            'memory_max': memory.max() if len(memory) else None,
+        })
+    return stats
+
+
+def reset_stats():
+    """Очищает накопленные замеры"""
+    with _lock:
+        _samples.clear()
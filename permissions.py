@@ -0,0 +1,216 @@
+"""
+Модуль прав доступа пользователей к проектам
+
+Права хранятся в таблице project_permissions (user_id, project_name).
+Администраторы и пользователи, которым не выдано ни одного проекта, видят
+все проекты; остальные - только выданные.
+
+Для панелей права применяются один раз: набор доступных проектов
+пользователя кэшируется до следующего изменения прав, а отобранные по нему
+строки данных кэшируются по паре (набор данных, набор проектов), так что
+на каждом перезапуске панели получают один и тот же готовый DataFrame
+вместо повторного isin и копирования.
+"""
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from auth import DB_PATH, ADMIN_ROLES
+from dashboard_data import PROJECT_COLUMN_NAMES, find_column_by_partial
+
+# Сколько отобранных по правам наборов строк хранить в памяти
+VIEW_CACHE_SIZE = 32
+
+_lock = threading.Lock()
+_permissions_version = 0  # увеличивается при каждой выдаче или отзыве прав
+_allowed_cache = {}  # user_id -> (версия прав, frozenset проектов или None)
+_view_cache = OrderedDict()  # (id набора данных, проекты) -> (weakref на набор данных, отобранные строки)
+
+
+def _bump_version():
+    global _permissions_version
+    with _lock:
+        _permissions_version += 1
+
+
+def grant_project_access(user_id: int, project_name: str, granted_by: Optional[str] = None) -> bool:
+    """Выдает пользователю доступ к проекту (False, если доступ уже есть)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO project_permissions (user_id, project_name, created_by)
+            VALUES (?, ?, ?)
+        ''', (user_id, project_name.strip(), granted_by))
+        conn.commit()
+        conn.close()
+    except sqlite3.IntegrityError:
+        return False
+    _bump_version()
+    return True
+
+
+def revoke_project_access(user_id: int, project_name: str) -> bool:
+    """Отзывает доступ пользователя к проекту"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM project_permissions
+        WHERE user_id = ? AND project_name = ?
+    ''', (user_id, project_name))
+    deleted = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    if deleted:
+        _bump_version()
+    return deleted
+
+
+def get_user_projects(user_id: int) -> List[str]:
+    """Проекты, выданные пользователю"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT project_name FROM project_permissions
+        WHERE user_id = ?
+        ORDER BY project_name
+    ''', (user_id,))
+    projects = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return projects
+
+
+def get_project_users(project_name: str) -> List[dict]:
+    """Пользователи с доступом к проекту"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT u.id, u.username, u.role, p.created_at, p.created_by
+        FROM project_permissions p
+        JOIN users u ON u.id = p.user_id
+        WHERE p.project_name = ?
+        ORDER BY u.username
+    ''', (project_name,))
+    users = [
+        {'user_id': user_id, 'username': username, 'role': role, 'granted_at': granted_at, 'granted_by': granted_by}
+        for user_id, username, role, granted_at, granted_by in cursor.fetchall()
+    ]
+    conn.close()
+    return users
+
+
+def get_all_project_permissions() -> List[dict]:
+    """Все выданные права с данными пользователей"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT p.id, p.user_id, u.username, u.role, p.project_name, p.created_at, p.created_by
+        FROM project_permissions p
+        JOIN users u ON u.id = p.user_id
+        ORDER BY p.project_name, u.username
+    ''')
+    permissions = [
+        {
+            'id': perm_id,
+            'user_id': user_id,
+            'username': username,
+            'role': role,
+            'project_name': project_name,
+            'granted_at': granted_at,
+            'granted_by': granted_by
+        }
+        for perm_id, user_id, username, role, project_name, granted_at, granted_by in cursor.fetchall()
+    ]
+    conn.close()
+    return permissions
+
+
+def has_project_access(user_id: int, project_name: str) -> bool:
+    """Проверка, выдан ли пользователю доступ к проекту"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT 1 FROM project_permissions
+        WHERE user_id = ? AND project_name = ?
+    ''', (user_id, project_name))
+    found = cursor.fetchone() is not None
+    conn.close()
+    return found
+
+
+def get_all_projects() -> List[str]:
+    """Проекты, на которые выданы права"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT DISTINCT project_name FROM project_permissions ORDER BY project_name')
+    projects = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return projects
+
+
+def resolve_allowed_projects(user: dict) -> Optional[frozenset]:
+    """
+    Проекты, доступные пользователю
+
+    Returns:
+        frozenset названий проектов или None - без ограничений
+        (администраторы и пользователи без выданных прав)
+    """
+    if not user or user.get('role') in ADMIN_ROLES:
+        return None
+    cached = _allowed_cache.get(user['id'])
+    version = _permissions_version
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    projects = get_user_projects(user['id'])
+    allowed = frozenset(project.strip() for project in projects) if projects else None
+    _allowed_cache[user['id']] = (version, allowed)
+    return allowed
+
+
+def find_project_column(df):
+    """Колонка проекта: 'project name' в данных проектов, 'Проект' в ресурсах и технике"""
+    if 'project name' in df.columns:
+        return 'project name'
+    return find_column_by_partial(df, PROJECT_COLUMN_NAMES)
+
+
+def restrict_to_projects(df, allowed_projects: Optional[frozenset]):
+    """
+    Строки данных, относящиеся к доступным проектам
+
+    Результат кэшируется по паре (df, allowed_projects): повторный вызов с
+    тем же DataFrame возвращает тот же объект. Возвращаемый DataFrame
+    нельзя изменять на месте.
+
+    Args:
+        df: DataFrame или None
+        allowed_projects: Результат resolve_allowed_projects (None - без ограничений)
+    """
+    if df is None or allowed_projects is None:
+        return df
+    project_col = find_project_column(df)
+    if project_col is None:
+        return df
+
+    key = (id(df), allowed_projects)
+    with _lock:
+        cached = _view_cache.get(key)
+        if cached is not None and cached[0]() is df:
+            _view_cache.move_to_end(key)
+            return cached[1]
+
+    positions = np.flatnonzero(df[project_col].astype(str).str.strip().isin(allowed_projects).to_numpy())
+    view = df.take(positions)
+    view.attrs = dict(df.attrs)
+
+    with _lock:
+        _view_cache[key] = (weakref.ref(df), view)
+        _view_cache.move_to_end(key)
+        while len(_view_cache) > VIEW_CACHE_SIZE:
+            _view_cache.popitem(last=False)
+    return view
@@ -0,0 +1,216 @@
+"""
+Движок расчетов Polars (см. backends)
+
+Для набора данных проектов один раз строится колоночный снимок -
+DataFrame Polars с ключами фильтров, бюджетами, отклонениями и датами.
+Каждый расчет - ленивый план (фильтр, группировка, сортировка), который
+Polars оптимизирует и выполняет группировку во всех потоках; в pandas
+возвращается только агрегат для графиков.
+"""
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, is_string_dtype
+
+import backends
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+# Код частоты периода -> интервал dt.truncate
+PERIOD_INTERVALS = {'D': '1d', 'M': '1mo', 'Q': '1q', 'Y': '1y'}
+
+MS_PER_DAY = 86_400_000
+
+
+def is_available():
+    """Установлен ли пакет polars"""
+    return pl is not None
+
+
+def _filter_expression(column, kind):
+    """Выражение, с которым сравнивается значение фильтра (как astype(str).str.strip() в pandas)"""
+    if kind == 'strip':
+        return pl.col(column).str.strip_chars()
+    if kind == 'cast':
+        return pl.col(column).cast(pl.String)
+    return pl.col(column)
+
+
+class Snapshot:
+    """Колоночный снимок набора данных в Polars"""
+
+    def __init__(self, df):
+        frame, filter_kinds = backends.snapshot_frame(df)
+        self.dtypes = frame.dtypes.to_dict()
+        self.filter_kinds = filter_kinds
+        self.frame = pl.from_pandas(frame)
+
+    def has(self, *columns):
+        return all(col in self.dtypes for col in columns)
+
+    def can_filter(self, filters):
+        return all(col in self.filter_kinds for col, _ in filters)
+
+    def lazy(self, filters, *conditions):
+        """Ленивый план: строки снимка, отобранные фильтрами и условиями"""
+        plan = self.frame.lazy()
+        predicates = list(conditions) + [
+            _filter_expression(column, self.filter_kinds[column]) == str(value).strip()
+            for column, value in filters
+        ]
+        return plan.filter(*predicates) if predicates else plan
+
+
+_snapshots = backends.SnapshotCache(Snapshot)
+
+
+def _period(freq_code):
+    return pl.col('plan end').dt.truncate(PERIOD_INTERVALS[freq_code]).alias('period')
+
+
+def _not_null(columns):
+    return [pl.col(col).is_not_null() for col in columns]
+
+
+def budget_summary(df, filters, period_col, freq_code, group_col, value_cols):
+    """
+    Суммы бюджета по периоду плана и ключу группировки (см. sql_engine.budget_summary)
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить на pandas
+    """
+    snapshot = _snapshots.get(df)
+    source_cols = [col for col in value_cols if col != 'reserve budget']
+    if 'reserve budget' in value_cols:
+        source_cols += ['budget plan', 'budget fact']
+    if freq_code == 'D' or period_col not in df.columns \
+            or not snapshot.has('plan end', group_col, *source_cols) or not snapshot.can_filter(filters):
+        return None
+
+    sums = []
+    dtypes = {}
+    for col in value_cols:
+        if col == 'reserve budget':
+            sums.append((pl.col('budget plan') - pl.col('budget fact')).sum().alias(col))
+            dtypes[col] = backends.sum_dtype(snapshot.dtypes['budget plan'], snapshot.dtypes['budget fact'])
+        else:
+            sums.append(pl.col(col).sum())
+            dtypes[col] = backends.sum_dtype(snapshot.dtypes[col])
+
+    result = (
+        snapshot.lazy(filters, *_not_null(['plan end', group_col]))
+        .group_by(_period(freq_code), group_col)
+        .agg(sums)
+        .sort('period', group_col)
+        .collect()
+        .to_pandas()
+    )
+
+    periods = backends.restore_periods(result.pop('period'), freq_code, df[period_col].dtype)
+    result.insert(0, period_col, periods)
+    backends.restore_keys(result, df, [group_col])
+    return result.astype(dtypes)
+
+
+def _days(end, start):
+    # Длительность в полных днях, как Timedelta.days в pandas
+    return (pl.col(end) - pl.col(start)).dt.total_milliseconds() // MS_PER_DAY
+
+
+def deviation_totals(df, filters, group_cols):
+    """
+    Суммарные дни отклонений и средний процент выполнения по ключам группировки
+    (см. sql_engine.deviation_totals)
+
+    Returns:
+        (число задач с отклонением, DataFrame) или None, если расчет нужно
+        выполнить на pandas
+    """
+    snapshot = _snapshots.get(df)
+    if not snapshot.has('deviation', 'deviation in days', *backends.DATE_COLUMNS, *group_cols) \
+            or not snapshot.can_filter(filters):
+        return None
+
+    matched = snapshot.lazy(filters, pl.col('deviation')).select(pl.len()).collect().item()
+
+    plan_days = _days('plan end', 'plan start')
+    fact_days = _days('base end', 'base start')
+    completion = (
+        pl.when(fact_days != 0).then(plan_days / fact_days * 100)
+        .fill_null(0)
+        .clip(0, 200)
+    )
+    result = (
+        snapshot.lazy(filters, pl.col('deviation'), *_not_null(group_cols))
+        .group_by(group_cols)
+        .agg(pl.col('deviation in days').sum(), completion.mean().alias('completion_percent'))
+        .sort(group_cols)
+        .collect()
+        .to_pandas()
+    )
+    backends.restore_keys(result, df, group_cols)
+    result['deviation in days'] = result['deviation in days'].astype(
+        backends.sum_dtype(snapshot.dtypes['deviation in days']))
+    result['completion_percent'] = result['completion_percent'].astype('float64')
+    return matched, result
+
+
+def deviation_dynamics(df, filters, freq_code, group_cols):
+    """
+    Количество задач с отклонением и сумма дней отклонений по периодам
+    (см. sql_engine.deviation_dynamics)
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить на pandas
+    """
+    snapshot = _snapshots.get(df)
+    keys = [col for col in group_cols if col != 'period']
+    with_days = 'deviation in days' in df.columns
+    if freq_code not in PERIOD_INTERVALS or not snapshot.has('deviation', 'plan end', *keys) \
+            or (with_days and not snapshot.has('deviation in days')) or not snapshot.can_filter(filters):
+        return None
+
+    aggregations = [pl.len().alias('deviation')]
+    if with_days:
+        aggregations.append(pl.col('deviation in days').sum())
+    result = (
+        snapshot.lazy(filters, pl.col('deviation'), *_not_null(['plan end'] + keys))
+        .group_by(_period(freq_code), *keys)
+        .agg(aggregations)
+        .sort(['period'] + keys)
+        .collect()
+        .to_pandas()
+    )
+
+    result['period'] = backends.restore_periods(result['period'], freq_code)
+    backends.restore_keys(result, df, keys)
+    result['deviation'] = result['deviation'].astype('int64')
+    if with_days:
+        result['deviation in days'] = result['deviation in days'].astype(
+            backends.sum_dtype(snapshot.dtypes['deviation in days']))
+    return result
+
+
+def group_sums(frame, keys, value_cols):
+    """
+    Суммы колонок по ключам: frame.groupby(keys)[value_cols].sum().reset_index()
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить на pandas
+    """
+    if not all(is_numeric_dtype(frame[col]) and not is_bool_dtype(frame[col]) for col in value_cols) \
+            or not all(is_string_dtype(frame[col]) or is_numeric_dtype(frame[col]) for col in keys):
+        return None
+    result = (
+        pl.from_pandas(frame[list(keys) + list(value_cols)].reset_index(drop=True))
+        .lazy()
+        .filter(*_not_null(keys))
+        .group_by(keys)
+        .agg(pl.col(col).sum() for col in value_cols)
+        .sort(keys)
+        .collect()
+        .to_pandas()
+    )
+    backends.restore_keys(result, frame, keys)
+    return result.astype({col: backends.sum_dtype(frame[col].dtype) for col in value_cols})
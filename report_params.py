@@ -0,0 +1,71 @@
+"""
+Модуль параметров отчетов для аналитиков
+
+Чтение идет через config_cache (словарь в памяти), запись - в таблицу
+report_parameters с последующим сбросом кэша.
+"""
+import sqlite3
+from typing import Optional
+
+import config_cache
+from auth import DB_PATH
+
+
+def get_report_parameter(report_name: str, parameter_key: str) -> Optional[dict]:
+    """
+    Параметр отчета
+
+    Returns:
+        Словарь value, type, description, is_editable_by_analyst, updated_at,
+        updated_by или None, если параметр не задан
+    """
+    return config_cache.get_parameter(report_name, parameter_key)
+
+
+def get_report_parameters(report_name: str) -> dict:
+    """Все параметры отчета: {ключ: словарь параметра}"""
+    return config_cache.get_parameters(report_name)
+
+
+def set_report_parameter(report_name: str, parameter_key: str, parameter_value: Optional[str],
+                         parameter_type: str = 'string', description: Optional[str] = None,
+                         is_editable_by_analyst: bool = True, updated_by: Optional[str] = None) -> bool:
+    """Сохраняет параметр отчета (заменяет существующий с тем же ключом)"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO report_parameters (report_name, parameter_key, parameter_value, parameter_type,
+                                           description, is_editable_by_analyst, updated_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(report_name, parameter_key) DO UPDATE SET
+                parameter_value = excluded.parameter_value,
+                parameter_type = excluded.parameter_type,
+                description = COALESCE(excluded.description, report_parameters.description),
+                is_editable_by_analyst = excluded.is_editable_by_analyst,
+                updated_at = CURRENT_TIMESTAMP,
+                updated_by = excluded.updated_by
+        ''', (report_name, parameter_key, parameter_value, parameter_type, description,
+              int(is_editable_by_analyst), updated_by))
+        conn.commit()
+        conn.close()
+    except sqlite3.Error:
+        return False
+    config_cache.bump_version()
+    return True
+
+
+def delete_report_parameter(report_name: str, parameter_key: str) -> bool:
+    """Удаляет параметр отчета"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM report_parameters
+        WHERE report_name = ? AND parameter_key = ?
+    ''', (report_name, parameter_key))
+    deleted = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    if deleted:
+        config_cache.bump_version()
+    return deleted
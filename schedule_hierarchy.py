@@ -0,0 +1,99 @@
+"""
+Иерархия графика работ: проект > раздел > блок > задача
+
+Для обзорных диаграмм (сроки и отклонения по проектам или разделам вместо
+тысяч задач) агрегаты задач считаются один раз на версию данных:
+- листья - уникальные сочетания проекта, раздела, блока и задачи с
+  минимумом начала, максимумом окончания и суммами;
+- уровень - свертка листьев по набору колонок (например, проект и раздел),
+  строится при первом запросе и хранится.
+
+Запрос уровня с фильтрами берет свертку по колонкам уровня и колонкам
+фильтров и отбирает ее строки, поэтому переход между уровнями - выборка
+из готовой таблицы, а не группировка задач. Если колонка фильтра не входит
+в уровень, отобранные строки свертываются до уровня (их не больше, чем
+сочетаний значений, а не задач).
+"""
+import threading
+
+import numpy as np
+
+# Колонки иерархии, от верхнего уровня к нижнему
+HIERARCHY_COLUMNS = ('project name', 'section', 'block', 'task name')
+
+# Колонка агрегата -> функция свертки (min и max пропускают пустые даты)
+AGGREGATES = {
+    'plan start': 'min',
+    'plan end': 'max',
+    'base start': 'min',
+    'base end': 'max',
+    'tasks': 'sum',
+    'deviation tasks': 'sum',
+    'deviation days': 'sum',
+}
+
+
+class ScheduleHierarchy:
+    """Агрегаты задач по уровням иерархии"""
+
+    def __init__(self, frame):
+        """
+        Args:
+            frame: Колонки иерархии (какие есть в данных) и колонки AGGREGATES
+                по одной строке на задачу
+        """
+        self.columns = self.columns_in(frame)
+        aggregates = {col: func for col, func in AGGREGATES.items() if col in frame.columns}
+        self.leaves = frame.groupby(self.columns, dropna=False, sort=True).agg(aggregates)
+        self._lock = threading.Lock()
+        self._levels = {}  # колонки свертки -> DataFrame с индексом по этим колонкам
+
+    def _rollup(self, columns):
+        with self._lock:
+            cached = self._levels.get(columns)
+        if cached is not None:
+            return cached
+        rollup = self.leaves.groupby(level=list(columns), dropna=False, sort=True).agg(
+            {col: AGGREGATES[col] for col in self.leaves.columns})
+        with self._lock:
+            return self._levels.setdefault(columns, rollup)
+
+    @staticmethod
+    def columns_in(df):
+        """Колонки иерархии, которые есть в данных"""
+        return [col for col in HIERARCHY_COLUMNS if col in df.columns]
+
+    def has(self, *columns):
+        return all(col in self.columns for col in columns)
+
+    def level(self, by, filters=()):
+        """
+        Агрегаты уровня by с фильтрами
+
+        Args:
+            by: Колонки уровня (колонки иерархии)
+            filters: Пары (колонка иерархии, значение); значения сравниваются
+                как в dashboard_data.build_filter_mask
+
+        Returns:
+            DataFrame с колонками by и AGGREGATES; строки без значения
+            колонок уровня не выводятся
+        """
+        by = tuple(by)
+        filter_cols = {col for col, _ in filters}
+        columns = tuple(col for col in self.columns if col in by or col in filter_cols)
+        rollup = self._rollup(columns)
+
+        mask = np.ones(len(rollup), dtype=bool)
+        for column, value in filters:
+            values = rollup.index.get_level_values(column)
+            mask &= (values.astype(str).str.strip() == str(value).strip())
+        for column in by:
+            mask &= rollup.index.get_level_values(column).notna()
+        selected = rollup[mask]
+
+        if filter_cols - set(by):
+            selected = selected.groupby(level=list(by), sort=True).agg(
+                {col: AGGREGATES[col] for col in selected.columns})
+        selected = selected.reset_index()
+        return selected[list(by) + list(self.leaves.columns)]
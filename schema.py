@@ -0,0 +1,98 @@
+"""
+Модуль типизации данных проектов
+
+Схема PROJECT_SCHEMA описывает типы колонок данных проектов, и
+apply_schema приводит их один раз при загрузке файла:
+- числа (бюджеты, дни отклонений) - числовой тип, ошибочные значения - NaN;
+  целые без пропусков сжимаются до меньшего целого типа, если это указано
+  в схеме (бюджеты остаются 64-битными, чтобы суммы были точными);
+- признак отклонения - bool (True для True, 1, '1', 'true');
+- текстовые ключи (проект, раздел, задача...) - без пробелов по краям.
+  Тип category не используется: с ним группировки панелей выводят пустые
+  категории и меняют порядок групп.
+
+Расчеты панелей после этого могут полагаться на типы: ensure_numeric
+возвращает числовые колонки без повторного преобразования.
+"""
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, is_string_dtype
+
+# Колонка -> (тип, сжимать ли целые до меньшего типа)
+PROJECT_SCHEMA = {
+    'budget plan': ('number', False),
+    'budget fact': ('number', False),
+    'reserve': ('number', False),
+    'deviation in days': ('number', True),
+    'deviation': ('flag', False),
+    'project name': ('key', False),
+    'abbreviation': ('key', False),
+    'block': ('key', False),
+    'section': ('key', False),
+    'task name': ('key', False),
+    'reason of deviation': ('key', False),
+}
+
+_TRUE_VALUES = {'true', '1', '1.0'}
+
+
+def ensure_numeric(values):
+    """Числовая колонка: уже числовые колонки возвращаются без изменений"""
+    if is_numeric_dtype(values) and not is_bool_dtype(values):
+        return values
+    return pd.to_numeric(values, errors='coerce')
+
+
+def _to_number(values, downcast):
+    numbers = ensure_numeric(values)
+    if downcast and numbers.notna().all() and (numbers % 1 == 0).all():
+        numbers = pd.to_numeric(numbers.astype('int64'), downcast='integer')
+    return numbers
+
+
+def _to_flag(values):
+    if is_bool_dtype(values):
+        return values.fillna(False).astype(bool)
+    if is_numeric_dtype(values):
+        return values == 1
+    return values.astype(str).str.strip().str.lower().isin(_TRUE_VALUES)
+
+
+def _to_key(values):
+    if values.dtype == object:
+        # Mixed columns from Excel: only strings are stripped, numbers stay as they are
+        return values.map(lambda value: value.strip() if isinstance(value, str) else value)
+    if is_string_dtype(values):
+        return values.str.strip()
+    return values
+
+
+_CONVERTERS = {
+    'number': _to_number,
+    'flag': lambda values, downcast: _to_flag(values),
+    'key': lambda values, downcast: _to_key(values),
+}
+
+
+def apply_schema(df, schema=PROJECT_SCHEMA):
+    """
+    Приводит колонки DataFrame к типам схемы (на месте; отсутствующие колонки пропускаются)
+
+    Returns:
+        Отчет об использовании памяти: DataFrame с колонками 'Колонка',
+        'Тип до', 'Тип после', 'Байт до', 'Байт после'
+    """
+    rows = []
+    for col, (kind, downcast) in schema.items():
+        if col not in df.columns:
+            continue
+        before = df[col]
+        after = _CONVERTERS[kind](before, downcast)
+        df[col] = after
+        rows.append({
+            'Колонка': col,
+            'Тип до': str(before.dtype),
+            'Тип после': str(after.dtype),
+            'Байт до': int(before.memory_usage(index=False, deep=True)),
+            'Байт после': int(after.memory_usage(index=False, deep=True)),
+        })
+    return pd.DataFrame(rows, columns=['Колонка', 'Тип до', 'Тип после', 'Байт до', 'Байт после'])
@@ -0,0 +1,63 @@
+"""
+Модуль системных настроек (пути к файлам данных)
+"""
+import sqlite3
+from typing import Optional
+
+from auth import DB_PATH
+
+# Ключи настроек и их описания
+SETTING_KEYS = {
+    'finance_files_path': 'Путь к файлам финансовых данных',
+    'plan_fact_files_path': 'Путь к файлам план-факт данных',
+    'resources_files_path': 'Путь к файлам данных по ресурсам'
+}
+
+
+def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Значение настройки (default, если настройка не задана)"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT setting_value FROM file_paths_settings WHERE setting_key = ?', (key,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else default
+
+
+def set_setting(key: str, value: str, description: Optional[str] = None, updated_by: Optional[str] = None):
+    """Сохраняет значение настройки"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO file_paths_settings (setting_key, setting_value, description, updated_at, updated_by)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+        ON CONFLICT(setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value,
+            description = COALESCE(excluded.description, file_paths_settings.description),
+            updated_at = CURRENT_TIMESTAMP,
+            updated_by = excluded.updated_by
+    ''', (key, value or '', description, updated_by))
+    conn.commit()
+    conn.close()
+
+
+def get_all_settings() -> dict:
+    """
+    Все настройки
+
+    Returns:
+        Словарь {ключ: {'value', 'description', 'updated_at', 'updated_by'}}
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT setting_key, setting_value, description, updated_at, updated_by
+        FROM file_paths_settings
+        ORDER BY setting_key
+    ''')
+    settings = {
+        key: {'value': value, 'description': description, 'updated_at': updated_at, 'updated_by': updated_by}
+        for key, value, description, updated_at, updated_by in cursor.fetchall()
+    }
+    conn.close()
+    return settings
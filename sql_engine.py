@@ -0,0 +1,261 @@
+"""
+Движок расчетов DuckDB (см. backends)
+
+Для набора данных проектов один раз строится колоночный снимок - таблица
+DuckDB в памяти процесса с ключами фильтров, бюджетами, отклонениями и
+датами. Фильтры и группировки панелей выполняются SQL-запросом к снимку, и
+в pandas возвращается только агрегат для графиков, без копирования и
+группировки всего набора на каждом перезапуске.
+"""
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, is_string_dtype
+
+import backends
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# Код частоты периода -> единица date_trunc
+PERIOD_UNITS = {'D': 'day', 'M': 'month', 'Q': 'quarter', 'Y': 'year'}
+
+# Выражение, с которым сравнивается значение фильтра (как astype(str).str.strip() в pandas)
+FILTER_EXPRESSIONS = {
+    'plain': '{}',
+    'strip': 'trim({})',
+    'cast': 'CAST({} AS VARCHAR)',
+}
+
+
+def is_available():
+    """Установлен ли пакет duckdb"""
+    return duckdb is not None
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _connect(frame):
+    """База DuckDB в памяти с таблицей data из DataFrame"""
+    connection = duckdb.connect()
+    # Через Arrow строки передаются без преобразования в объекты Python
+    source = pyarrow.Table.from_pandas(frame, preserve_index=False) if pyarrow is not None else frame
+    connection.register('source', source)
+    connection.execute('CREATE TABLE data AS SELECT * FROM source')
+    connection.unregister('source')
+    return connection
+
+
+def _query(connection, sql, params=()):
+    # Свой курсор на каждый запрос: панели разных сессий выполняются в разных потоках
+    cursor = connection.cursor()
+    try:
+        return cursor.execute(sql, list(params)).fetchdf()
+    finally:
+        cursor.close()
+
+
+class Snapshot:
+    """Колоночный снимок набора данных: таблица data в отдельной базе DuckDB"""
+
+    def __init__(self, df):
+        frame, filter_kinds = backends.snapshot_frame(df)
+        self.dtypes = frame.dtypes.to_dict()
+        self.filter_exprs = {
+            col: FILTER_EXPRESSIONS[kind].format(_quote(col)) for col, kind in filter_kinds.items()
+        }
+        self.connection = _connect(frame)
+
+    def has(self, *columns):
+        return all(col in self.dtypes for col in columns)
+
+    def can_filter(self, filters):
+        return all(col in self.filter_exprs for col, _ in filters)
+
+    def query(self, sql, params=()):
+        return _query(self.connection, sql, params)
+
+
+_snapshots = backends.SnapshotCache(Snapshot)
+
+
+def _where(snapshot, filters, *conditions):
+    """Условие WHERE и параметры: фильтры сравниваются как строки без пробелов по краям"""
+    clauses = list(conditions)
+    params = []
+    for column, value in filters:
+        clauses.append(f'{snapshot.filter_exprs[column]} = ?')
+        params.append(str(value).strip())
+    return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def budget_summary(df, filters, period_col, freq_code, group_col, value_cols):
+    """
+    Суммы бюджета по периоду плана и ключу группировки
+
+    Эквивалент filtered_df.groupby([period_col, group_col]).agg(...).reset_index()
+    после apply_filters и _prepare_budget_frame.
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Активные фильтры [(колонка, значение)] (dashboard_data.active_filters)
+        period_col: Колонка периода плана (plan_month, plan_quarter, plan_year)
+        freq_code: 'M', 'Q' или 'Y'
+        group_col: 'project name' или 'section'
+        value_cols: Суммируемые колонки в порядке agg_dict панели;
+            'reserve budget' считается как план - факт
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить на pandas
+    """
+    snapshot = _snapshots.get(df)
+    source_cols = [col for col in value_cols if col != 'reserve budget']
+    if 'reserve budget' in value_cols:
+        source_cols += ['budget plan', 'budget fact']
+    if freq_code == 'D' or period_col not in df.columns \
+            or not snapshot.has('plan end', group_col, *source_cols) or not snapshot.can_filter(filters):
+        return None
+
+    sums = []
+    dtypes = {}
+    for col in value_cols:
+        if col == 'reserve budget':
+            sums.append('SUM("budget plan" - "budget fact")')
+            dtypes[col] = backends.sum_dtype(snapshot.dtypes['budget plan'], snapshot.dtypes['budget fact'])
+        else:
+            sums.append(f'SUM({_quote(col)})')
+            dtypes[col] = backends.sum_dtype(snapshot.dtypes[col])
+    select = ', '.join(f'COALESCE({expr}, 0) AS {_quote(col)}' for col, expr in zip(value_cols, sums))
+
+    where, params = _where(snapshot, filters, '"plan end" IS NOT NULL', f'{_quote(group_col)} IS NOT NULL')
+    result = snapshot.query(
+        f"SELECT date_trunc('{PERIOD_UNITS[freq_code]}', \"plan end\") AS period, {_quote(group_col)}, {select} "
+        f"FROM data {where} GROUP BY ALL ORDER BY period, {_quote(group_col)}",
+        params
+    )
+
+    periods = backends.restore_periods(result.pop('period'), freq_code, df[period_col].dtype)
+    result.insert(0, period_col, periods)
+    backends.restore_keys(result, df, [group_col])
+    return result.astype(dtypes)
+
+
+def deviation_totals(df, filters, group_cols):
+    """
+    Суммарные дни отклонений и средний процент выполнения по ключам группировки
+
+    Эквивалент группировки compute_deviation_by_tasks: задачи с отклонением,
+    сумма 'deviation in days' и среднее completion_percent
+    (add_duration_completion_percent) по group_cols.
+
+    Returns:
+        (число задач с отклонением, DataFrame) или None, если расчет нужно
+        выполнить на pandas
+    """
+    snapshot = _snapshots.get(df)
+    if not snapshot.has('deviation', 'deviation in days', *backends.DATE_COLUMNS, *group_cols) \
+            or not snapshot.can_filter(filters):
+        return None
+
+    where, params = _where(snapshot, filters, 'deviation')
+    matched = int(snapshot.query(f'SELECT COUNT(*) AS n FROM data {where}', params)['n'].iloc[0])
+
+    keys = ', '.join(_quote(col) for col in group_cols)
+    not_null = [f'{_quote(col)} IS NOT NULL' for col in group_cols]
+    where, params = _where(snapshot, filters, 'deviation', *not_null)
+    # Длительности в полных днях, как Timedelta.days в pandas
+    plan_days = 'floor((epoch_ms("plan end") - epoch_ms("plan start")) / 86400000)'
+    fact_days = 'floor((epoch_ms("base end") - epoch_ms("base start")) / 86400000)'
+    completion = f'LEAST(GREATEST(COALESCE({plan_days} / NULLIF({fact_days}, 0) * 100, 0), 0), 200)'
+    result = snapshot.query(
+        f'SELECT {keys}, COALESCE(SUM("deviation in days"), 0) AS "deviation in days", '
+        f'AVG({completion}) AS completion_percent '
+        f'FROM data {where} GROUP BY ALL ORDER BY {keys}',
+        params
+    )
+    backends.restore_keys(result, df, group_cols)
+    result['deviation in days'] = result['deviation in days'].astype(
+        backends.sum_dtype(snapshot.dtypes['deviation in days']))
+    result['completion_percent'] = result['completion_percent'].astype('float64')
+    return matched, result
+
+
+def deviation_dynamics(df, filters, freq_code, group_cols):
+    """
+    Количество задач с отклонением и сумма дней отклонений по периодам
+
+    Эквивалент группировки compute_dynamics_of_deviations:
+    filtered_df.groupby(group_cols).agg({'deviation': 'count', 'deviation in days': 'sum'}),
+    где period - период даты окончания плана.
+
+    Args:
+        df: DataFrame с данными проектов
+        filters: Активные фильтры [(колонка, значение)]
+        freq_code: 'D', 'M', 'Q' или 'Y'
+        group_cols: ['period'] и ключи ('project name', 'reason of deviation')
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить на pandas
+    """
+    snapshot = _snapshots.get(df)
+    keys = [col for col in group_cols if col != 'period']
+    with_days = 'deviation in days' in df.columns
+    if freq_code not in PERIOD_UNITS or not snapshot.has('deviation', 'plan end', *keys) \
+            or (with_days and not snapshot.has('deviation in days')) or not snapshot.can_filter(filters):
+        return None
+
+    quoted = [_quote(col) for col in keys]
+    not_null = [f'{col} IS NOT NULL' for col in quoted]
+    where, params = _where(snapshot, filters, 'deviation', '"plan end" IS NOT NULL', *not_null)
+    select = ['period'] + quoted + ['COUNT(*) AS deviation']
+    if with_days:
+        select.append('COALESCE(SUM("deviation in days"), 0) AS "deviation in days"')
+    result = snapshot.query(
+        f"WITH periods AS (SELECT *, date_trunc('{PERIOD_UNITS[freq_code]}', \"plan end\") AS period FROM data) "
+        f"SELECT {', '.join(select)} FROM periods {where} GROUP BY ALL ORDER BY {', '.join(['period'] + quoted)}",
+        params
+    )
+
+    result['period'] = backends.restore_periods(result['period'], freq_code)
+    backends.restore_keys(result, df, keys)
+    result['deviation'] = result['deviation'].astype('int64')
+    if with_days:
+        result['deviation in days'] = result['deviation in days'].astype(
+            backends.sum_dtype(snapshot.dtypes['deviation in days']))
+    return result
+
+
+def group_sums(frame, keys, value_cols):
+    """
+    Суммы колонок по ключам: frame.groupby(keys)[value_cols].sum().reset_index()
+
+    Args:
+        frame: DataFrame с колонками keys и числовыми value_cols (уже отфильтрованные строки)
+
+    Returns:
+        DataFrame или None, если расчет нужно выполнить на pandas
+    """
+    if not all(is_numeric_dtype(frame[col]) and not is_bool_dtype(frame[col]) for col in value_cols) \
+            or not all(is_string_dtype(frame[col]) or is_numeric_dtype(frame[col]) for col in keys):
+        return None
+    quoted = [_quote(col) for col in keys]
+    sums = ', '.join(f'COALESCE(SUM({_quote(col)}), 0) AS {_quote(col)}' for col in value_cols)
+    not_null = ' AND '.join(f'{col} IS NOT NULL' for col in quoted)
+    connection = _connect(frame[list(keys) + list(value_cols)].reset_index(drop=True))
+    try:
+        result = _query(
+            connection,
+            f"SELECT {', '.join(quoted)}, {sums} FROM data WHERE {not_null} "
+            f"GROUP BY ALL ORDER BY {', '.join(quoted)}"
+        )
+    finally:
+        connection.close()
+    backends.restore_keys(result, frame, keys)
+    return result.astype({col: backends.sum_dtype(frame[col].dtype) for col in value_cols})
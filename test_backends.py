@@ -0,0 +1,138 @@
+"""Parity tests: dashboard computations through each installed backend match the pandas path"""
+
+import importlib
+
+import pandas as pd
+import pytest
+
+import backends
+from dashboard_data import (
+    compute_budget_by_period, compute_budget_by_section, compute_budget_cumulative, compute_contractor_analytics,
+    compute_deviation_by_tasks, compute_dynamics_of_deviations, prepare_contractor_data,
+)
+from data_loader import read_data_file
+from generate_synthetic_data import generate_contractor_data, generate_project_data
+
+PERIOD_TYPES = ['Месяц', 'Квартал', 'Год']
+
+
+def _installed(name):
+    return importlib.import_module(backends.BACKEND_MODULES[name]).is_available()
+
+
+@pytest.fixture(params=[
+    pytest.param(name, marks=pytest.mark.skipif(not _installed(name), reason=f'{name} is not installed'))
+    for name in backends.BACKEND_MODULES
+])
+def backend(request):
+    yield request.param
+    backends.select_backend(backends.PANDAS, persist=False)
+
+
+@pytest.fixture(scope='module', params=['sample', 'synthetic'])
+def project_df(request, tmp_path_factory):
+    if request.param == 'sample':
+        return read_data_file('sample_project_data_fixed.csv')
+    path = tmp_path_factory.mktemp('data') / 'synthetic_project.csv'
+    generate_project_data(5000).to_csv(path, sep=';', index=False, encoding='utf-8-sig')
+    return read_data_file(str(path))
+
+
+@pytest.fixture(scope='module', params=['sample', 'synthetic'])
+def contractor_df(request):
+    if request.param == 'sample':
+        df = read_data_file('sample_resources_data.csv')
+    else:
+        df = generate_contractor_data(5000)
+    prepared, error = prepare_contractor_data(df)
+    assert error is None
+    return prepared
+
+
+def _filter_sets(df):
+    project = df['project name'].dropna().iloc[0]
+    section = df.loc[df['project name'] == project, 'section'].dropna().iloc[0]
+    task = df.loc[df['project name'] == project, 'task name'].dropna().iloc[0]
+    reason = df['reason of deviation'].dropna().iloc[0]
+    return [
+        {},
+        {'project name': 'Все', 'section': 'Все'},
+        {'project name': project},
+        {'project name': project, 'section': section},
+        {'section': section},
+        {'project name': project, 'task name': task},
+        {'reason of deviation': reason},
+        {'project name': 'нет такого проекта'},
+    ]
+
+
+def _both(backend, func, *args, **kwargs):
+    backends.select_backend(backends.PANDAS, persist=False)
+    expected = func(*args, **kwargs)
+    backends.select_backend(backend, persist=False)
+    return expected, func(*args, **kwargs)
+
+
+def _assert_same(expected, actual):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True), rtol=1e-9)
+    elif isinstance(expected, dict):
+        assert expected.keys() == actual.keys()
+        for key in expected:
+            _assert_same(expected[key], actual[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(expected) == len(actual)
+        for left, right in zip(expected, actual):
+            _assert_same(left, right)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9)
+    else:
+        assert expected == actual
+
+
+def test_backend_is_used(backend, project_df):
+    backends.select_backend(backend, persist=False)
+    assert backends.run('budget_summary', project_df, [], 'plan_month', 'M', 'project name',
+                        ['budget plan', 'budget fact', 'reserve budget']) is not None
+    assert backends.run('deviation_totals', project_df, [], ['project name']) is not None
+    assert backends.run('deviation_dynamics', project_df, [], 'M', ['period', 'project name']) is not None
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+@pytest.mark.parametrize('view_type', ['Накопительно', 'За месяц'])
+def test_budget_by_period(backend, project_df, period_type, view_type):
+    for filters in _filter_sets(project_df):
+        _assert_same(*_both(backend, compute_budget_by_period, project_df, filters, period_type, view_type))
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+def test_budget_cumulative(backend, project_df, period_type):
+    for filters in _filter_sets(project_df):
+        _assert_same(*_both(backend, compute_budget_cumulative, project_df, filters, period_type))
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+def test_budget_by_section(backend, project_df, period_type):
+    for filters in _filter_sets(project_df):
+        filters = {key: value for key, value in filters.items() if key in ('section', 'block')}
+        _assert_same(*_both(backend, compute_budget_by_section, project_df, filters, period_type, 'Накопительно'))
+
+
+def test_deviation_by_tasks(backend, project_df):
+    for filters in _filter_sets(project_df):
+        _assert_same(*_both(backend, compute_deviation_by_tasks, project_df, filters))
+
+
+@pytest.mark.parametrize('period_type', ['День'] + PERIOD_TYPES)
+def test_dynamics_of_deviations(backend, project_df, period_type):
+    for filters in _filter_sets(project_df):
+        filters = {key: value for key, value in filters.items() if key in ('project name', 'reason of deviation')}
+        _assert_same(*_both(backend, compute_dynamics_of_deviations, project_df, filters, period_type))
+
+
+def test_contractor_analytics(backend, contractor_df):
+    work_df, project_col = contractor_df['data'], contractor_df['project_col']
+    projects = sorted(work_df[project_col].dropna().unique().tolist())
+    contractor = work_df['Контрагент'].dropna().iloc[0]
+    for selected, selected_contractor in [([], 'Все'), (projects[:2], 'Все'), ([], contractor)]:
+        _assert_same(*_both(backend, compute_contractor_analytics, work_df, project_col, selected, selected_contractor))
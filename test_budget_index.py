@@ -0,0 +1,57 @@
+"""Parity tests: budget dashboards answered from the prefix-sum index match the row scan"""
+
+import pandas as pd
+import pytest
+
+import budget_index
+from dashboard_data import compute_budget_by_period, compute_budget_by_section, compute_budget_cumulative
+from data_loader import read_data_file
+from generate_synthetic_data import generate_project_data
+from test_backends import PERIOD_TYPES, _assert_same, _filter_sets
+
+
+@pytest.fixture(scope='module', params=['sample', 'synthetic'])
+def project_df(request, tmp_path_factory):
+    if request.param == 'sample':
+        return read_data_file('sample_project_data_fixed.csv')
+    path = tmp_path_factory.mktemp('data') / 'synthetic_project.csv'
+    generate_project_data(5000).to_csv(path, sep=';', index=False, encoding='utf-8-sig')
+    return read_data_file(str(path))
+
+
+def _with_and_without_index(monkeypatch, func, *args):
+    actual = func(*args)
+    with monkeypatch.context() as patch:
+        patch.setattr(budget_index, 'budget_summary', lambda *a: None)
+        patch.setattr(budget_index, 'cumulative_totals', lambda *a: None)
+        expected = func(*args)
+    return expected, actual
+
+
+def test_index_is_used(project_df):
+    summary = budget_index.budget_summary(project_df, [], 'plan_quarter', 'Q', 'project name',
+                                          ['budget plan', 'budget fact', 'reserve budget'])
+    assert summary is not None
+    assert isinstance(summary['plan_quarter'].dtype, pd.PeriodDtype)
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+@pytest.mark.parametrize('view_type', ['Накопительно', 'За месяц'])
+def test_budget_by_period(monkeypatch, project_df, period_type, view_type):
+    for filters in _filter_sets(project_df):
+        _assert_same(*_with_and_without_index(
+            monkeypatch, compute_budget_by_period, project_df, filters, period_type, view_type))
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+def test_budget_cumulative(monkeypatch, project_df, period_type):
+    for filters in _filter_sets(project_df):
+        _assert_same(*_with_and_without_index(monkeypatch, compute_budget_cumulative, project_df, filters, period_type))
+
+
+@pytest.mark.parametrize('period_type', PERIOD_TYPES)
+def test_budget_by_section(monkeypatch, project_df, period_type):
+    for filters in _filter_sets(project_df):
+        filters = {key: value for key, value in filters.items() if key in ('section', 'block')}
+        _assert_same(*_with_and_without_index(
+            monkeypatch, compute_budget_by_section, project_df, filters, period_type, 'Накопительно'))
@@ -0,0 +1,30 @@
+"""Top-N chart categories: the 'Прочие' row keeps the totals of the folded categories"""
+
+import numpy as np
+import pandas as pd
+
+from dashboard_data import OTHER_CATEGORY, compute_contractor_analytics, limit_categories, prepare_contractor_data
+from generate_synthetic_data import generate_contractor_data
+
+
+def test_limit_categories():
+    data = pd.DataFrame({'Причина': [f'r{i}' for i in range(20)], 'Количество': np.arange(20)[::-1] % 7})
+    chart, others = limit_categories(data, 'Причина', 'Количество', ['Количество'], limit=5)
+    assert len(chart) == 6 and chart['Причина'].iloc[-1] == OTHER_CATEGORY
+    assert chart['Количество'].sum() == data['Количество'].sum()
+    assert set(chart['Причина'][:-1]) | set(others['Причина']) == set(data['Причина'])
+    assert chart['Количество'][:-1].min() >= others['Количество'].max()
+    # Kept rows stay in their original order
+    assert chart['Причина'][:-1].tolist() == [r for r in data['Причина'] if r in set(chart['Причина'])]
+
+    unchanged, none = limit_categories(data, 'Причина', 'Количество', ['Количество'], limit=20)
+    assert unchanged is data and none is None
+
+
+def test_contractor_charts():
+    prepared, _ = prepare_contractor_data(generate_contractor_data(2000), ('Среднее за месяц',))
+    results, _ = compute_contractor_analytics(prepared['data'], prepared['project_col'])
+    for _, result in results:
+        chart, _ = result['charts']['contractor_data']
+        for column in ['План', 'Среднее за месяц', 'Дельта']:
+            assert chart[column].sum() == result['contractor_data'][column].sum()
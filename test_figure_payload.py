@@ -0,0 +1,47 @@
+"""Compact figure serialization: same values and trace styles in a smaller JSON"""
+
+import base64
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import dashboard_figures  # noqa: F401 (registers the compact default template)
+from figure_payload import compact_figure, compact_template, raw_payload_size
+
+
+TYPED_ARRAY_DTYPES = {'i1': 'int8', 'i2': 'int16', 'i4': 'int32', 'f4': 'float32', 'f8': 'float64'}
+
+
+def _values(spec):
+    if isinstance(spec, dict) and 'bdata' in spec:
+        spec = np.frombuffer(base64.b64decode(spec['bdata']), dtype=TYPED_ARRAY_DTYPES[spec['dtype']])
+    return [float(value) if isinstance(value, (int, float, np.number)) else value for value in spec]
+
+
+def test_compact_figure_keeps_values():
+    fig = go.Figure([
+        go.Bar(x=['a', 'b', 'c'], y=np.array([1.0, 2.0, 3.0]), customdata=[10, 20, 30]),
+        go.Scatter(x=[1, 2, 3], y=np.array([2 ** 40 + 1, 1, 2]), marker=dict(size=[4.5, 5.5, 6.5])),
+    ])
+    before = json.loads(fig.to_json())
+    after = json.loads(compact_figure(fig).to_json())
+    for trace_before, trace_after in zip(before['data'], after['data']):
+        for key in set(trace_before) & {'x', 'y', 'customdata'}:
+            assert _values(trace_before[key]) == _values(trace_after[key])
+    assert after['data'][0]['y']['dtype'] == 'i1'
+    assert after['data'][0]['customdata']['dtype'] == 'i1'
+    assert after['data'][1]['x']['dtype'] == 'i1'
+    assert after['data'][1]['y']['dtype'] == 'f8'
+    assert after['data'][1]['marker']['size'] == [4.5, 5.5, 6.5]
+    assert len(fig.to_json()) < raw_payload_size(go.Figure(before))
+
+
+def test_compact_template():
+    full = pio.templates['plotly']
+    compact = compact_template(full, ('bar',))
+    assert set(compact.data.to_plotly_json()) == {'bar'}
+    assert compact.data.bar == full.data.bar
+    assert compact.layout.polar.to_plotly_json() == {}
+    assert compact.layout.xaxis == full.layout.xaxis
@@ -0,0 +1,47 @@
+"""Superseding dashboard jobs: a newer job with the same key cancels the older one"""
+
+import threading
+
+import pytest
+
+import jobs
+import perf
+
+
+def _wait_for_cancel(started, release):
+    started.set()
+    while not release.wait(0.01):
+        jobs.checkpoint('waiting')
+    return 'released'
+
+
+def test_checkpoint_outside_job_is_noop():
+    jobs.checkpoint('stage')
+
+
+def test_newer_job_supersedes_older():
+    started, release = threading.Event(), threading.Event()
+    older = jobs.submit(('session', 'panel'), _wait_for_cancel, started, release)
+    assert started.wait(5)
+    newer = jobs.submit(('session', 'panel'), lambda: 'newer')
+    assert newer.result() == 'newer'
+    with pytest.raises(jobs.JobCancelled):
+        older.result()
+    assert older.stage == 'waiting'
+
+
+def test_other_keys_are_not_cancelled():
+    started, release = threading.Event(), threading.Event()
+    first = jobs.submit(('session', 'budget'), _wait_for_cancel, started, release)
+    assert started.wait(5)
+    assert jobs.submit(('session', 'gantt'), lambda: 1).result() == 1
+    assert jobs.submit(('other session', 'budget'), lambda: 2).result() == 2
+    release.set()
+    assert first.result() == 'released'
+
+
+def test_job_runs_in_caller_context():
+    with perf.dashboard_run('job panel'):
+        job = jobs.submit(('session', 'context'), perf.record_value, 'job_stage', 1.0)
+        job.result()
+    assert any(item['dashboard'] == 'job panel' and item['stage'] == 'job_stage' for item in perf.get_stats())
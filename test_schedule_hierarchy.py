@@ -0,0 +1,36 @@
+"""Parity tests: schedule hierarchy levels match grouping the filtered task rows"""
+
+import pandas as pd
+import pytest
+
+from dashboard_data import (
+    _schedule_frame, apply_filters, compute_deviation_detail, deviation_detail_overview, plan_fact_overview,
+)
+from schedule_hierarchy import AGGREGATES, ScheduleHierarchy
+from test_backends import _filter_sets
+from test_budget_index import project_df  # noqa: F401 (fixture)
+
+LEVELS = [['project name'], ['section'], ['project name', 'section'], ['section', 'task name']]
+
+
+@pytest.mark.parametrize('by', LEVELS)
+def test_level(project_df, by):
+    frame = _schedule_frame(project_df)
+    hierarchy = ScheduleHierarchy(frame)
+    for filters in _filter_sets(project_df):
+        filters = {key: value for key, value in filters.items() if key in hierarchy.columns}
+        expected = (apply_filters(frame, filters).groupby(by, sort=True).agg(AGGREGATES).reset_index())
+        actual = hierarchy.level(by, [(key, value) for key, value in filters.items() if value != 'Все'])
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+
+def test_overviews(project_df):
+    overview = plan_fact_overview(project_df, {}, limit=0)
+    assert overview['level'] == 'project name'
+    assert overview['tasks'] == int(_schedule_frame(project_df)['tasks'].sum())
+
+    sections = deviation_detail_overview(project_df, limit=0)
+    detail, _ = compute_deviation_detail(project_df)
+    expected = detail.groupby('Раздел')['Суммарно дней отклонений'].sum()
+    actual = sections.set_index('Раздел')['Суммарно дней отклонений']
+    pd.testing.assert_series_equal(expected.sort_index(), actual.sort_index(), check_dtype=False, check_names=False)
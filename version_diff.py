@@ -0,0 +1,140 @@
+"""
+Сравнение двух версий данных проектов (dataset_store)
+
+Задача определяется ключом TASK_KEY_COLUMNS (проект, блок, раздел,
+задача). Строки, которые перешли в новую версию без изменений, в пуле
+хранилища занимают одну и ту же позицию, поэтому отсекаются сравнением
+позиций, без чтения значений. Оставшиеся строки сопоставляются
+хеш-соединением по стабильному хешу ключа (dataset_store.row_hashes) и
+номеру повтора ключа; для сопоставленных задач считаются изменения дат
+(в днях) и бюджета.
+
+Версии не изменяются, поэтому результат кэшируется по паре номеров версий.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from dataset_store import TASK_KEY_COLUMNS
+from date_parser import ensure_datetime
+from schema import ensure_numeric
+
+# Поля, изменения которых показываются по задачам
+DATE_FIELDS = ('plan start', 'plan end', 'base start', 'base end')
+BUDGET_FIELDS = ('budget plan', 'budget fact')
+OTHER_FIELDS = ('deviation in days', 'reason of deviation')
+
+# Поля добавленных и удаленных задач
+DETAIL_FIELDS = ('plan start', 'plan end', 'budget plan')
+
+# Сколько результатов сравнения хранить в памяти
+DIFF_CACHE_SIZE = 16
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # (старая версия, новая версия) -> результат diff_versions
+
+
+def _task_index(frame, keys):
+    """Индекс строк по (хеш ключа задачи, номер повтора ключа)"""
+    hashes = dataset_store.row_hashes(frame[keys])
+    occurrence = pd.Series(hashes).groupby(hashes, sort=False).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([hashes, occurrence])
+
+
+def _same(old, new):
+    return (old == new) | (old.isna() & new.isna())
+
+
+def _changes(old_rows, new_rows, keys):
+    """Задачи с изменениями: ключи, значения полей до/после и изменения"""
+    changes = new_rows[keys].copy()
+    changed_fields = pd.Series([()] * len(new_rows), dtype=object)
+    for field in DATE_FIELDS + BUDGET_FIELDS + OTHER_FIELDS:
+        if field not in old_rows.columns or field not in new_rows.columns:
+            continue
+        old, new = old_rows[field], new_rows[field]
+        if field in DATE_FIELDS:
+            old, new = ensure_datetime(old), ensure_datetime(new)
+            delta = (new - old).dt.days
+        elif field in BUDGET_FIELDS or field == 'deviation in days':
+            old, new = ensure_numeric(old), ensure_numeric(new)
+            delta = new - old
+        else:
+            delta = None
+        differs = ~_same(old, new).to_numpy()
+        changed_fields[differs] = changed_fields[differs].map(lambda fields, field=field: fields + (field,))
+        changes[f'{field}_old'] = old.to_numpy()
+        changes[f'{field}_new'] = new.to_numpy()
+        if delta is not None:
+            changes[f'{field}_delta'] = delta.to_numpy()
+    changes['changed_fields'] = changed_fields.to_numpy()
+    return changes
+
+
+def diff_versions(old_id, new_id):
+    """
+    Задачи, добавленные, удаленные и измененные между двумя версиями
+
+    Args:
+        old_id: Номер исходной версии
+        new_id: Номер сравниваемой версии
+
+    Returns:
+        Словарь: old, new (номера версий), unchanged (строк без изменений),
+        added, removed (DataFrame: ключи задачи и DETAIL_FIELDS),
+        changed (DataFrame: ключи задачи, <поле>_old, <поле>_new,
+        <поле>_delta - дни для дат и разница для чисел, changed_fields -
+        кортеж измененных полей)
+    """
+    cache_key = (old_id, new_id)
+    with _lock:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            _cache.move_to_end(cache_key)
+            return cached
+
+    old = dataset_store.get_version(old_id)
+    new = dataset_store.get_version(new_id)
+    if old.schema == new.schema:
+        # Строка без изменений в обеих версиях ссылается на одну позицию пула
+        old_rest = np.flatnonzero(~np.isin(old.positions, new.positions))
+        new_rest = np.flatnonzero(~np.isin(new.positions, old.positions))
+    else:
+        old_rest = np.arange(old.rows)
+        new_rest = np.arange(new.rows)
+    old_rows = dataset_store.version_rows(old_id, old_rest)
+    new_rows = dataset_store.version_rows(new_id, new_rest)
+
+    keys = [col for col in TASK_KEY_COLUMNS if col in old_rows.columns and col in new_rows.columns]
+    if keys:
+        matches = _task_index(old_rows, keys).get_indexer(_task_index(new_rows, keys))
+    else:
+        matches = np.full(len(new_rows), -1)
+    matched = matches >= 0
+    removed = np.ones(len(old_rows), dtype=bool)
+    removed[matches[matched]] = False
+
+    def details(rows):
+        return rows[keys + [col for col in DETAIL_FIELDS if col in rows.columns]].reset_index(drop=True)
+
+    result = {
+        'old': old_id,
+        'new': new_id,
+        'unchanged': new.rows - len(new_rest),
+        'added': details(new_rows[~matched]),
+        'removed': details(old_rows[removed]),
+        'changed': _changes(
+            old_rows.take(matches[matched]).reset_index(drop=True),
+            new_rows[matched].reset_index(drop=True),
+            keys
+        ),
+    }
+
+    with _lock:
+        _cache[cache_key] = result
+        while len(_cache) > DIFF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
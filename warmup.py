@@ -0,0 +1,169 @@
+"""
+Модуль фонового прогрева панелей после публикации новой версии данных
+
+Приложение регистрирует задачи прогрева (register): расчетную функцию
+панели с кэшем и колонки ее фильтров. После каждой новой версии данных из
+ingestion фоновый поток вызывает эти функции для вида "Все" и для
+фильтров по умолчанию ролей (таблица default_filters), так что первый
+пользователь, открывший панель, получает результат из кэша.
+
+Задачи выполняются по возрастанию priority: сначала виды "Все" всех
+панелей, затем фильтры ролей. Публикация более новой версии отменяет
+незавершенный прогрев предыдущей.
+"""
+import threading
+from datetime import datetime
+
+import config_cache
+import ingestion
+from dashboard_data import ALL_VALUES
+from filters import parse_filter_value
+
+# Сдвиг приоритета для фильтров ролей: они прогреваются после видов "Все"
+ROLE_DEFAULTS_PRIORITY_OFFSET = 1000
+
+_lock = threading.Lock()
+_tasks = {}  # название панели -> {'func', 'filter_columns', 'priority'}
+_scheduled = None  # (generation, DatasetVersion)
+_generation = 0
+_progress = None
+_wake = threading.Event()
+_thread = None
+_subscribed = False
+
+
+def register(report_name, func, filter_columns, priority=100):
+    """
+    Регистрирует задачу прогрева панели (повторная регистрация заменяет задачу)
+
+    Args:
+        report_name: Название панели (как в default_filters.report_name)
+        func: func(df, filters) - расчет панели с кэшем
+        filter_columns: Колонки фильтров панели в порядке виджетов
+        priority: Чем меньше, тем раньше выполняется
+    """
+    with _lock:
+        _tasks[report_name] = {'func': func, 'filter_columns': tuple(filter_columns), 'priority': priority}
+
+
+def _role_defaults(report_names):
+    """Фильтры по умолчанию: {(роль, панель): {ключ фильтра: значение}}"""
+    defaults = {}
+    for report_name in report_names:
+        for role, role_filters in config_cache.get_report_filters(report_name).items():
+            defaults[(role, report_name)] = {
+                key: parse_filter_value(item['value'], item['type'])
+                for key, item in role_filters.items()
+            }
+    return defaults
+
+
+def _build_plan(tasks):
+    """Список (priority, подпись, func, filters) без повторов"""
+    plan = []
+    seen = set()
+    for report_name, task in tasks.items():
+        filters = {column: ALL_VALUES for column in task['filter_columns']}
+        plan.append((task['priority'], f'{report_name}: {ALL_VALUES}', task['func'], filters))
+        seen.add((report_name, tuple(filters.values())))
+
+    for (role, report_name), role_filters in _role_defaults(list(tasks)).items():
+        task = tasks[report_name]
+        # Панели фильтруют по одному значению, списки (multiselect) не прогреваются
+        filters = {}
+        for column in task['filter_columns']:
+            value = role_filters.get(column)
+            filters[column] = value if isinstance(value, str) and value else ALL_VALUES
+        key = (report_name, tuple(filters.values()))
+        if key in seen:
+            continue
+        seen.add(key)
+        plan.append((task['priority'] + ROLE_DEFAULTS_PRIORITY_OFFSET, f'{report_name}: {role}', task['func'], filters))
+
+    plan.sort(key=lambda item: item[0])
+    return plan
+
+
+def schedule(version):
+    """Ставит прогрев версии данных, отменяя незавершенный прогрев предыдущей"""
+    global _scheduled, _generation
+    with _lock:
+        _generation += 1
+        _scheduled = (_generation, version)
+    _wake.set()
+
+
+def _cancelled(generation):
+    return generation != _generation
+
+
+def _run_job(generation, version):
+    global _progress
+    with _lock:
+        tasks = dict(_tasks)
+    df = version.frames.get('project')
+    plan = _build_plan(tasks) if df is not None else []
+    _progress = {
+        'version': version.version,
+        'status': 'running',
+        'total': len(plan),
+        'done': 0,
+        'current': None,
+        'errors': [],
+        'started': datetime.now(),
+        'finished': None,
+    }
+
+    for _, label, func, filters in plan:
+        if _cancelled(generation):
+            _progress['status'] = 'cancelled'
+            break
+        _progress['current'] = label
+        try:
+            func(df, filters)
+        except Exception as e:
+            _progress['errors'].append((label, str(e)))
+        _progress['done'] += 1
+    else:
+        _progress['status'] = 'done'
+    _progress['current'] = None
+    _progress['finished'] = datetime.now()
+
+
+def _run():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        with _lock:
+            generation, version = _scheduled
+        _run_job(generation, version)
+
+
+def start():
+    """
+    Запускает поток прогрева и подписывает его на новые версии данных
+    (повторные вызовы ничего не делают). Уже опубликованная версия
+    прогревается сразу.
+    """
+    global _thread, _subscribed
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name='dashboard-warmup', daemon=True)
+            _thread.start()
+        first_start = not _subscribed
+        _subscribed = True
+    if first_start:
+        ingestion.subscribe(schedule)
+        version = ingestion.current_version()
+        if version is not None:
+            schedule(version)
+
+
+def get_progress():
+    """
+    Состояние последнего прогрева: словарь version, status ('running',
+    'done', 'cancelled'), total, done, current, errors, started, finished;
+    None, если прогрев не запускался
+    """
+    progress = _progress
+    return dict(progress, errors=list(progress['errors'])) if progress else None